@@ -13,6 +13,26 @@ class Settings(BaseSettings):
     DEFAULT_PAGE_SIZE: int = 10
     DEFAULT_VOICE_MODE: bool = True
     LOG_LEVEL: str = "INFO"
+    DATASET_CACHE_ENABLED: bool = True
+    DATASET_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    DATASET_STORAGE: str = "rows"  # "rows" (list of dicts) or "columnar"
+    SNAPSHOT_ENABLED: bool = True
+    DATASET_BACKEND: str = "json"  # "json" (data files) or "sqlite" (SQLITE_PATH, see app.utils.sqlite_import)
+    SQLITE_PATH: str = ""  # "" = <DATA_DIR>/connector.sqlite3
+    PRELOAD_DATASETS: bool = True
+    DATA_WATCH_ENABLED: bool = True
+    DATA_WATCH_BACKEND: str = "auto"  # "auto" (inotify, else polling), "inotify" or "poll"
+    DATA_WATCH_INTERVAL: float = 2.0
+    SHARED_DATASETS: bool = False
+    SHARED_DATASET_DIR: str = ""  # "" = /dev/shm/udc-<hash of DATA_DIR> (or the temp dir)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_TTL: float = 60.0
+    RESPONSE_CACHE_CLIENT_MAX_AGE: int = 0
+    FAST_SERIALIZATION: bool = True
+    METRICS_ENABLED: bool = True
+    PROFILER_ENDPOINTS: bool = False
+    STREAMING_THRESHOLD_BYTES: int = 512 * 1024 * 1024
 
     class Config:
         env_file = ".env"
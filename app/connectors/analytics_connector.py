@@ -1,8 +1,13 @@
 """Analytics connector — daily metrics with date range filtering."""
 
 import logging
-from typing import Any, Dict, List
-from app.connectors.base import BaseConnector
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+from app.connectors.base import BaseConnector, Selection
+from app.connectors.indexes import SortedIndex, lower_key, select
+from app.connectors.series import SeriesIndex, is_numeric
+from app.connectors.sqlite import Table, sort_value, sqlite_store
+from app.connectors.summary import SummaryIndex
 from app.models.common import DataType
 
 logger = logging.getLogger(__name__)
@@ -12,25 +17,94 @@ class AnalyticsConnector(BaseConnector):
     source_name = "analytics"
     description = "Retrieve analytics time-series data with optional filters."
     data_type = DataType.TIME_SERIES
+    filename = "analytics.json"
+    index_fields = {"date": SortedIndex.on(partition="metric"),
+                    "value": SeriesIndex.on(order="date", partition="metric"),
+                    "summary": SummaryIndex.on(labels=("metric",), value="value")}
+    id_fields = ("metric", "date")
+    table = Table("analytics", keys={"metric": lower_key},
+                  order={"date": sort_value("date"), "value": sort_value("value")},
+                  indexes=("metric, by_date DESC", "by_date DESC", "by_value DESC"),
+                  labels=("metric",), value="value")
 
     def fetch(self, **filters) -> List[Dict[str, Any]]:
-        records = self._load_json("analytics.json")
+        return self.select(**filters).sorted()
 
-        if metric := filters.get("metric"):
-            records = [r for r in records if r.get("metric", "").lower() == metric.lower()]
+    def select(self, **filters) -> Selection:
+        sort_field = filters.get("sort_by", "date")
+        sort_order = filters.get("sort_order", "desc")
+        if (queried := self._queried(filters, sort_field, sort_order)) is not None:
+            return queried
+        if (streamed := self._streamed(filters, sort_field, sort_order)) is not None:
+            return streamed
 
-        if date_from := filters.get("date_from"):
-            records = [r for r in records if r.get("date", "") >= date_from]
+        ds = self._load_dataset(self.filename, self.index_fields)
 
-        if date_to := filters.get("date_to"):
-            records = [r for r in records if r.get("date", "") <= date_to]
+        # Metric + date range is one bisect over the metric's date-sorted slice;
+        # the default date ordering comes straight out of the index.
+        metric = filters.get("metric")
+        positions = ds.indexes["date"].scan(
+            filters.get("date_from") or None, filters.get("date_to") or None,
+            descending=(sort_field == "date" and sort_order == "desc"),
+            group=metric if metric else SortedIndex.ALL)
 
-        sort_field = filters.get("sort_by", "date")
-        sort_order = filters.get("sort_order", "desc")
-        records.sort(key=lambda r: r.get(sort_field, ""), reverse=(sort_order == "desc"))
+        if sort_field == "date":
+            rows = select(ds.records, positions)
+            date = lambda r: r.get("date", "")
+
+            def seek(value):
+                # ``rows`` are in final order: bisect for the first row at ``value`` or beyond.
+                at = (lambda i: date(rows[i]) <= value) if sort_order == "desc" else (lambda i: date(rows[i]) >= value)
+                start = bisect_left(range(len(rows)), True, key=at)
+                return map(rows.__getitem__, range(start, len(rows)))
+            selection = Selection(rows, date, sort_order == "desc", lambda: iter(rows),
+                                  id_key=self._id_key(), seek=seek)
+        else:
+            selection = self._order(ds, sorted(positions), sort_field, sort_order)
+        selection.summary = self._summary(ds, filters, positions)
+
+        logger.info("Analytics fetch: %d results (filters=%s)", len(selection), filters)
+        return selection
 
-        logger.info("Analytics fetch: %d results (filters=%s)", len(records), filters)
-        return records
+    def series(self, **filters) -> Tuple[Sequence[str], Sequence[float]]:
+        """(dates, values) of the matching data points in date order, without building rows."""
+        if self._uses_sqlite():
+            if sqlite_store.info(self.table) is None:
+                return [], []
+            return self._query(filters, "date", False).values()
+        if (streamed := self._streamed(filters, "date", "asc")) is not None:
+            rows = [r for r in streamed.sorted() if is_numeric(r.get("value"))]
+            return [r.get("date", "") for r in rows], [r["value"] for r in rows]
+
+        ds = self._load_dataset(self.filename, self.index_fields)
+        metric = filters.get("metric")
+        return ds.indexes["value"].window(
+            filters.get("date_from") or None, filters.get("date_to") or None,
+            group=metric if metric else SeriesIndex.ALL)
+
+    async def aseries(self, **filters) -> Tuple[Sequence[str], Sequence[float]]:
+        return await self._arun(self.series, **filters)
+
+    def _predicate(self, filters: Dict[str, Any]) -> Callable[[Dict[str, Any]], bool]:
+        checks = []
+        if metric := filters.get("metric"):
+            metric = metric.lower()
+            checks.append(lambda r: r.get("metric", "").lower() == metric)
+        if date_from := filters.get("date_from"):
+            checks.append(lambda r: r.get("date", "") >= date_from)
+        if date_to := filters.get("date_to"):
+            checks.append(lambda r: r.get("date", "") <= date_to)
+        return lambda r: all(check(r) for check in checks)
+
+    def _where(self, filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+        where, params = [], []
+        if date_from := filters.get("date_from"):
+            where.append("by_date >= ?")
+            params.append(date_from)
+        if date_to := filters.get("date_to"):
+            where.append("by_date <= ?")
+            params.append(date_to)
+        return where, params
 
     def _get_parameters(self) -> Dict[str, Any]:
         return {
@@ -1,39 +1,283 @@
 """Abstract base connector for all data sources."""
 
-import json, logging
+import asyncio, json, logging
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from app.config import settings
+from app.connectors.cache import Dataset, dataset_cache, fingerprint, load_dataset
+from app.connectors.changelog import changelog_path, overlay, read_changes
+from app.connectors.streaming import iter_records, sort_spilled
+from app.connectors.indexes import IndexFactory, SortedIndex
+from app.connectors.sqlite import Query, Rows, Table, sqlite_store
+from app.connectors.summary import Summary
 from app.models.common import DataType
+from app.utils.timing import stage
 
 logger = logging.getLogger(__name__)
 
+# Walk a pre-sorted index instead of sorting the matches when at least
+# 1/INDEX_ORDER_MIN_DENSITY of the rows match (otherwise the walk is mostly misses).
+INDEX_ORDER_MIN_DENSITY = 8
+
+
+@dataclass
+class Selection:
+    """Filtered rows plus the ordering that still has to be applied.
+
+    ``rows`` are the matches, in file order or already in final order (a stable
+    re-sort is then a no-op); with no ``sort_key`` they are final. ``ordered`` optionally yields the
+    matches lazily in final order from a sorted index, so a page can be cut
+    without sorting. ``BusinessRulesEngine`` decides how to materialise a page.
+
+    For keyset (cursor) pagination ``id_key`` gives a row's identity and
+    ``seek(value)`` yields rows in final order starting at the first row whose
+    sort key is ``value`` or beyond it.
+
+    ``presorted`` rows are already in final order and slice cheaply (e.g. LIMIT/OFFSET
+    in the database); ``sort_key`` then only serves cursors. ``blocking`` selections
+    do I/O when their rows or summary are read, so pages are cut off the event loop.
+    ``export`` optionally yields every match in final order, and their count, without
+    holding them all (a streamed file is re-read and sorted through spilled runs).
+    """
+    rows: List[Dict[str, Any]]
+    sort_key: Optional[Callable[[Dict[str, Any]], Any]] = None
+    reverse: bool = False
+    ordered: Optional[Callable[[], Iterator[Dict[str, Any]]]] = None
+    id_key: Optional[Callable[[Dict[str, Any]], tuple]] = None
+    seek: Optional[Callable[[Any], Iterator[Dict[str, Any]]]] = None
+    # Voice-summary aggregates for all matches, when an index can supply them cheaply.
+    summary: Optional[Callable[[], Summary]] = None
+    presorted: bool = False
+    blocking: bool = False
+    export: Optional[Callable[[], Tuple[Iterator[Dict[str, Any]], int]]] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def sorted(self) -> List[Dict[str, Any]]:
+        if self.ordered is not None:
+            return list(self.ordered())
+        if self.sort_key is None:
+            return self.rows
+        return sorted(self.rows, key=self.sort_key, reverse=self.reverse)
+
+
+class _StreamedRows(Sequence):
+    """A streamed file's matches, read in full on first use."""
+
+    def __init__(self, read: Callable[[], List[Dict[str, Any]]]):
+        self._read, self._rows = read, None
+
+    def _list(self) -> List[Dict[str, Any]]:
+        if self._rows is None:
+            self._rows = self._read()
+        return self._rows
+
+    def __len__(self) -> int:
+        return len(self._list())
+
+    def __getitem__(self, i):
+        return self._list()[i]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._list())
+
 
 class BaseConnector(ABC):
     source_name: str = ""
     description: str = ""
     data_type: DataType = DataType.UNKNOWN
 
-    def _load_json(self, filename: str) -> List[Dict[str, Any]]:
+    filename: str = ""
+    index_fields: Dict[str, IndexFactory] = {}
+    # Fields that identify a record: the tie-breaker in pagination cursors and the
+    # key of changelog upserts/deletes.
+    id_fields: Tuple[str, ...] = ()
+    # Layout of the records in the SQLite backend (DATASET_BACKEND=sqlite).
+    table: Optional[Table] = None
+
+    def _resolve_path(self, filename: str) -> Path:
+        """``filename`` in DATA_DIR, or its ``.ndjson``/``.jsonl`` sibling if only that exists."""
         path = Path(settings.DATA_DIR) / filename
+        if not path.exists():
+            for suffix in (".ndjson", ".jsonl"):
+                if path.with_suffix(suffix).exists():
+                    return path.with_suffix(suffix)
+        return path
+
+    def _load_dataset(self, filename: str,
+                      indexes: Optional[Dict[str, IndexFactory]] = None) -> Dataset:
+        path = self._resolve_path(filename)
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            logger.info("Loaded %d records from %s", len(data), filename)
-            return data
+            with stage("load"):
+                if settings.DATASET_CACHE_ENABLED:
+                    return dataset_cache.get(path, indexes, self.id_fields)
+                ds = load_dataset(path, fingerprint(path, bool(self.id_fields)), indexes, self.id_fields)
+                logger.info("Loaded %d records from %s", len(ds), filename)
+                return ds
         except FileNotFoundError:
             logger.error("Data file not found: %s", path)
-            return []
         except json.JSONDecodeError as e:
             logger.error("Invalid JSON in %s: %s", path, e)
-            return []
+        return Dataset(path=path, records=[], fingerprint=(0, 0), record_bytes=0).ensure_indexes(indexes)
+
+    def _load_json(self, filename: str) -> List[Dict[str, Any]]:
+        # Shallow copy: callers filter/sort the list in place.
+        return list(self._load_dataset(filename).records)
 
     @abstractmethod
     def fetch(self, **filters) -> List[Dict[str, Any]]:
         ...
 
+    def select(self, **filters) -> Selection:
+        """Matches with deferred ordering; connectors override to skip the full sort."""
+        return Selection(self.fetch(**filters))
+
+    async def aselect(self, **filters) -> Selection:
+        """Async :meth:`select` — runs on the event loop when the dataset is already
+        cached and indexed, otherwise in a worker thread so file I/O never blocks it.
+
+        Connectors that only implement the sync ``fetch`` always take the thread path.
+        """
+        return await self._arun(self.select, **filters)
+
+    async def afetch(self, **filters) -> List[Dict[str, Any]]:
+        return await self._arun(self.fetch, **filters)
+
+    async def _arun(self, fn: Callable, **kwargs):
+        if self._is_warm():
+            return fn(**kwargs)
+        return await asyncio.to_thread(fn, **kwargs)
+
+    def _is_warm(self) -> bool:
+        if (not self.filename or not settings.DATASET_CACHE_ENABLED or self._uses_sqlite()
+                or type(self).select is BaseConnector.select):
+            return False
+        path = self._resolve_path(self.filename)
+        return dataset_cache.peek(path, self.index_fields, self.id_fields) is not None
+
+    def _predicate(self, filters: Dict[str, Any]) -> Callable[[Dict[str, Any]], bool]:
+        """Per-record form of the connector's filters, used when streaming."""
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+
+    def _where(self, filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+        """SQL clauses (and their parameters) for the filters other than the
+        equality filters on ``table.keys``, used by the SQLite backend."""
+        return [], []
+
+    def _uses_sqlite(self) -> bool:
+        return settings.DATASET_BACKEND == "sqlite" and self.table is not None
+
+    def _queried(self, filters: Dict[str, Any], sort_field: str, sort_order: str,
+                 sort_key: Optional[Callable] = None) -> Optional[Selection]:
+        """Run the query in SQLite when ``DATASET_BACKEND=sqlite``: filtering, ordering
+        and each page's LIMIT/OFFSET happen there, nothing is loaded into memory.
+        Returns ``None`` for the JSON backend."""
+        if not self._uses_sqlite():
+            return None
+        if sqlite_store.info(self.table) is None:
+            logger.error("No %s table in %s (python -m app.utils.sqlite_import)",
+                         self.table.name, sqlite_store.path)
+            return Selection([])
+        query = self._query(filters, sort_field, sort_order == "desc")
+        return Selection(Rows(query), sort_key or (lambda r: r.get(sort_field, "")), sort_order == "desc",
+                         query.iter, id_key=self._id_key(), seek=query.seek, summary=query.summary,
+                         presorted=True, blocking=True)
+
+    def _streamed(self, filters: Dict[str, Any], sort_field: str, sort_order: str,
+                  sort_key: Optional[Callable] = None) -> Optional[Selection]:
+        """Filter records as they stream in when the file exceeds STREAMING_THRESHOLD_BYTES.
+
+        Only the matches are held in memory, and only once a page or summary reads
+        them (an export streams them instead); nothing is cached or indexed.
+        Returns ``None`` for files small enough to load into the dataset cache.
+        """
+        if not self._is_streaming():
+            return None
+        match = self._predicate(filters)
+        key, reverse = sort_key or (lambda r: r.get(sort_field, "")), sort_order == "desc"
+        rows = _StreamedRows(lambda: self._stream_matches(match))
+        return Selection(rows, key, reverse, id_key=self._id_key(), summary=lambda: Summary.of(rows),
+                         blocking=True, export=lambda: sort_spilled(self._iter_matches(match), key, reverse))
+
+    def _is_streaming(self) -> bool:
+        try:
+            return self._resolve_path(self.filename).stat().st_size > settings.STREAMING_THRESHOLD_BYTES
+        except OSError:
+            return False
+
+    def _query(self, filters: Dict[str, Any], sort_field: str, reverse: bool) -> Query:
+        equals = {f: key(filters[f]) for f, key in self.table.keys.items() if filters.get(f)}
+        return sqlite_store.query(self.table, equals, *self._where(filters), sort_field, reverse)
+
+    def _records(self) -> Iterator[Dict[str, Any]]:
+        """The data file's records with its changelog applied, streamed."""
+        path = self._resolve_path(self.filename)
+        records = iter_records(path)
+        if self.id_fields and changelog_path(path).exists():
+            records = overlay(records, read_changes(changelog_path(path))[0], self.id_fields)
+        return records
+
+    def _stream_matches(self, match: Callable[[Dict[str, Any]], bool]) -> List[Dict[str, Any]]:
+        return list(self._iter_matches(match))
+
+    def _iter_matches(self, match: Callable[[Dict[str, Any]], bool]) -> Iterator[Dict[str, Any]]:
+        path = self._resolve_path(self.filename)
+        n = 0
+        try:
+            for r in self._records():
+                if match(r):
+                    n += 1
+                    yield r
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError as e:
+            logger.error("Invalid JSON in %s: %s", path, e)
+        logger.info("Streamed %s: %d matches", path.name, n)
+
+    def _order(self, ds: Dataset, positions: Optional[List[int]], sort_field: str,
+               sort_order: str, sort_key: Optional[Callable] = None) -> Selection:
+        rows = ds.rows(positions)
+        reverse = sort_order == "desc"
+        index = ds.indexes.get(sort_field)
+        if sort_key is None and isinstance(index, SortedIndex) and (
+                positions is None or len(positions) * INDEX_ORDER_MIN_DENSITY >= len(ds.records)):
+            wanted = None if positions is None else set(positions)
+
+            def walk(lo=None, hi=None):
+                for p in index.iter(lo, hi, descending=reverse):
+                    if wanted is None or p in wanted:
+                        yield ds.records[p]
+
+            def seek(value):
+                return walk(hi=value) if reverse else walk(lo=value)
+            return Selection(rows, lambda r: r.get(sort_field, ""), reverse, walk,
+                             id_key=self._id_key(), seek=seek)
+        return Selection(rows, sort_key or (lambda r: r.get(sort_field, "")), reverse,
+                         id_key=self._id_key())
+
+    def _summary(self, ds: Dataset, filters: Dict[str, Any],
+                 positions: Optional[Iterable[int]]) -> Optional[Callable[[], Summary]]:
+        """Lazy voice-summary aggregates over all matches (``positions``, None = every row):
+        a precomputed group when the filters are all label filters, else one pass over the matches."""
+        index = ds.indexes.get("summary")
+        if index is None:
+            return None
+        wanted = {k: v for k, v in filters.items() if v and k not in ("sort_by", "sort_order")}
+        if all(f in index.labels for f in wanted):
+            return lambda: index.lookup(wanted)
+        if positions is None:
+            return lambda: index.lookup({})
+        return lambda: index.over(positions)
+
+    def _id_key(self) -> Optional[Callable[[Dict[str, Any]], tuple]]:
+        fields = self.id_fields
+        return (lambda r: tuple(r.get(f) for f in fields)) if fields else None
+
     @abstractmethod
     def _get_parameters(self) -> Dict[str, Any]:
         ...
@@ -50,4 +294,59 @@ class BaseConnector(ABC):
         }
 
     def get_record_count(self) -> int:
-        return len(self.fetch())
+        if (info := self.describe())["cache"] in ("warm", "sqlite"):
+            return info["record_count"]
+        return len(self.select())
+
+    def version(self) -> Optional[tuple]:
+        """Identity of the data currently behind this connector: (path, mtime_ns, size).
+
+        For a watched file that is the version being served, which may trail the
+        file on disk until the watcher swaps the new one in. With the SQLite
+        backend it is (database, table, import generation).
+        """
+        if not self.filename:
+            return None
+        if self._uses_sqlite():
+            info = sqlite_store.info(self.table)
+            return (str(sqlite_store.path), self.table.name, info and info["generation"])
+        try:
+            path = self._resolve_path(self.filename)
+            if dataset_cache.is_watched(path) and (ds := dataset_cache.entry(path)) is not None:
+                return (str(path),) + ds.fingerprint
+            return (str(path),) + dataset_cache.version(path, self.id_fields)
+        except OSError:
+            return None
+
+    def describe(self) -> Dict[str, Any]:
+        """Cheap metadata for health checks: one ``stat``, no parsing or sorting.
+
+        ``cache`` is ``warm`` (loaded and current), ``stale`` (file changed since
+        the last load; counts are from that load), ``cold`` (never loaded),
+        ``streaming`` (file too large to cache) or ``sqlite`` (served from the
+        imported table).
+        """
+        path = self._resolve_path(self.filename) if self.filename else None
+        info: Dict[str, Any] = {"file": path.name if path else None, "available": False,
+                                "record_count": None, "loaded_at": None,
+                                "fingerprint": None, "cache": "cold"}
+        if path is None:
+            return info
+        if self._uses_sqlite():
+            if (imported := sqlite_store.info(self.table)) is not None:
+                info.update(file=sqlite_store.path.name, available=True, record_count=imported["rows"],
+                            loaded_at=imported["imported_at"], fingerprint={"generation": imported["generation"]},
+                            cache="sqlite")
+            return info
+        try:
+            fp = fingerprint(path, bool(self.id_fields))
+        except OSError:
+            return info
+        info.update(available=True, fingerprint={"mtime_ns": fp[0], "size": fp[1]})
+        if fp[1] > settings.STREAMING_THRESHOLD_BYTES:
+            info["cache"] = "streaming"
+        elif (ds := dataset_cache.entry(path)) is not None:
+            current = fp if dataset_cache.shared is None else dataset_cache.version(path, self.id_fields)
+            info.update(record_count=len(ds), loaded_at=ds.loaded_at,
+                        cache="warm" if ds.fingerprint == current else "stale")
+        return info
@@ -0,0 +1,399 @@
+"""Process-wide dataset cache — parse once, reload on mtime/size change.
+
+Datasets with a changelog (see ``app.connectors.changelog``) keep their parsed
+storage and get the changes layered on top; when only the changelog grew, a
+refresh layers just the new lines instead of reloading. With a shared store attached
+(see ``app.connectors.shared``) datasets are mapped from another process's
+published snapshots instead of parsed here.
+"""
+
+import logging, sys, threading, time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.connectors.changelog import apply_changes, changelog_path, key_map, log_fingerprint, read_changes
+from app.connectors.indexes import IndexFactory, build_indexes, select
+from app.connectors.columnar import ColumnStore
+from app.connectors.layered import LayeredList, sizeof
+from app.connectors.snapshot import load_snapshot
+from app.connectors.streaming import iter_records, load_records
+
+logger = logging.getLogger(__name__)
+
+# (mtime_ns, size) of the data file, plus (inode, size) of its changelog if it has one;
+# (generation,) for a dataset mapped from a shared store.
+Fingerprint = Tuple[int, ...]
+# Compact (flatten and re-index from memory) once changed rows make up 1/COMPACT_RATIO of a dataset.
+COMPACT_RATIO = 4
+
+
+@dataclass
+class Dataset:
+    path: Path
+    records: Sequence[Dict[str, Any]]
+    fingerprint: Fingerprint
+    # Estimated size of the records; ``nbytes`` adds the indexes.
+    record_bytes: int
+    loaded_at: float = field(default_factory=time.time)
+    indexes: Dict[str, Any] = field(default_factory=dict)
+    index_bytes: int = 0
+    # Changelog state: bytes applied so far, record key -> position, deleted (None) rows.
+    log_offset: int = 0
+    keys: Optional[Mapping[tuple, int]] = None
+    tombstones: int = 0
+
+    def __post_init__(self):
+        if self.indexes:
+            self.index_bytes = sum(map(sizeof, self.indexes.values()))
+
+    @property
+    def nbytes(self) -> int:
+        return self.record_bytes + self.index_bytes
+
+    def ensure_indexes(self, spec: Optional[Dict[str, IndexFactory]],
+                       previous: Optional["Dataset"] = None,
+                       changed: Optional[Iterable[int]] = None) -> "Dataset":
+        if spec and not spec.keys() <= self.indexes.keys():
+            # Swap in a new dict so concurrent readers never see a partial build.
+            indexes = build_indexes(self.records, spec, self.indexes, previous, changed)
+            self.index_bytes = sum(map(sizeof, indexes.values()))
+            self.indexes = indexes
+        return self
+
+    def rows(self, positions: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Records at ``positions`` (``None``: every live record)."""
+        if positions is None and self.tombstones:
+            return [r for r in self.records if r is not None]
+        return select(self.records, positions)
+
+    def __len__(self) -> int:
+        return len(self.records) - self.tombstones
+
+
+def fingerprint(path: Path, changes: bool = False) -> Fingerprint:
+    """``path``'s (mtime_ns, size), extended by its changelog's when ``changes``."""
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size) + (log_fingerprint(path) if changes else ())
+
+
+def _appended(previous: Dataset, fp: Fingerprint) -> bool:
+    """Whether ``fp`` differs from ``previous`` only by lines appended to its changelog
+    (same data file, same changelog inode, not shorter than what was applied)."""
+    old = previous.fingerprint
+    if old[:2] != fp[:2] or len(fp) < 4:
+        return False
+    return len(old) < 4 or (old[2] == fp[2] and fp[3] >= previous.log_offset)
+
+
+def estimate_size(records: List[Dict[str, Any]]) -> int:
+    """Rough resident size of a parsed dataset (dicts + values, keys are shared)."""
+    if isinstance(records, ColumnStore):
+        return records.nbytes
+    total = sys.getsizeof(records)
+    for r in records:
+        total += sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r.values())
+    return total
+
+
+def read_dataset(path: Path):
+    """Parse ``path`` into the configured storage (``DATASET_STORAGE``).
+
+    A fresh binary snapshot (``<name>.snap``) takes precedence when enabled.
+    """
+    if settings.SNAPSHOT_ENABLED and (store := load_snapshot(path)) is not None:
+        return store
+    if settings.DATASET_STORAGE == "columnar":
+        # Build straight from the record stream; the list of dicts never exists.
+        return ColumnStore(iter_records(path))
+    return load_records(path)
+
+
+def compacted(records: Sequence[Optional[Dict[str, Any]]]) -> Sequence[Dict[str, Any]]:
+    """The live rows of ``records`` in one flat store of the kind underneath any layers."""
+    base = records.base if isinstance(records, LayeredList) else records
+    rows = (r for r in records if r is not None)
+    return ColumnStore(rows) if isinstance(base, ColumnStore) else list(rows)
+
+
+def load_dataset(path: Path, fp: Fingerprint, indexes: Optional[Dict[str, IndexFactory]] = None,
+                 id_fields: Sequence[str] = (), previous: Optional[Dataset] = None) -> Dataset:
+    """Parse ``path`` and, when ``fp`` includes a changelog, layer all of it on top."""
+    records = read_dataset(path)
+    nbytes, offset, keys, tombstones = estimate_size(records), 0, None, 0
+    if len(fp) > 2:
+        try:
+            changes, offset = read_changes(changelog_path(path))
+        except FileNotFoundError:  # removed since the stat; the next lookup reloads
+            changes = []
+        keys = key_map(records, id_fields)
+        if changes:
+            records, keys, _, tombstones = apply_changes(records, changes, id_fields, keys)
+            nbytes += estimate_size(changes)
+            if records.overlay * COMPACT_RATIO > len(records):
+                records = compacted(records)
+                nbytes, keys, tombstones = estimate_size(records), key_map(records, id_fields), 0
+    return Dataset(path=path, records=records, fingerprint=fp, record_bytes=nbytes, log_offset=offset,
+                   keys=keys, tombstones=tombstones).ensure_indexes(indexes, previous=previous)
+
+
+class DatasetCache:
+    """LRU cache of parsed datasets bounded by an estimated memory budget.
+
+    Entries are keyed by resolved path and revalidated with a ``stat`` on every
+    lookup; a changed mtime or size triggers a reload. Paths registered with
+    :meth:`watch` skip that check: the background watcher calls :meth:`refresh`
+    and swaps the new version in, so requests never wait for a reload. A file
+    that fails to parse leaves the last good version in place.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.DATASET_CACHE_MAX_BYTES
+        self._entries: "OrderedDict[Path, Dataset]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[Path, threading.Lock] = {}
+        self._watched: set = set()
+        # Fingerprint of a version that failed to parse; the previous entry keeps serving.
+        self._failed: Dict[Path, Fingerprint] = {}
+        # SharedStore to map published datasets from, instead of parsing them here.
+        self.shared = None
+        self.hits = self.misses = self.reloads = self.deltas = self.evictions = self.failures = 0
+
+    def get(self, path: Path, indexes: Optional[Dict[str, IndexFactory]] = None,
+            id_fields: Sequence[str] = ()) -> Dataset:
+        """The dataset for ``path``; with ``id_fields`` its changelog is applied on top."""
+        path = Path(path).resolve()
+        if path in self._watched and (entry := self._fresh(path, None)) is not None:
+            return self._indexed(entry, indexes)
+        try:
+            fp = self.version(path, id_fields, wait=True)
+        except FileNotFoundError:
+            self.invalidate(path)
+            raise
+
+        if (entry := self._fresh(path, fp)) is not None:
+            return self._indexed(entry, indexes)
+
+        # One loader per file: concurrent misses wait for it instead of parsing again.
+        with self._loader(path):
+            if (entry := self._fresh(path, fp)) is not None:
+                return self._indexed(entry, indexes)
+            with self._lock:
+                entry = self._entries.get(path)
+            try:
+                dataset = self._build(path, fp, indexes, entry, id_fields)
+            except ValueError:
+                if entry is None:
+                    raise
+                return self._indexed(entry, indexes)
+            self._store(dataset)
+        return dataset
+
+    def refresh(self, path: Path, indexes: Optional[Dict[str, IndexFactory]] = None,
+                id_fields: Sequence[str] = ()) -> Optional[Dataset]:
+        """Load ``path`` in the calling thread if it changed since it was cached and
+        swap it in. Returns the new dataset, or ``None`` if nothing was swapped
+        (unchanged, unparseable, missing, or modified while being read)."""
+        path = Path(path).resolve()
+        try:
+            # With a shared store only published versions are swapped in.
+            fp = self.shared.version(path) if self.shared is not None else fingerprint(path, bool(id_fields))
+        except FileNotFoundError:
+            return None
+        if fp is None:
+            return None
+        with self._loader(path):
+            with self._lock:
+                entry = self._entries.get(path)
+            if entry is not None and fp in (entry.fingerprint, self._failed.get(path)):
+                return None
+            try:
+                dataset = self._build(path, fp, indexes, entry, id_fields)
+            except (ValueError, FileNotFoundError):
+                return None
+            try:
+                # Changelog growth during the read is fine: only complete lines up to
+                # ``log_offset`` were applied and the rest is picked up next time.
+                settled = len(fp) == 1 or fingerprint(path) == fp[:2]
+            except FileNotFoundError:
+                settled = False
+            if not settled:
+                logger.info("%s changed while loading; retrying on the next pass", path.name)
+                return None
+            self._store(dataset)
+        return dataset
+
+    def _build(self, path: Path, fp: Fingerprint, indexes: Optional[Dict[str, IndexFactory]],
+               previous: Optional[Dataset], id_fields: Sequence[str] = ()) -> Dataset:
+        if previous is not None and _appended(previous, fp):
+            return self._apply(path, fp, indexes, previous, id_fields)
+        with self._lock:
+            if previous is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+        try:
+            if len(fp) == 1:
+                dataset = self.shared.load(path, indexes, previous)
+            else:
+                dataset = load_dataset(path, fp, indexes, id_fields, previous)
+        except ValueError as e:
+            with self._lock:
+                self.failures += 1
+                if previous is not None:
+                    self._failed[path] = fp
+            if previous is not None:
+                logger.error("Could not reload %s (%s); keeping the version loaded at %s",
+                             path.name, e, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(previous.loaded_at)))
+            raise
+        logger.info("Cached %s (%d records, ~%d KiB)", path.name, len(dataset), dataset.nbytes // 1024)
+        return dataset
+
+    def _apply(self, path: Path, fp: Fingerprint, indexes: Optional[Dict[str, IndexFactory]],
+               previous: Dataset, id_fields: Sequence[str]) -> Dataset:
+        """``previous`` plus the changelog lines appended since it was built: only the
+        new lines are parsed, layered over its records and re-indexed at the changed
+        positions, so the cost follows the number of changes. Once the layers cover
+        1/COMPACT_RATIO of the rows the records are flattened and re-indexed instead."""
+        try:
+            changes, offset = read_changes(changelog_path(path), previous.log_offset)
+        except FileNotFoundError:  # removed since the stat; the next lookup reloads
+            changes, offset = [], previous.log_offset
+        with self._lock:
+            self.deltas += 1
+        keys = previous.keys if previous.keys is not None else key_map(previous.records, id_fields)
+        records, keys, changed, deleted = apply_changes(previous.records, changes, id_fields, keys)
+        tombstones = previous.tombstones + deleted
+        dataset = Dataset(path=path, records=records, fingerprint=fp,
+                          record_bytes=previous.record_bytes + estimate_size(changes),
+                          log_offset=offset, keys=keys, tombstones=tombstones)
+        if records.overlay * COMPACT_RATIO > len(records):
+            dataset.records = compacted(records)
+            dataset.record_bytes = estimate_size(dataset.records)
+            dataset.keys, dataset.tombstones = key_map(dataset.records, id_fields), 0
+            logger.info("Compacted %s (%d changed rows flattened, %d deleted rows dropped)",
+                        path.name, records.overlay, tombstones)
+            return dataset.ensure_indexes(indexes)
+        logger.info("Applied %d changes to %s", len(changes), path.name)
+        return dataset.ensure_indexes(indexes, previous=previous, changed=changed)
+
+    def version(self, path: Path, id_fields: Sequence[str] = (), wait: bool = False) -> Fingerprint:
+        """The fingerprint a fresh entry for ``path`` has: the generation it was last
+        published at when a shared store is attached (``wait``: give the loader time
+        to publish it first), else the file's own."""
+        if self.shared is not None and (fp := self.shared.version(path, wait)) is not None:
+            return fp
+        return fingerprint(Path(path), bool(id_fields))
+
+    def watch(self, path: Path) -> None:
+        """Serve ``path`` from the cache without a ``stat`` per lookup; :meth:`refresh` updates it."""
+        with self._lock:
+            self._watched.add(Path(path).resolve())
+
+    def unwatch(self, path: Optional[Path] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._watched.clear()
+            else:
+                self._watched.discard(Path(path).resolve())
+
+    def is_watched(self, path: Path) -> bool:
+        return Path(path).resolve() in self._watched
+
+    def peek(self, path: Path, indexes: Optional[Dict[str, IndexFactory]] = None,
+             id_fields: Sequence[str] = ()) -> Optional[Dataset]:
+        """The cached dataset if it is fresh and already indexed; never loads or builds."""
+        path = Path(path).resolve()
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None:
+            return None
+        if path not in self._watched:
+            try:
+                fp = self.version(path, id_fields)
+            except OSError:
+                return None
+            if fp not in (entry.fingerprint, self._failed.get(path)):
+                return None
+        if indexes and not indexes.keys() <= entry.indexes.keys():
+            return None
+        return entry
+
+    def entry(self, path: Path) -> Optional[Dataset]:
+        """The cached dataset for ``path``, fresh or not, without any I/O."""
+        with self._lock:
+            return self._entries.get(Path(path).resolve())
+
+    def _fresh(self, path: Path, fp: Optional[Fingerprint]) -> Optional[Dataset]:
+        """The entry to serve for a file at ``fp`` (``None``: whatever is cached)."""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or fp not in (None, entry.fingerprint, self._failed.get(path)):
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry
+
+    def _loader(self, path: Path) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(path, threading.Lock())
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._failed.clear()
+            else:
+                self._entries.pop(Path(path).resolve(), None)
+                self._failed.pop(Path(path).resolve(), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "deltas": self.deltas,
+                "evictions": self.evictions,
+                "failures": self.failures,
+                "watched": len(self._watched),
+            }
+
+    @property
+    def current_bytes(self) -> int:
+        return sum(d.nbytes for d in self._entries.values())
+
+    def _store(self, dataset: Dataset) -> None:
+        with self._lock:
+            self._failed.pop(dataset.path, None)
+            self._entries.pop(dataset.path, None)
+            if dataset.nbytes > self.max_bytes:
+                logger.warning("%s exceeds cache budget (%d > %d bytes); not cached",
+                               dataset.path.name, dataset.nbytes, self.max_bytes)
+                return
+            self._entries[dataset.path] = dataset
+            self._evict()
+
+    def _indexed(self, entry: Dataset, indexes: Optional[Dict[str, IndexFactory]]) -> Dataset:
+        """``entry`` with ``indexes`` built; indexes added to a cached entry count against the budget."""
+        before = entry.nbytes
+        entry.ensure_indexes(indexes)
+        if entry.nbytes > before:
+            with self._lock:
+                self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the budget holds (call with the lock)."""
+        while self._entries and self.current_bytes > self.max_bytes:
+            evicted, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            logger.info("Evicted %s from dataset cache", evicted.name)
+
+
+dataset_cache = DatasetCache()
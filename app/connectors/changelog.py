@@ -0,0 +1,134 @@
+"""Append-only NDJSON changelogs applied on top of a data file.
+
+``support_tickets.changes.ndjson`` next to ``support_tickets.json`` holds one
+change per line. A record is an upsert keyed by the connector's ``id_fields``
+(it replaces the row with that key in place, or is appended); a line with
+``"_deleted": true`` and the key fields deletes that row. Where the data file
+repeats a key, the first row with it is the one changed (a streamed pass can
+only know that one), and its other rows are left as they are. The dataset cache
+remembers how many bytes it has applied, so a refresh parses only the lines
+appended since and layers them over the records and indexes it already has
+(see ``app.connectors.layered``).
+"""
+
+import json, logging, os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from app.connectors.layered import REMOVED, LayeredList, LayeredMap
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".changes.ndjson"
+DELETED = "_deleted"
+
+
+def changelog_path(source: Path) -> Path:
+    return Path(source).with_name(Path(source).name.split(".")[0] + SUFFIX)
+
+
+def log_fingerprint(source: Path) -> Tuple[int, ...]:
+    """(inode, size) of ``source``'s changelog; ``()`` if it has none."""
+    try:
+        st = os.stat(changelog_path(source))
+    except FileNotFoundError:
+        return ()
+    return st.st_ino, st.st_size
+
+
+def read_changes(path: Path, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """Complete lines after byte ``offset`` and the offset just past the last one.
+
+    A final line without a newline is still being written and is left for the
+    next read; malformed lines are logged and skipped.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    changes = []
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            change = json.loads(line)
+        except ValueError as e:
+            logger.error("Skipping malformed change in %s: %s", Path(path).name, e)
+            continue
+        if isinstance(change, dict):
+            changes.append(change)
+    return changes, offset + end
+
+
+def key_map(records: Sequence[Optional[Dict[str, Any]]], fields: Sequence[str]) -> Dict[tuple, int]:
+    """Record key -> position (the first row wins for duplicate keys, as in :func:`overlay`)."""
+    keys: Dict[tuple, int] = {}
+    for pos, r in enumerate(records):
+        if r is not None:
+            keys.setdefault(tuple(r.get(f) for f in fields), pos)
+    return keys
+
+
+def apply_changes(records: Sequence, changes: Iterable[Dict[str, Any]], fields: Sequence[str],
+                  keys: Mapping[tuple, int]) -> Tuple[LayeredList, LayeredMap, Set[int], int]:
+    """New versions of ``records`` and ``keys`` with ``changes`` applied; deleted rows
+    become ``None``. The inputs are left as they are and only the changes are copied.
+
+    Returns the records, the keys, the changed positions and the number of rows deleted.
+    """
+    rows: Dict[int, Any] = {}
+    moved: Dict[tuple, Any] = {}  # key -> new position, or REMOVED
+    length, deleted = len(records), 0
+    for change in changes:
+        key = tuple(change.get(f) for f in fields)
+        if all(v is None for v in key):
+            logger.warning("Skipping change without %s: %s", "/".join(fields), change)
+            continue
+        pos = moved[key] if key in moved else keys.get(key)
+        if pos is REMOVED:
+            pos = None
+        if change.get(DELETED):
+            if pos is not None:
+                rows[pos] = None
+                moved[key] = REMOVED
+                deleted += 1
+            continue
+        if pos is None:
+            pos = moved[key] = length
+            length += 1
+        rows[pos] = change
+    return (LayeredList.over(records).patched(rows, length), LayeredMap.over(keys).patched(moved),
+            set(rows), deleted)
+
+
+def overlay(records: Iterable[Dict[str, Any]], changes: List[Dict[str, Any]],
+            fields: Sequence[str]) -> Iterator[Dict[str, Any]]:
+    """Streaming form of :func:`apply_changes`: the same rows in the same order,
+    without holding ``records`` in memory."""
+    # key -> [sequence number it was (re-)appended at, latest upsert, ever deleted,
+    #         row with the key seen in ``records``]
+    state: Dict[tuple, list] = {}
+    for seq, change in enumerate(changes):
+        key = tuple(change.get(f) for f in fields)
+        if all(v is None for v in key):
+            continue
+        entry = state.get(key)
+        if change.get(DELETED):
+            state[key] = [None, None, True, False]
+        elif entry is None:
+            state[key] = [seq, change, False, False]
+        else:
+            entry[0] = seq if entry[0] is None else entry[0]
+            entry[1] = change
+    for r in records:
+        entry = state.get(tuple(r.get(f) for f in fields))
+        if entry is None or entry[3]:  # unchanged, or a later row repeating a changed key
+            yield r
+            continue
+        entry[3] = True
+        if not entry[2]:
+            yield entry[1]
+    # Upserts of keys the records lack, and upserts after a delete, are appended.
+    appended = [e for e in state.values() if e[1] is not None and (e[2] or not e[3])]
+    for entry in sorted(appended, key=lambda e: e[0]):
+        yield entry[1]
@@ -0,0 +1,208 @@
+"""Columnar, array-backed record store — a compact alternative to a list of dicts.
+
+Enum-like columns are dictionary-encoded into small-int arrays, homogeneous
+int/float columns live in typed arrays and high-cardinality strings are packed
+into one buffer. Rows are exposed as lightweight read-only ``Row`` mappings;
+a real dict is only built when a row leaves the store (``dict(row)``).
+"""
+
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, Iterator, List
+
+MISSING = object()
+
+# Dictionary-encode a column when it has at most this many distinct values
+# and they make up no more than 1/DICT_MAX_RATIO of the rows.
+DICT_MAX_VALUES = 65535
+DICT_MAX_RATIO = 4
+
+
+class IntColumn:
+    def __init__(self, values: List[int]):
+        self.data = array("q", values)
+
+    @classmethod
+    def wrap(cls, data) -> "IntColumn":
+        """Column over an existing buffer (e.g. a memory-mapped ``memoryview``)."""
+        col = object.__new__(cls)
+        col.data = data
+        return col
+
+    def __getitem__(self, pos: int) -> Any:
+        return self.data[pos]
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.itemsize * len(self.data)
+
+
+class FloatColumn(IntColumn):
+    def __init__(self, values: List[float]):
+        self.data = array("d", values)
+
+
+class DictColumn:
+    """Small-int codes into a table of distinct values (``MISSING`` included)."""
+
+    def __init__(self, values: List[Any], table: Dict[Any, int]):
+        self.values = [v for (_, v), _ in sorted(table.items(), key=lambda t: t[1])]
+        typecode = "B" if len(self.values) <= 0xFF else "H"
+        self.codes = array(typecode, (table[(type(v), v)] for v in values))
+
+    @classmethod
+    def wrap(cls, codes, values: List[Any]) -> "DictColumn":
+        col = object.__new__(cls)
+        col.codes, col.values = codes, values
+        return col
+
+    def __getitem__(self, pos: int) -> Any:
+        return self.values[self.codes[pos]]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes)
+
+
+class TextColumn:
+    """All strings concatenated into one buffer with an offsets array."""
+
+    def __init__(self, values: List[str]):
+        self.text = "".join(values)
+        self.offsets = array("Q", [0])
+        end = 0
+        for v in values:
+            end += len(v)
+            self.offsets.append(end)
+
+    def __getitem__(self, pos: int) -> Any:
+        return self.text[self.offsets[pos]:self.offsets[pos + 1]]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.text.encode("utf-8")) + 8 * len(self.offsets)
+
+
+class ObjectColumn:
+    def __init__(self, values: List[Any]):
+        self.data = values
+
+    def __getitem__(self, pos: int) -> Any:
+        return self.data[pos]
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.data) + sum(sys.getsizeof(v) for v in self.data if v is not MISSING)
+
+
+def build_column(values: List[Any]):
+    kinds = {type(v) for v in values}
+    try:
+        if kinds == {int}:
+            return IntColumn(values)
+        if kinds == {float}:
+            return FloatColumn(values)
+    except OverflowError:
+        pass
+    # Key on (type, value) so 1, 1.0 and True stay distinct.
+    table: Dict[Any, int] = {}
+    try:
+        for v in values:
+            key = (type(v), v)
+            if key not in table:
+                table[key] = len(table)
+                if len(table) > DICT_MAX_VALUES:
+                    break
+    except TypeError:
+        return ObjectColumn(values)
+    if len(table) <= DICT_MAX_VALUES and len(table) * DICT_MAX_RATIO <= max(len(values), DICT_MAX_RATIO):
+        return DictColumn(values, table)
+    if kinds == {str}:
+        return TextColumn(values)
+    return ObjectColumn(values)
+
+
+class Row(Mapping):
+    """Read-only view of one row of a :class:`ColumnStore`."""
+
+    __slots__ = ("_store", "_pos")
+
+    def __init__(self, store: "ColumnStore", pos: int):
+        self._store = store
+        self._pos = pos
+
+    def __getitem__(self, field: str) -> Any:
+        col = self._store.columns.get(field)
+        value = MISSING if col is None else col[self._pos]
+        if value is MISSING:
+            raise KeyError(field)
+        return value
+
+    def get(self, field: str, default: Any = None) -> Any:
+        col = self._store.columns.get(field)
+        if col is None:
+            return default
+        value = col[self._pos]
+        return default if value is MISSING else value
+
+    def __iter__(self) -> Iterator[str]:
+        pos = self._pos
+        return (f for f, col in self._store.columns.items() if col[pos] is not MISSING)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class ColumnStore(Sequence):
+    """Records stored column-wise; indexing returns :class:`Row` views."""
+
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        raw: Dict[str, List[Any]] = {}
+        n = 0
+        for r in records:
+            for field, value in r.items():
+                col = raw.get(field)
+                if col is None:
+                    col = raw[field] = [MISSING] * n
+                col.append(value)
+            n += 1
+            for col in raw.values():
+                if len(col) < n:
+                    col.append(MISSING)
+        self._len = n
+        self.columns = {}
+        for field in list(raw):
+            self.columns[field] = build_column(raw.pop(field))
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any], length: int) -> "ColumnStore":
+        store = object.__new__(cls)
+        store.columns, store._len = columns, length
+        return store
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Row]:
+        return (Row(self, p) for p in range(self._len))
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [Row(self, p) for p in range(*pos.indices(self._len))]
+        if pos < 0:
+            pos += self._len
+        if not 0 <= pos < self._len:
+            raise IndexError("ColumnStore index out of range")
+        return Row(self, pos)
+
+    def take(self, positions: Iterable[int]) -> List[Row]:
+        """``[self[p] for p in positions]`` without the per-position checks."""
+        return [Row(self, p) for p in positions]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.nbytes for col in self.columns.values())
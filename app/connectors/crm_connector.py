@@ -1,8 +1,11 @@
 """CRM data connector — customers with status/search/customer_id filtering."""
 
-import logging
-from typing import Any, Dict, List
-from app.connectors.base import BaseConnector
+import json, logging
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+from app.connectors.base import BaseConnector, Selection
+from app.connectors.indexes import HashIndex, SortedIndex, TrigramIndex, intersect, lower_key, str_key
+from app.connectors.sqlite import Table, sort_value, sqlite_store
+from app.connectors.summary import SummaryIndex
 from app.models.common import DataType
 
 logger = logging.getLogger(__name__)
@@ -12,35 +15,82 @@ class CRMConnector(BaseConnector):
     source_name = "crm"
     description = "Retrieve CRM customer data with optional filters."
     data_type = DataType.TABULAR
+    filename = "customers.json"
+    index_fields = {"status": HashIndex.on(lower_key), "customer_id": HashIndex.on(str_key),
+                    "created_at": SortedIndex.on(), "search": TrigramIndex.on(("name", "email")),
+                    "summary": SummaryIndex.on(labels=("status",))}
+    id_fields = ("customer_id",)
+    table = Table("customers", keys={"status": lower_key, "customer_id": str_key},
+                  order={f: sort_value(f) for f in ("created_at", "name", "customer_id")},
+                  indexes=("status, by_created_at DESC", "customer_id", "by_created_at DESC", "by_name DESC",
+                           "by_customer_id DESC"),
+                  search=("name", "email"), labels=("status",))
 
     def fetch(self, **filters) -> List[Dict[str, Any]]:
-        records = self._load_json("customers.json")
+        return self.select(**filters).sorted()
 
-        if status := filters.get("status"):
-            records = [r for r in records if r.get("status", "").lower() == status.lower()]
+    def select(self, **filters) -> Selection:
+        # Sort by created_at desc
+        sort_field = filters.get("sort_by", "created_at")
+        sort_order = filters.get("sort_order", "desc")
+        if (queried := self._queried(filters, sort_field, sort_order)) is not None:
+            return queried
+        if (streamed := self._streamed(filters, sort_field, sort_order)) is not None:
+            return streamed
 
-        if cid := filters.get("customer_id"):
-            records = [r for r in records if str(r.get("customer_id")) == str(cid)]
+        ds = self._load_dataset(self.filename, self.index_fields)
+        positions = intersect(ds.indexes, {"status": filters.get("status"),
+                                           "customer_id": filters.get("customer_id")})
 
         if search := filters.get("search"):
-            term = search.lower()
-            records = [r for r in records
-                       if term in r.get("name", "").lower()
-                       or term in r.get("email", "").lower()]
+            positions = ds.indexes["search"].search(ds.records, search, positions)
 
-        # Sort by created_at desc
-        sort_field = filters.get("sort_by", "created_at")
-        sort_order = filters.get("sort_order", "desc")
-        records.sort(key=lambda r: r.get(sort_field, ""), reverse=(sort_order == "desc"))
+        selection = self._order(ds, positions, sort_field, sort_order)
+        selection.summary = self._summary(ds, filters, positions)
 
-        logger.info("CRM fetch: %d results (filters=%s)", len(records), filters)
-        return records
+        logger.info("CRM fetch: %d results (filters=%s)", len(selection), filters)
+        return selection
+
+    def lookup(self, customer_ids: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """``str(customer_id)`` -> customer record for the given ids (hash-join probe side)."""
+        wanted = {str(cid) for cid in customer_ids}
+        if self._uses_sqlite():
+            rows = sqlite_store.execute(
+                f"SELECT customer_id, doc, min(pos) FROM customers WHERE customer_id IN"
+                f" ({', '.join('?' * len(wanted))}) GROUP BY customer_id", wanted)
+            return {cid: json.loads(doc) for cid, doc, _ in rows}
+        if self._is_streaming():
+            rows = self._stream_matches(lambda r: str(r.get("customer_id")) in wanted)
+            return {str(r.get("customer_id")): r for r in reversed(rows)}
+        ds = self._load_dataset(self.filename, self.index_fields)
+        postings = ds.indexes["customer_id"].postings
+        return {cid: ds.records[postings[cid][0]] for cid in wanted if postings.get(cid)}
+
+    def _predicate(self, filters: Dict[str, Any]) -> Callable[[Dict[str, Any]], bool]:
+        checks = []
+        if status := filters.get("status"):
+            status = status.lower()
+            checks.append(lambda r: r.get("status", "").lower() == status)
+        if cid := filters.get("customer_id"):
+            checks.append(lambda r: str(r.get("customer_id")) == str(cid))
+        if search := filters.get("search"):
+            term = search.lower()
+            checks.append(lambda r: term in r.get("name", "").lower()
+                          or term in r.get("email", "").lower())
+        return lambda r: all(check(r) for check in checks)
+
+    def _where(self, filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+        if search := filters.get("search"):
+            clause, params = self.table.search_clause(search)
+            return [clause], params
+        return [], []
 
     def _get_parameters(self) -> Dict[str, Any]:
         return {
             "status": {"type": "string", "description": "Filter by status", "enum": ["active", "inactive"]},
             "customer_id": {"type": "integer", "description": "Filter by customer ID"},
             "search": {"type": "string", "description": "Search name or email"},
+            "expand": {"type": "string", "description": "Attach ticket counts (total/open/high)", "enum": ["tickets"]},
             "sort_by": {"type": "string", "description": "Sort field", "default": "created_at"},
             "sort_order": {"type": "string", "description": "Sort direction", "enum": ["asc", "desc"]},
         }
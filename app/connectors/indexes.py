@@ -0,0 +1,459 @@
+"""Secondary indexes over loaded datasets — hash (equality) and sorted (range).
+
+Rows may be ``None`` (deleted by a changelog, see ``app.connectors.changelog``);
+indexes leave them out. ``updated(records, changed)`` returns a new version of
+an index for records in which only the ``changed`` positions differ; the live
+index is never modified, since requests may still be reading it. Hash, trigram
+and summary indexes layer the change over the live version (see
+``app.connectors.layered``); sorted groups are extended past the live version's
+end when a change only adds rows after their tail, and copied otherwise.
+``pack()`` / ``attach(buffers)`` move an index through flat buffers (see
+``app.connectors.packed``).
+"""
+
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set
+
+from app.connectors.columnar import ColumnStore
+from app.connectors.layered import REMOVED, LayeredList, LayeredMap, MergedPositions, sizeof
+from app.connectors.packed import (PackedCodes, PackedPostings, pack_codes, pack_json, pack_postings,
+                                   pack_values, unpack_json, unpack_values)
+
+KeyFunc = Callable[[Any], Any]
+IndexFactory = Callable[[str, Sequence[Dict[str, Any]]], Any]
+
+
+def lower_key(value: Any) -> str:
+    return "" if value is None else str(value).lower()
+
+
+def str_key(value: Any) -> str:
+    return str(value)
+
+
+class HashIndex:
+    """Normalised field value -> ascending row positions, plus each row's value.
+
+    With string keys (the usual case) both are kept in the flat buffers that
+    :meth:`pack` produces — about 8 bytes a row plus the distinct keys — rather
+    than a Python object per row.
+    """
+
+    def __init__(self, field: str, records: Sequence[Dict[str, Any]], key: KeyFunc = lower_key):
+        self.field = field
+        self.key = key
+        keys: List[Any] = []
+        postings: Dict[Any, List[int]] = {}
+        for pos, r in enumerate(records):
+            if r is None:
+                keys.append(None)
+                continue
+            k = key(r.get(field))
+            keys.append(k)
+            postings.setdefault(k, []).append(pos)
+        self.keys: Sequence[Any] = keys
+        self.postings: Mapping = postings
+        if (packed := self.pack()) is not None:
+            self.attach(packed)
+
+    @classmethod
+    def on(cls, key: KeyFunc = lower_key) -> IndexFactory:
+        return partial(cls, key=key)
+
+    def updated(self, records: Sequence[Dict[str, Any]],
+                changed: Optional[Iterable[int]] = None) -> "HashIndex":
+        if changed is None:
+            return HashIndex(self.field, records, self.key)
+        index = object.__new__(HashIndex)
+        index.field, index.key = self.field, self.key
+        keys, layer, moves = self.keys, {}, {}
+        for pos in changed:
+            r = records[pos]
+            new = None if r is None else self.key(r.get(self.field))
+            old = keys[pos] if pos < len(keys) else None
+            if old == new and pos < len(keys):
+                continue
+            layer[pos] = new
+            if old != new:
+                for k, i in ((old, 1), (new, 0)):
+                    if k is not None:
+                        moves.setdefault(k, ([], []))[i].append(pos)
+        postings = {}
+        for k, (added, removed) in moves.items():
+            bucket = MergedPositions.patch(self.postings.get(k, ()), added, removed)
+            postings[k] = bucket if len(bucket) else REMOVED
+        index.keys = LayeredList.over(keys).patched(layer, len(records))
+        index.postings = LayeredMap.over(self.postings).patched(postings)
+        return index
+
+    def pack(self) -> Optional[List[bytes]]:
+        """Flat buffers for :meth:`attach`; ``None`` unless every key is a string."""
+        if not all(isinstance(k, str) for k in self.postings):
+            return None
+        return pack_postings(self.postings) + [pack_codes(self.keys, sorted(self.postings))]
+
+    def attach(self, buffers: List[Any]) -> "HashIndex":
+        """Serve this (empty) index from :meth:`pack` buffers without copying them."""
+        self.postings = PackedPostings(buffers[:4])
+        self.keys = PackedCodes(buffers[4], self.postings.table)
+        return self
+
+    def lookup(self, value: Any) -> List[int]:
+        return list(self.postings.get(self.key(value), ()))
+
+    @property
+    def nbytes(self) -> int:
+        return sizeof(self.postings) + sizeof(self.keys)
+
+    def counts(self) -> Dict[Any, int]:
+        return {k: len(v) for k, v in self.postings.items()}
+
+
+class SortedIndex:
+    """Row positions ordered by ``field``, optionally partitioned by another field.
+
+    Each partition keeps a parallel sorted value array so range filters are two
+    bisects and the matching slice is already in sort order. Ties stay in file
+    order in both directions, matching ``list.sort(reverse=...)`` stability.
+    A group is ``(values, positions, n)``: a version reads the first ``n``
+    entries, so rows that sort after the tail are appended to lists shared with
+    the previous version instead of copying them.
+    """
+
+    ALL = object()
+
+    def __init__(self, field: str, records: Sequence[Dict[str, Any]],
+                 partition: Optional[str] = None, partition_key: KeyFunc = lower_key):
+        self.field = field
+        self.partition = partition
+        self.partition_key = partition_key
+        self._records = records
+        order = sorted((p for p, r in enumerate(records) if r is not None),
+                       key=lambda p: records[p].get(field, ""))
+        self.groups: Dict[Any, tuple] = {self.ALL: self._group(order, records)}
+        if partition:
+            parts: Dict[Any, List[int]] = {}
+            for p in order:
+                parts.setdefault(partition_key(records[p].get(partition)), []).append(p)
+            for k, positions in parts.items():
+                self.groups[k] = self._group(positions, records)
+
+    @classmethod
+    def on(cls, partition: Optional[str] = None, partition_key: KeyFunc = lower_key) -> IndexFactory:
+        return partial(cls, partition=partition, partition_key=partition_key)
+
+    def _group(self, positions: List[int], records) -> tuple:
+        return [records[p].get(self.field, "") for p in positions], positions, len(positions)
+
+    def _group_keys(self, record: Dict[str, Any]) -> tuple:
+        if self.partition is None:
+            return (self.ALL,)
+        return self.ALL, self.partition_key(record.get(self.partition))
+
+    def updated(self, records: Sequence[Dict[str, Any]],
+                changed: Optional[Iterable[int]] = None) -> "SortedIndex":
+        if changed is None:
+            return SortedIndex(self.field, records, self.partition, self.partition_key)
+        index = object.__new__(SortedIndex)
+        index.field, index.partition, index.partition_key = self.field, self.partition, self.partition_key
+        index._records = records
+        index.groups = dict(self.groups)
+        removed: Dict[Any, list] = {}
+        added: Dict[Any, list] = {}
+        old_records, field = self._records, self.field
+        for pos in changed:
+            old = old_records[pos] if pos < len(old_records) else None
+            new = records[pos]
+            if (old is not None and new is not None and old.get(field, "") == new.get(field, "")
+                    and self._group_keys(old) == self._group_keys(new)):
+                continue
+            if old is not None:
+                for k in self._group_keys(old):
+                    removed.setdefault(k, []).append((old.get(field, ""), pos))
+            if new is not None:
+                for k in self._group_keys(new):
+                    added.setdefault(k, []).append((new.get(field, ""), pos))
+        for k in removed.keys() | added.keys():
+            index.groups[k] = _patched(self.groups.get(k), removed.get(k, []), sorted(added.get(k, [])))
+        return index
+
+    def pack(self) -> Optional[List[bytes]]:
+        """Flat buffers for :meth:`attach`; ``None`` if a group mixes strings and numbers."""
+        groups, buffers = [], []
+        for k, (values, positions, n) in self.groups.items():
+            packed = pack_values(values[:n])
+            if packed is None:
+                return None
+            kind, bufs = packed
+            groups.append([None if k is self.ALL else k, kind, len(bufs)])
+            buffers += bufs + [array("I", positions[:n]).tobytes()]
+        return [pack_json(groups)] + buffers
+
+    def attach(self, buffers: List[Any]) -> "SortedIndex":
+        self.groups, i = {}, 1
+        for key, kind, n in unpack_json(buffers[0]):
+            positions = memoryview(buffers[i + n]).cast("I")
+            self.groups[self.ALL if key is None else key] = (
+                unpack_values(kind, buffers[i:i + n]), positions, len(positions))
+            i += n + 1
+        return self
+
+    @property
+    def nbytes(self) -> int:
+        # Listed values are the records' own objects, so only their slots count.
+        return sum((sys.getsizeof(values) if isinstance(values, list) else sizeof(values)) + sizeof(positions)
+                   for values, positions, _ in self.groups.values())
+
+    def scan(self, lo: Any = None, hi: Any = None, descending: bool = False,
+             group: Any = ALL) -> List[int]:
+        """Positions with ``lo <= value <= hi`` (bounds optional), sorted by value."""
+        if not descending:
+            values, positions, start, stop = self._bounds(lo, hi, group)
+            return positions[start:stop]
+        return list(self.iter(lo, hi, descending, group))
+
+    def iter(self, lo: Any = None, hi: Any = None, descending: bool = False,
+             group: Any = ALL) -> Iterator[int]:
+        """Lazy form of :meth:`scan` — callers can stop after the first page."""
+        values, positions, start, stop = self._bounds(lo, hi, group)
+        if not descending:
+            yield from islice(positions, start, stop)
+            return
+        end = stop
+        while end > start:
+            if isinstance(values, list):
+                run = end - 1
+                while run > start and values[run - 1] == values[end - 1]:
+                    run -= 1
+            else:  # packed values decode on access: bisect to the start of the run instead
+                run = bisect_left(values, values[end - 1], start, end - 1)
+            yield from positions[run:end]
+            end = run
+
+    def _bounds(self, lo, hi, group):
+        if group is not self.ALL:
+            group = self.partition_key(group)
+        values, positions, n = self.groups.get(group, ([], [], 0))
+        start = bisect_left(values, lo, 0, n) if lo is not None else 0
+        stop = bisect_right(values, hi, 0, n) if hi is not None else n
+        return values, positions, start, stop
+
+
+def _patched(group: Optional[tuple], removed: List[tuple], added: List[tuple]) -> tuple:
+    """``group`` without the ``(value, position)`` entries ``removed`` and with the
+    sorted ``added`` ones. Entries that all sort after the tail are appended in
+    place when no other version has appended to the lists yet; else they are copied."""
+    values, positions, n = group or ([], [], 0)
+    if (not removed and isinstance(values, list) and isinstance(positions, list)
+            and len(positions) == n and (n == 0 or (values[n - 1], positions[n - 1]) < added[0])):
+        values.extend(v for v, _ in added)
+        positions.extend(p for _, p in added)
+        return values, positions, n + len(added)
+    values, positions = list(values[:n]), list(positions[:n])
+    # Ties are in position order, so a row is found by bisecting its value's run.
+    for value, pos in removed:
+        i = bisect_left(positions, pos, bisect_left(values, value), bisect_right(values, value))
+        del values[i], positions[i]
+    for value, pos in added:
+        i = bisect_left(positions, pos, bisect_left(values, value), bisect_right(values, value))
+        values.insert(i, value)
+        positions.insert(i, pos)
+    return values, positions, len(positions)
+
+
+class TrigramIndex:
+    """Substring search over text fields through a trigram inverted index.
+
+    A term's trigrams narrow the rows to candidates, which are then checked
+    against the row's own fields so results match a plain
+    ``term in field.lower()`` scan. Terms shorter than three characters skip
+    the postings and scan the rows. The postings are kept packed (see
+    :class:`PackedPostings`), 4 bytes per entry; no lowered copy of the text is kept.
+    """
+
+    n = 3
+    sep = "\x00"
+
+    def __init__(self, field: str, records: Sequence[Dict[str, Any]],
+                 fields: Optional[Sequence[str]] = None):
+        self.field = field
+        self.fields = tuple(fields or (field,))
+        # The rows this version indexes, re-read by ``updated`` for the old text.
+        self._records: Optional[Sequence[Dict[str, Any]]] = records
+        postings: Dict[str, array] = {}
+        for pos, r in enumerate(records):
+            for g in self._grams(self._lower(r)):
+                bucket = postings.get(g)
+                if bucket is None:
+                    bucket = postings[g] = array("I")
+                bucket.append(pos)
+        self.postings: Mapping = PackedPostings(pack_postings(postings))
+
+    @classmethod
+    def on(cls, fields: Optional[Sequence[str]] = None) -> IndexFactory:
+        return partial(cls, fields=fields)
+
+    def _lower(self, record: Optional[Dict[str, Any]]) -> str:
+        if record is None:
+            return ""
+        # Fields are joined with NUL so a term can never match across a boundary.
+        return self.sep.join(str(record.get(f, "")).lower() for f in self.fields)
+
+    def _grams(self, text: str) -> Set[str]:
+        n = self.n
+        return {g for g in (text[i:i + n] for i in range(len(text) - n + 1)) if self.sep not in g}
+
+    def candidates(self, term: str) -> Optional[Set[int]]:
+        """Rows containing every trigram of ``term``; ``None`` if the term is too short."""
+        term = term.lower()
+        if len(term) < self.n or self.sep in term:
+            return None
+        buckets = [self.postings.get(term[i:i + self.n]) for i in range(len(term) - self.n + 1)]
+        if any(b is None for b in buckets):
+            return set()
+        buckets.sort(key=len)
+        found = set(buckets[0])
+        for b in buckets[1:]:
+            if not found:
+                break
+            if len(found) * 16 < len(b):  # few candidates left: bisect for each in the sorted array
+                found = {p for p in found if _has(b, p)}
+            else:  # one C-level pass over the array
+                found.intersection_update(b)
+        return found
+
+    def search(self, records: Sequence[Dict[str, Any]], term: str,
+               positions: Optional[List[int]] = None) -> List[int]:
+        """Positions (file order) whose fields contain ``term``, within ``positions`` if given."""
+        term = term.lower()
+        if self.sep in term:
+            return []
+        found = self.candidates(term)
+        if found is None:
+            if positions is None:  # every row: one pass instead of a lookup per row
+                return self._matching(term, enumerate(records))
+            pool = positions
+        elif positions is None:
+            pool = sorted(found)
+        elif len(found) < len(positions):
+            pool = sorted(found.intersection(positions))
+        else:
+            pool = [p for p in positions if p in found]
+        rows = records.take(pool) if isinstance(records, LayeredList) else [records[p] for p in pool]
+        return self._matching(term, zip(pool, rows))
+
+    def _matching(self, term: str, rows: Iterable[tuple]) -> List[int]:
+        """Positions of the ``(position, row)`` pairs with a field containing ``term``
+        (which holds no NUL, so this equals matching the joined text)."""
+        found, fields = [], self.fields
+        for pos, r in rows:
+            if r is None:
+                continue
+            for f in fields:
+                if term in str(r.get(f, "")).lower():
+                    found.append(pos)
+                    break
+        return found
+
+    def pack(self) -> List[bytes]:
+        return pack_postings(self.postings)
+
+    def attach(self, buffers: List[Any]) -> "TrigramIndex":
+        self.postings = PackedPostings(buffers[:4])
+        self._records = None
+        return self
+
+    @property
+    def nbytes(self) -> int:
+        return sizeof(self.postings)
+
+    def updated(self, records: Sequence[Dict[str, Any]],
+                changed: Optional[Iterable[int]] = None) -> "TrigramIndex":
+        """New version of this index re-tokenising only the ``changed`` rows whose
+        text differs; the posting arrays of the other trigrams are shared with
+        this one. Without ``changed`` (a reload) the index is rebuilt."""
+        old_records = self._records
+        if changed is None or old_records is None:
+            return TrigramIndex(self.field, records, self.fields)
+        index = object.__new__(TrigramIndex)
+        index.field, index.fields, index._records = self.field, self.fields, records
+        moves = {}
+        for pos in changed:
+            old = self._lower(old_records[pos]) if pos < len(old_records) else ""
+            new = self._lower(records[pos])
+            if new == old:
+                continue
+            old_grams, new_grams = self._grams(old), self._grams(new)
+            for g in old_grams - new_grams:
+                moves.setdefault(g, ([], []))[1].append(pos)
+            for g in new_grams - old_grams:
+                moves.setdefault(g, ([], []))[0].append(pos)
+        postings = {}
+        for g, (added, removed) in moves.items():
+            bucket = MergedPositions.patch(self.postings.get(g, ()), added, removed)
+            postings[g] = bucket if len(bucket) else REMOVED
+        index.postings = LayeredMap.over(self.postings).patched(postings)
+        return index
+
+
+def _has(positions: Sequence[int], pos: int) -> bool:
+    i = bisect_left(positions, pos)
+    return i < len(positions) and positions[i] == pos
+
+
+def intersect(indexes: Dict[str, Any], filters: Dict[str, Any]) -> Optional[List[int]]:
+    """Positions matching every ``field == value`` filter, in file order.
+
+    Starts from the shortest posting list and checks the remaining filters
+    against each index's per-row key, so cost is O(shortest posting list).
+    Returns ``None`` when no filter applies (i.e. "all rows").
+    """
+    terms = [(indexes[f], indexes[f].key(v)) for f, v in filters.items() if v]
+    if not terms:
+        return None
+    postings = [(idx.postings.get(k, []), idx, k) for idx, k in terms]
+    postings.sort(key=lambda t: len(t[0]))
+    base, _, _ = postings[0]
+    rest = [(idx.keys.codes, idx.keys.code(k)) if isinstance(idx.keys, PackedCodes) else (idx.keys, k)
+            for _, idx, k in postings[1:]]
+    if not rest:
+        return list(base)
+    if any(isinstance(keys, LayeredList) for keys, _ in rest):
+        # Patched by a changelog: read each index's keys for the candidates in one go.
+        positions = list(base)
+        for keys, k in rest:
+            values = keys.take(positions) if isinstance(keys, LayeredList) else [keys[p] for p in positions]
+            positions = [p for p, v in zip(positions, values) if v == k]
+        return positions
+    return [p for p in base if all(keys[p] == k for keys, k in rest)]
+
+
+def build_indexes(records: Sequence[Dict[str, Any]], spec: Dict[str, IndexFactory],
+                  existing: Optional[Dict[str, Any]] = None,
+                  previous: Optional[Any] = None,
+                  changed: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+    """Build missing indexes; ``previous`` (the dataset being replaced) lets
+    indexes that support it (``updated``) refresh incrementally instead —
+    touching only the ``changed`` positions when those are known."""
+    indexes = dict(existing or {})
+    for field, factory in spec.items():
+        if field in indexes:
+            continue
+        old = previous.indexes.get(field) if previous is not None else None
+        if hasattr(old, "updated"):
+            indexes[field] = old.updated(records, changed)
+        else:
+            indexes[field] = factory(field, records)
+    return indexes
+
+
+def select(records: Sequence[Dict[str, Any]], positions: Optional[Iterable[int]]) -> List[Dict[str, Any]]:
+    if positions is None:
+        return list(records)
+    if isinstance(records, (LayeredList, ColumnStore)):
+        return records.take(positions)
+    return [records[p] for p in positions]
@@ -0,0 +1,247 @@
+"""Persistent overlays — new versions of large sequences and maps in time
+proportional to the change.
+
+A changelog delta (see ``app.connectors.changelog``) must leave the version that
+requests are reading untouched. Instead of copying a whole record list, key map
+or per-row index array, it pushes a layer of replacements on top of the
+previous version and shares everything else with it. Layers merge like a binary
+counter (a layer is folded into the one below once it is as large), so a
+version has O(log changes) layers and each change is copied O(log changes)
+times. Posting lists are patched the same way and merged into a list when first
+read. The dataset cache flattens a dataset and rebuilds its indexes once its
+layers cover a quarter of it (``COMPACT_RATIO``).
+"""
+
+import sys
+from collections.abc import Mapping, Sequence
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+REMOVED = object()  # layer value of a key removed from a LayeredMap
+
+
+def sizeof(value: Any) -> int:
+    """Rough resident bytes of an index part without walking its rows: ``nbytes``
+    where it has one (flat buffers, overlays), else ``sys.getsizeof`` plus, for a
+    list, its length times its first item and, for a tuple or dict, each item."""
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, list) and value:
+        size += len(value) * sizeof(value[0])
+    elif isinstance(value, tuple):
+        size += sum(map(sizeof, value))
+    elif isinstance(value, dict):
+        size += sum(map(sizeof, value.values()))
+    return size
+
+
+def _push(layers: Tuple[dict, ...], layer: dict) -> Tuple[dict, ...]:
+    if not layer:
+        return layers
+    layers = [*layers, layer]
+    while len(layers) > 1 and len(layers[-2]) <= len(layers[-1]):
+        top = layers.pop()
+        layers[-1] = {**layers[-1], **top}
+    return tuple(layers)
+
+
+def _merged(layers: Tuple[dict, ...]) -> dict:
+    if len(layers) == 1:
+        return layers[0]
+    merged: dict = {}
+    for layer in layers:
+        merged.update(layer)
+    return merged
+
+
+class LayeredList(Sequence):
+    """``base`` (any sequence: a list, a ``ColumnStore``, packed buffers) with
+    positions replaced or appended by layers of ``position -> value``."""
+
+    __slots__ = ("base", "layers", "length", "_changes")
+
+    def __init__(self, base: Sequence, layers: Tuple[dict, ...] = (), length: Optional[int] = None):
+        self.base, self.layers = base, layers
+        self.length = len(base) if length is None else length
+        self._changes: Optional[dict] = None
+
+    @classmethod
+    def over(cls, values: Sequence) -> "LayeredList":
+        return values if isinstance(values, LayeredList) else cls(values)
+
+    def patched(self, layer: Dict[int, Any], length: Optional[int] = None) -> "LayeredList":
+        """A new version with ``layer`` on top (and ``length`` items); this one is unchanged.
+        Every position at or beyond ``len(base)`` must be in some layer."""
+        return LayeredList(self.base, _push(self.layers, layer), self.length if length is None else length)
+
+    @property
+    def overlay(self) -> int:
+        """Positions held in layers."""
+        return sum(map(len, self.layers))
+
+    @property
+    def nbytes(self) -> int:
+        size = sizeof(self.base)
+        for layer in self.layers:
+            size += sys.getsizeof(layer) + len(layer) * sizeof(next(iter(layer.values())))
+        return size
+
+    def changes(self) -> dict:
+        """Every layered position and its value (merged once per version)."""
+        if self._changes is None:
+            self._changes = _merged(self.layers) if self.layers else {}
+        return self._changes
+
+    def take(self, positions: Iterable[int]) -> List[Any]:
+        """``[self[p] for p in positions]`` without a method call per position."""
+        base, changes = self.base, self.changes()
+        return [changes[p] if p in changes else base[p] for p in positions]
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[p] for p in range(*pos.indices(self.length))]
+        if pos < 0:
+            pos += self.length
+        if not 0 <= pos < self.length:
+            raise IndexError("LayeredList index out of range")
+        for layer in reversed(self.layers):
+            if pos in layer:
+                return layer[pos]
+        return self.base[pos]
+
+    def __iter__(self) -> Iterator[Any]:
+        base = self.base if self.length >= len(self.base) else islice(self.base, self.length)
+        if not self.layers:
+            return iter(base)
+        # One flat pass (a list of references) beats a generator step per row.
+        values = list(base)
+        values.extend([None] * (self.length - len(values)))
+        for pos, value in self.changes().items():
+            values[pos] = value
+        return iter(values)
+
+
+class LayeredMap(Mapping):
+    """``base`` (any mapping) with keys set, or removed (``REMOVED``), by layers."""
+
+    __slots__ = ("base", "layers")
+
+    def __init__(self, base: Mapping, layers: Tuple[dict, ...] = ()):
+        self.base, self.layers = base, layers
+
+    @classmethod
+    def over(cls, mapping: Mapping) -> "LayeredMap":
+        return mapping if isinstance(mapping, LayeredMap) else cls(mapping)
+
+    def patched(self, layer: Dict[Any, Any]) -> "LayeredMap":
+        return LayeredMap(self.base, _push(self.layers, layer))
+
+    def __getitem__(self, key: Any) -> Any:
+        for layer in reversed(self.layers):
+            if key in layer:
+                value = layer[key]
+                if value is REMOVED:
+                    raise KeyError(key)
+                return value
+        return self.base[key]
+
+    @property
+    def nbytes(self) -> int:
+        return sizeof(self.base) + sum(sys.getsizeof(layer) + sum(sizeof(v) for v in layer.values() if v is not REMOVED)
+                                       for layer in self.layers)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: Any) -> bool:
+        for layer in reversed(self.layers):
+            if key in layer:
+                return layer[key] is not REMOVED
+        return key in self.base
+
+    def __iter__(self) -> Iterator[Any]:
+        changes = _merged(self.layers) if self.layers else {}
+        for key in self.base:
+            if key not in changes:
+                yield key
+        for key, value in changes.items():
+            if value is not REMOVED:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def _compose(older: Tuple[frozenset, frozenset], newer: Tuple[frozenset, frozenset]) -> Tuple[frozenset, frozenset]:
+    # Each step removes positions it holds and adds positions it lacks, so the
+    # removals of ``newer`` that ``older`` added just cancel them.
+    (a1, r1), (a2, r2) = older, newer
+    return (a1 - r2) | a2, r1 | (r2 - a1)
+
+
+class MergedPositions(Sequence):
+    """Ascending positions: ``base`` (a sorted sequence or a set) minus and plus the
+    positions of each pending step, merged into a list on first read."""
+
+    __slots__ = ("base", "steps", "length", "_list")
+
+    def __init__(self, base: Any, steps: Tuple[Tuple[frozenset, frozenset], ...], length: int):
+        self.base, self.steps, self.length, self._list = base, steps, length, None
+
+    @classmethod
+    def patch(cls, bucket: Any, added: Iterable[int], removed: Iterable[int]) -> "MergedPositions":
+        """``bucket`` with ``removed`` (all in it) taken out and ``added`` (none in it) put in."""
+        step = (frozenset(added), frozenset(removed))
+        if isinstance(bucket, MergedPositions):
+            if bucket._list is not None:
+                base, steps = bucket._list, (step,)
+            else:
+                base, steps = bucket.base, [*bucket.steps, step]
+                while len(steps) > 1 and sum(map(len, steps[-2])) <= sum(map(len, steps[-1])):
+                    newer = steps.pop()
+                    steps[-1] = _compose(steps[-1], newer)
+                steps = tuple(steps)
+        else:
+            base, steps = bucket, (step,)
+        return cls(base, steps, len(bucket) - len(step[1]) + len(step[0]))
+
+    def list(self) -> List[int]:
+        if self._list is None:
+            added, removed = self.steps[0]
+            for step in self.steps[1:]:
+                added, removed = _compose((added, removed), step)
+            kept = (p for p in self.base if p not in removed) if removed else self.base
+            # Two ascending runs (or an unordered set): Timsort merges them in one pass.
+            self._list = sorted(chain(kept, added))
+        return self._list
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def nbytes(self) -> int:
+        """What this version adds to ``base`` (shared with the previous one)."""
+        if self._list is not None:
+            return sizeof(self._list)
+        return sum(sys.getsizeof(added) + sys.getsizeof(removed) for added, removed in self.steps)
+
+    def __getitem__(self, i):
+        return self.list()[i]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.list())
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, MergedPositions):
+            other = other.list()
+        return self.list() == other if isinstance(other, list) else NotImplemented
+
+    __hash__ = None
@@ -0,0 +1,150 @@
+"""Read-only index structures over flat buffers.
+
+An index that supports ``pack()`` turns its Python containers into a list of
+plain buffers; ``attach(buffers)`` on an empty index of the same kind reads
+them back through the views here without copying. Published into a shared
+memory-mapped file (see ``app.connectors.shared``), one copy of an index then
+serves every attached process.
+"""
+
+import json, sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from typing import Any, Iterable, List, Optional, Tuple
+
+NONE = 0xFFFFFFFF  # code of a ``None`` entry in a coded column
+
+
+def pack_strings(values: Iterable[str]) -> List[bytes]:
+    """UTF-8 bytes and a u64 offsets array."""
+    data = bytearray()
+    offsets = array("Q", [0])
+    for v in values:
+        data += v.encode("utf-8")
+        offsets.append(len(data))
+    return [bytes(data), offsets.tobytes()]
+
+
+def pack_postings(postings: Mapping) -> List[bytes]:
+    """Sorted string keys, u32 start offsets and the u32 positions of every key, ascending."""
+    keys = sorted(postings)
+    starts, positions = array("I", [0]), array("I")
+    for k in keys:
+        positions.extend(sorted(postings[k]))
+        starts.append(len(positions))
+    return pack_strings(keys) + [starts.tobytes(), positions.tobytes()]
+
+
+def pack_codes(values: Iterable[Optional[str]], keys: Sequence[str]) -> bytes:
+    """u32 position of each value in the sorted ``keys`` (``NONE`` for ``None``)."""
+    table = {k: i for i, k in enumerate(keys)}
+    return array("I", (NONE if v is None else table[v] for v in values)).tobytes()
+
+
+def pack_values(values: Sequence[Any]) -> Optional[Tuple[str, List[bytes]]]:
+    """(kind, buffers) for all-string or all-numeric ``values``; ``None`` for anything else."""
+    kinds = {type(v) for v in values}
+    if kinds <= {str}:
+        return "str", pack_strings(values)
+    try:
+        if kinds <= {int}:
+            return "q", [array("q", values).tobytes()]
+    except OverflowError:
+        return None
+    if kinds <= {int, float}:
+        return "d", [array("d", values).tobytes()]
+    return None
+
+
+def unpack_values(kind: str, buffers: List[Any]) -> Sequence[Any]:
+    if kind == "str":
+        return PackedStrings(buffers[0], buffers[1])
+    return memoryview(buffers[0]).cast(kind)
+
+
+def pack_json(value: Any) -> bytes:
+    return json.dumps(value).encode("utf-8")
+
+
+def unpack_json(buffer: Any) -> Any:
+    return json.loads(bytes(buffer))
+
+
+class PackedStrings(Sequence):
+    def __init__(self, data, offsets):
+        self.data, self.offsets = memoryview(data), memoryview(offsets).cast("Q")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.offsets.nbytes
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[p] for p in range(*pos.indices(len(self)))]
+        return str(self.data[self.offsets[pos]:self.offsets[pos + 1]], "utf-8")
+
+
+class PackedPostings(Mapping):
+    """Key -> ascending positions (a ``memoryview`` slice) over :func:`pack_postings` buffers."""
+
+    def __init__(self, buffers: List[Any]):
+        self.table = PackedStrings(buffers[0], buffers[1])
+        self.starts = memoryview(buffers[2]).cast("I")
+        self.positions = memoryview(buffers[3]).cast("I")
+
+    def index(self, key: Any) -> Optional[int]:
+        if not isinstance(key, str):
+            return None
+        i = bisect_left(self.table, key)
+        return i if i < len(self.table) and self.table[i] == key else None
+
+    def __getitem__(self, key: Any):
+        i = self.index(key)
+        if i is None:
+            raise KeyError(key)
+        return self.positions[self.starts[i]:self.starts[i + 1]]
+
+    def __contains__(self, key: Any) -> bool:
+        return self.index(key) is not None
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes + self.starts.nbytes + self.positions.nbytes
+
+
+class PackedCodes(Sequence):
+    """Per-row values from :func:`pack_codes` buffers, decoded through the key table."""
+
+    def __init__(self, codes, keys: Sequence[str]):
+        self.codes = memoryview(codes).cast("I")
+        # A small table is decoded once; a large one (e.g. unique ids) stays packed.
+        self.keys = list(keys) if len(keys) <= 4096 else keys
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        # A large key table is the one the postings hold, counted there.
+        return self.codes.nbytes + (sys.getsizeof(self.keys) if isinstance(self.keys, list) else 0)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[p] for p in range(*pos.indices(len(self)))]
+        code = self.codes[pos]
+        return None if code == NONE else self.keys[code]
+
+    def code(self, value: Any) -> int:
+        """Code of ``value``, to compare against ``codes`` without decoding (``NONE`` if absent)."""
+        i = bisect_left(self.keys, value) if isinstance(value, str) else len(self.keys)
+        return i if i < len(self.keys) and self.keys[i] == value else NONE
@@ -0,0 +1,203 @@
+"""Numeric series index — per-metric values in date order for range aggregates."""
+
+from bisect import bisect_left, bisect_right
+from array import array
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.connectors.indexes import IndexFactory, KeyFunc, lower_key
+from app.connectors.layered import sizeof
+from app.connectors.packed import PackedStrings, pack_json, pack_strings, unpack_json
+
+try:  # optional dependency: pip install numpy
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+
+def is_numeric(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class SeriesIndex:
+    """``field`` values ordered by ``order`` (stable), grouped by ``partition``.
+
+    With NumPy installed dates are a unicode array and values ``float64``, so a
+    date window is two ``searchsorted`` calls and the aggregates run vectorised
+    over a view; without it the same layout uses lists, ``bisect`` and ``array('d')``.
+    Rows whose ``field`` is missing or non-numeric are left out. Each group also
+    keeps the row positions, so :meth:`updated` can patch single rows. A group is
+    ``(dates, values, positions, n)`` and a version reads the first ``n`` entries:
+    rows dated after the tail (a new day) are written past it into buffers shared
+    with the previous version, which grow geometrically, instead of copying them.
+    """
+
+    ALL = object()
+
+    def __init__(self, field: str, records: Sequence[Dict[str, Any]], order: str = "date",
+                 partition: Optional[str] = None, partition_key: KeyFunc = lower_key):
+        self.field = field
+        self.order = order
+        self.partition = partition
+        self.partition_key = partition_key
+        self._records = records
+        positions = sorted((p for p, r in enumerate(records) if r is not None and is_numeric(r.get(field))),
+                           key=lambda p: records[p].get(order, ""))
+        parts: Dict[Any, list] = {self.ALL: positions}
+        if partition:
+            for p in positions:
+                parts.setdefault(partition_key(records[p].get(partition)), []).append(p)
+        self.groups = {k: self._arrays(v, records) for k, v in parts.items()}
+
+    @classmethod
+    def on(cls, order: str = "date", partition: Optional[str] = None) -> IndexFactory:
+        return partial(cls, order=order, partition=partition)
+
+    def _arrays(self, positions, records) -> Tuple[Any, Any, array, int]:
+        dates = [records[p].get(self.order, "") for p in positions]
+        values = [records[p][self.field] for p in positions]
+        if np is not None:
+            return np.array(dates, dtype=str), np.array(values, dtype=np.float64), array("q", positions), len(positions)
+        return dates, array("d", values), array("q", positions), len(positions)
+
+    def window(self, lo: Any = None, hi: Any = None, group: Any = ALL) -> Tuple[Any, Any]:
+        """(dates, values) with ``lo <= date <= hi``, in date order."""
+        if group is not self.ALL:
+            group = self.partition_key(group)
+        if group not in self.groups:
+            return [], []
+        dates, values, _, n = self.groups[group]
+        start = _search(dates, lo, "left", n) if lo is not None else 0
+        stop = _search(dates, hi, "right", n) if hi is not None else n
+        return dates[start:stop], values[start:stop]
+
+    @property
+    def nbytes(self) -> int:
+        return sizeof(self.groups)
+
+    def pack(self) -> List[bytes]:
+        """Flat buffers for :meth:`attach`: NumPy date arrays keep their dtype, lists become strings."""
+        groups, buffers = [], []
+        for k, (dates, values, positions, n) in self.groups.items():
+            dates, values, positions = dates[:n], values[:n], positions[:n]
+            dtype = dates.dtype.str if np is not None and isinstance(dates, np.ndarray) else None
+            groups.append([None if k is self.ALL else k, dtype])
+            buffers += [dates.tobytes()] if dtype else pack_strings(dates)
+            buffers += [array("d", values).tobytes(), array("q", positions).tobytes()]
+        return [pack_json(groups)] + buffers
+
+    def attach(self, buffers: List[Any]) -> "SeriesIndex":
+        self.groups, i = {}, 1
+        for key, dtype in unpack_json(buffers[0]):
+            if dtype and np is not None:
+                dates, i = np.frombuffer(buffers[i], dtype=dtype), i + 1
+            elif dtype:  # packed with NumPy, attached without it: fixed-width UTF-32
+                raw, width = bytes(buffers[i]), int(dtype[2:]) * 4
+                dates = [raw[j:j + width].decode("utf-32-le").rstrip("\x00") for j in range(0, len(raw), width)]
+                i += 1
+            else:
+                dates, i = PackedStrings(buffers[i], buffers[i + 1]), i + 2
+            values = np.frombuffer(buffers[i], dtype=np.float64) if np is not None else memoryview(buffers[i]).cast("d")
+            positions = memoryview(buffers[i + 1]).cast("q")
+            self.groups[self.ALL if key is None else key] = dates, values, positions, len(positions)
+            i += 2
+        return self
+
+    def _entry(self, records, pos: int) -> Optional[tuple]:
+        r = records[pos] if pos < len(records) else None
+        if r is None or not is_numeric(r.get(self.field)):
+            return None
+        keys = (self.ALL,) if not self.partition else (self.ALL, self.partition_key(r.get(self.partition)))
+        return r.get(self.order, ""), r[self.field], keys
+
+    def updated(self, records: Sequence[Dict[str, Any]],
+                changed: Optional[Iterable[int]] = None) -> "SeriesIndex":
+        """Copy of this index with the rows at ``changed`` positions re-placed (``None``: rebuild)."""
+        if changed is None:
+            return SeriesIndex(self.field, records, self.order, self.partition, self.partition_key)
+        index = object.__new__(SeriesIndex)
+        index.field, index.order, index.partition = self.field, self.order, self.partition
+        index.partition_key, index._records = self.partition_key, records
+        index.groups = dict(self.groups)
+        removed: Dict[Any, list] = {}
+        added: Dict[Any, list] = {}
+        for pos in changed:
+            old, new = self._entry(self._records, pos), self._entry(records, pos)
+            if old == new:
+                continue
+            if old is not None:
+                for k in old[2]:
+                    removed.setdefault(k, []).append((old[0], pos))
+            if new is not None:
+                for k in new[2]:
+                    added.setdefault(k, []).append((new[0], pos, new[1]))
+        for k in removed.keys() | added.keys():
+            index.groups[k] = self._patch(self.groups.get(k), removed.get(k, []), sorted(added.get(k, [])))
+        return index
+
+    def _patch(self, group, removed: List[tuple], added: List[tuple]) -> Tuple[Any, Any, array, int]:
+        group = group or self._arrays([], [])
+        dates, values, positions, n = group
+        if (not removed and (n == 0 or (dates[n - 1], positions[n - 1]) < added[0][:2])
+                and (extended := _extended(group, added)) is not None):
+            return extended
+        dates, values, positions = dates[:n], values[:n], array("q", positions[:n])
+        drop = sorted(_find(dates, positions, d, p) for d, p in removed)
+        if np is not None:
+            dates, values = np.delete(dates, drop), np.delete(values, drop)
+        else:
+            dates, values = list(dates), array("d", values)
+            for i in reversed(drop):
+                del dates[i], values[i]
+        for i in reversed(drop):
+            del positions[i]
+        at = [_find(dates, positions, d, p) for d, p, _ in added]
+        if np is not None and added:
+            new_dates = np.array([d for d, _, _ in added], dtype=str)
+            dates = np.insert(dates.astype(np.promote_types(dates.dtype, new_dates.dtype)), at, new_dates)
+            values = np.insert(values, at, [v for _, _, v in added])
+        for i, (d, p, v) in reversed(list(zip(at, added))):
+            if np is None:
+                dates.insert(i, d)
+                values.insert(i, v)
+            positions.insert(i, p)
+        return dates, values, positions, len(positions)
+
+
+def _extended(group: tuple, added: List[tuple]) -> Optional[tuple]:
+    """``group`` with ``added`` (sorted, all after its tail) written past its end, or
+    ``None`` if another version already wrote there or the buffers are read-only."""
+    dates, values, positions, n = group
+    if not isinstance(positions, array) or len(positions) != n:
+        return None
+    if np is None:
+        if not isinstance(dates, list) or not isinstance(values, array):
+            return None
+        dates.extend(d for d, _, _ in added)
+        values.extend(v for _, _, v in added)
+    else:
+        new_dates = np.array([d for d, _, _ in added], dtype=str)
+        if (not isinstance(dates, np.ndarray) or not dates.flags.writeable or not values.flags.writeable
+                or new_dates.dtype.itemsize > dates.dtype.itemsize):
+            return None
+        end = n + len(added)
+        if end > len(dates):  # grow by a quarter so appends stay amortised O(1)
+            size = end + end // 4 + 16
+            dates = np.concatenate([dates[:n], np.empty(size - n, dtype=dates.dtype)])
+            values = np.concatenate([values[:n], np.empty(size - n, dtype=values.dtype)])
+        dates[n:end] = new_dates
+        values[n:end] = [v for _, _, v in added]
+    positions.extend(p for _, p, _ in added)
+    return dates, values, positions, n + len(added)
+
+
+def _search(dates, value: Any, side: str, n: Optional[int] = None) -> int:
+    """Insertion point of ``value`` among the first ``n`` (default: all) ``dates``."""
+    if np is not None and isinstance(dates, np.ndarray):
+        return int(np.searchsorted(dates[:n], value, side))
+    return (bisect_left if side == "left" else bisect_right)(dates, value, 0, len(dates) if n is None else n)
+
+
+def _find(dates, positions, date: Any, pos: int) -> int:
+    """Index of (or insertion point for) row ``pos`` dated ``date``: ties are in position order."""
+    return bisect_left(positions, pos, _search(dates, date, "left"), _search(dates, date, "right"))
@@ -0,0 +1,215 @@
+"""Datasets shared by all worker processes through memory-mapped snapshots.
+
+With ``SHARED_DATASETS=true`` one loader — whichever process holds the
+``loader.lock`` flock in ``SHARED_DATASET_DIR`` — parses each data file (plus
+its changelog) and writes it as a column snapshot into that directory (tmpfs
+``/dev/shm`` by default), with its indexes packed into a ``.idx`` file beside
+it. It then replaces ``manifest.json`` and bumps the 8-byte counter in
+``generation``. Workers map the counter once, so checking for a new version is
+a memory read; on a new generation they map the new files read-only. Those
+buffers exist once however many workers there are; a worker only builds an
+index itself if it could not be packed.
+
+The loader is elected among the workers (the lock is released when its
+process exits and another worker takes over), or runs on its own with
+``python -m app.utils.shared_loader``.
+"""
+
+import hashlib, json, logging, mmap, os, struct, sys, tempfile, time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.connectors.cache import Dataset, DatasetCache, Fingerprint, fingerprint
+from app.connectors.columnar import ColumnStore
+from app.connectors.indexes import IndexFactory
+from app.connectors.snapshot import map_buffers, map_snapshot, write_buffers, write_snapshot
+
+try:  # POSIX only; without it no process can be elected loader
+    import fcntl
+except ImportError:  # pragma: no cover - exercised only on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+GENERATION = "generation"
+MANIFEST = "manifest.json"
+LOCK = "loader.lock"
+# How long a worker waits for the first publication before loading the file itself.
+ATTACH_TIMEOUT = 300.0
+
+
+def default_dir() -> Path:
+    base = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+    tag = hashlib.sha1(str(Path(settings.DATA_DIR).resolve()).encode()).hexdigest()[:8]
+    return base / f"udc-{tag}"
+
+
+class SharedStore:
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._counter: Optional[mmap.mmap] = None
+        self._generation = -1
+        self._manifest: Dict[str, Any] = {}
+        self._lock_fd: Optional[int] = None
+        self._loader_cache: Optional[DatasetCache] = None
+        self._kept: set = set()
+        self.published = 0
+
+    @property
+    def directory(self) -> Path:
+        return Path(self._directory or settings.SHARED_DATASET_DIR or default_dir())
+
+    # -- worker side -----------------------------------------------------
+
+    def generation(self) -> int:
+        if self._counter is None:
+            try:
+                with open(self.directory / GENERATION, "rb") as f:
+                    self._counter = mmap.mmap(f.fileno(), 8, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                return 0
+        return struct.unpack_from("<Q", self._counter)[0]
+
+    def version(self, path: Path, wait: bool = False) -> Optional[Fingerprint]:
+        """``(generation,)`` at which ``path`` was last published; ``None`` if it has
+        not been (``wait``: after giving the loader ``ATTACH_TIMEOUT`` to publish it)."""
+        deadline = time.monotonic() + (ATTACH_TIMEOUT if wait and self.generation() == 0 else 0)
+        while (entry := self._entry(path)) is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return None if entry is None else (entry["generation"],)
+
+    def load(self, path: Path, indexes: Optional[Dict[str, IndexFactory]] = None,
+             previous: Optional[Dataset] = None) -> Dataset:
+        """Map the published snapshot of ``path`` and its packed indexes read-only;
+        build the other ``indexes`` locally."""
+        entry = self._entry(path)
+        store = map_snapshot(self.directory / entry["file"]) if entry else None
+        if store is None:
+            raise FileNotFoundError(f"no shared snapshot for {Path(path).name}")
+        attached = {}
+        if entry.get("indexes") and indexes:
+            header, buffers = map_buffers(self.directory / entry["indexes"])
+            for field, ids in header["indexes"].items():
+                if field in indexes:
+                    attached[field] = indexes[field](field, []).attach([buffers[i] for i in ids])
+        return Dataset(path=Path(path), records=store, fingerprint=(entry["generation"],),
+                       record_bytes=store.nbytes, indexes=attached).ensure_indexes(indexes, previous=previous)
+
+    def _entry(self, path: Path) -> Optional[Dict[str, Any]]:
+        gen = self.generation()
+        if gen != self._generation:
+            # The manifest is replaced before the counter is bumped, so it is at least this new.
+            try:
+                self._manifest = json.loads((self.directory / MANIFEST).read_text())
+                self._generation = gen
+            except (FileNotFoundError, ValueError):
+                pass
+        return self._manifest.get(Path(path).name)
+
+    # -- loader side -----------------------------------------------------
+
+    def lead(self, block: bool = False) -> bool:
+        """Become the loader unless another process is; True while this one is."""
+        if self._lock_fd is not None:
+            return True
+        if fcntl is None:
+            return False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.directory / LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if block else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        self._kept = {f for e in self._read_manifest().values() for f in (e["file"], e.get("indexes")) if f}
+        logger.info("Process %d is the shared dataset loader (%s)", os.getpid(), self.directory)
+        return True
+
+    def release(self) -> None:
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def publish(self, connectors: Iterable[Any]) -> List[str]:
+        """Snapshot every data file whose version differs from the published one and
+        publish them as one new generation. Returns the published file names."""
+        if self._loader_cache is None:
+            # The loader's own parsed copy, so changelogs still apply incrementally.
+            self._loader_cache = DatasetCache(max_bytes=sys.maxsize)
+        manifest = self._read_manifest()
+        gen = max([self.generation()] + [e["generation"] for e in manifest.values()]) + 1
+        published = []
+        for connector in connectors:
+            path = connector._resolve_path(connector.filename)
+            try:
+                fp = fingerprint(path, bool(connector.id_fields))
+            except FileNotFoundError:
+                continue
+            entry = manifest.get(path.name)
+            if fp[1] > settings.STREAMING_THRESHOLD_BYTES or (entry and tuple(entry["source"]) == fp):
+                continue
+            try:
+                ds = self._loader_cache.get(path, connector.index_fields, connector.id_fields)
+            except (ValueError, FileNotFoundError) as e:
+                logger.error("Not publishing %s: %s", path.name, e)
+                continue
+            if ds.fingerprint != fp:  # failed to parse or changed meanwhile; retried next pass
+                continue
+            manifest[path.name] = self._write(path, gen, fp, ds, connector.index_fields)
+            published.append(path.name)
+        if published:
+            tmp = self.directory / (MANIFEST + ".tmp")
+            tmp.write_text(json.dumps(manifest))
+            tmp.replace(self.directory / MANIFEST)
+            self._bump(gen)
+            self._collect(manifest)
+            self.published += 1
+            logger.info("Published generation %d: %s", gen, ", ".join(published))
+        return published
+
+    def _write(self, path: Path, gen: int, fp: Fingerprint, ds: Dataset,
+               indexes: Dict[str, IndexFactory]) -> Dict[str, Any]:
+        if ds.tombstones:
+            # Positions in the published files must be those of the rows, so drop deleted ones.
+            ds = Dataset(path=path, records=ds.rows(), fingerprint=fp, record_bytes=ds.record_bytes).ensure_indexes(indexes)
+        stem = f"{path.name.split('.')[0]}.{gen}"
+        store = ds.records if isinstance(ds.records, ColumnStore) else ColumnStore(ds.records)
+        write_snapshot(store, self.directory / f"{stem}.snap")
+        fields, buffers = {}, []
+        for field, index in ds.indexes.items():
+            packed = index.pack() if hasattr(index, "pack") else None
+            if packed is not None:
+                fields[field] = list(range(len(buffers), len(buffers) + len(packed)))
+                buffers.extend(packed)
+        if fields:
+            write_buffers(self.directory / f"{stem}.idx", {"indexes": fields}, buffers)
+        return {"file": f"{stem}.snap", "indexes": f"{stem}.idx" if fields else None,
+                "generation": gen, "source": list(fp), "rows": len(store)}
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            return json.loads((self.directory / MANIFEST).read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _bump(self, gen: int) -> None:
+        fd = os.open(self.directory / GENERATION, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.pwrite(fd, struct.pack("<Q", gen), 0)
+        finally:
+            os.close(fd)
+
+    def _collect(self, manifest: Dict[str, Any]) -> None:
+        # Keep this and the previous generation's files: a worker that read the old
+        # manifest may be about to map one. Workers already mapping a removed file
+        # keep its pages until they swap.
+        current = {f for e in manifest.values() for f in (e["file"], e.get("indexes")) if f}
+        for file in [*self.directory.glob("*.snap"), *self.directory.glob("*.idx")]:
+            if file.name not in current and file.name not in self._kept:
+                file.unlink(missing_ok=True)
+        self._kept = current
+
+
+shared_store = SharedStore()
@@ -0,0 +1,170 @@
+"""Binary column snapshots of the JSON data files, loaded with ``mmap``.
+
+``python -m app.utils.snapshots`` converts each connector's data file into
+``<name>.snap`` next to it. Loading maps the file read-only and wraps the
+column buffers in ``memoryview``s, so every worker process shares the same
+page-cache pages and start-up does no JSON parsing. A snapshot records the
+mtime/size of the JSON file it was built from and is ignored once that file
+changes, falling back to the JSON path.
+
+Layout: ``MAGIC | u64 header length | JSON header | 8-byte aligned column buffers``.
+"""
+
+import json, logging, mmap, struct, sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.connectors.columnar import (MISSING, ColumnStore, DictColumn, FloatColumn,
+                                     IntColumn, TextColumn)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"UDCSNAP1"
+SUFFIX = ".snap"
+
+
+def snapshot_path(source: Path) -> Path:
+    return Path(source).with_suffix(SUFFIX)
+
+
+def _source_fingerprint(source: Path) -> List[int]:
+    st = Path(source).stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
+class MappedTextColumn:
+    """UTF-8 text column over mapped bytes; ``decode`` turns stored text into values."""
+
+    def __init__(self, data: memoryview, offsets: memoryview, as_json: bool = False):
+        self.data, self.offsets, self.as_json = data, offsets, as_json
+
+    def __getitem__(self, pos: int) -> Any:
+        start, stop = self.offsets[pos], self.offsets[pos + 1]
+        if self.as_json:
+            return json.loads(str(self.data[start:stop], "utf-8")) if stop > start else MISSING
+        return str(self.data[start:stop], "utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + len(self.offsets) * 8
+
+
+def _text_buffers(texts: List[str]):
+    data = bytearray()
+    offsets = array("Q", [0])
+    for t in texts:
+        data += t.encode("utf-8")
+        offsets.append(len(data))
+    return bytes(data), offsets.tobytes()
+
+
+def _encode_column(name: str, col, length: int):
+    """Header entry plus the raw buffers for one ColumnStore column."""
+    if isinstance(col, (IntColumn, FloatColumn)):
+        kind = "float" if isinstance(col, FloatColumn) else "int"
+        return {"name": name, "kind": kind, "typecode": col.data.typecode}, [bytes(col.data)]
+    if isinstance(col, DictColumn):
+        missing = next((i for i, v in enumerate(col.values) if v is MISSING), None)
+        values = [None if v is MISSING else v for v in col.values]
+        return ({"name": name, "kind": "dict", "typecode": col.codes.typecode,
+                 "values": values, "missing": missing}, [bytes(col.codes)])
+    if isinstance(col, TextColumn):
+        texts = [col[p] for p in range(length)]
+        return {"name": name, "kind": "text"}, list(_text_buffers(texts))
+    # Arbitrary JSON values; an empty slot marks a missing field.
+    texts = ["" if col[p] is MISSING else json.dumps(col[p]) for p in range(length)]
+    return {"name": name, "kind": "json"}, list(_text_buffers(texts))
+
+
+def write_snapshot(store: ColumnStore, target: Path, source: Optional[Path] = None) -> Path:
+    header: Dict[str, Any] = {"version": 1, "rows": len(store),
+                              "source": _source_fingerprint(source) if source else None,
+                              "columns": []}
+    buffers: List[bytes] = []
+    for name, col in store.columns.items():
+        entry, bufs = _encode_column(name, col, len(store))
+        entry["buffers"] = list(range(len(buffers), len(buffers) + len(bufs)))
+        buffers.extend(bufs)
+        header["columns"].append(entry)
+    return write_buffers(target, header, buffers)
+
+
+def write_buffers(target: Path, header: Dict[str, Any], buffers: List[bytes]) -> Path:
+    """Write ``header`` and 8-byte aligned ``buffers`` to ``target`` atomically."""
+    # Offsets depend on the header size, so lay out buffers relative to its end first.
+    spans, pos = [], 0
+    for buf in buffers:
+        spans.append([pos, len(buf)])
+        pos += (len(buf) + 7) & ~7
+    header = dict(header, byteorder=sys.byteorder, spans=spans)
+    raw = json.dumps(header).encode("utf-8")
+    base = (len(MAGIC) + 8 + len(raw) + 7) & ~7
+
+    tmp = target.with_suffix(target.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(raw)) + raw)
+        f.write(b"\0" * (base - f.tell()))
+        for (offset, size), buf in zip(spans, buffers):
+            f.write(b"\0" * (base + offset - f.tell()))
+            f.write(buf)
+    tmp.replace(target)  # atomic: readers never see a half-written snapshot
+    return target
+
+
+def map_buffers(path: Path) -> Tuple[Dict[str, Any], List[memoryview]]:
+    """Header and buffer views of a file from :func:`write_buffers`, mapped read-only."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError("bad magic")
+    (size,) = struct.unpack_from("<Q", mm, len(MAGIC))
+    start = len(MAGIC) + 8
+    header = json.loads(mm[start:start + size])
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError("byte order mismatch")
+    base = (start + size + 7) & ~7
+    view = memoryview(mm)
+    return header, [view[base + off:base + off + n] for off, n in header["spans"]]
+
+
+def load_snapshot(source: Path) -> Optional[ColumnStore]:
+    """Memory-map the snapshot for ``source``; ``None`` if absent, stale or unreadable."""
+    return map_snapshot(snapshot_path(source), source)
+
+
+def map_snapshot(path: Path, source: Optional[Path] = None) -> Optional[ColumnStore]:
+    """Memory-map the snapshot file ``path`` read-only; ``None`` if absent, unreadable
+    or (when ``source`` is given) built from a different version of ``source``."""
+    try:
+        header, bufs = map_buffers(path)
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, struct.error) as e:
+        logger.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return None
+    try:
+        if source is not None and header["source"] is not None and Path(source).exists() \
+                and header["source"] != _source_fingerprint(source):
+            logger.info("Snapshot %s is stale; using %s", path.name, Path(source).name)
+            return None
+        columns = {}
+        for entry in header["columns"]:
+            b = [bufs[i] for i in entry["buffers"]]
+            kind = entry["kind"]
+            if kind == "int":
+                columns[entry["name"]] = IntColumn.wrap(b[0].cast(entry["typecode"]))
+            elif kind == "float":
+                columns[entry["name"]] = FloatColumn.wrap(b[0].cast(entry["typecode"]))
+            elif kind == "dict":
+                values = entry["values"]
+                if entry["missing"] is not None:
+                    values[entry["missing"]] = MISSING
+                columns[entry["name"]] = DictColumn.wrap(b[0].cast(entry["typecode"]), values)
+            else:
+                columns[entry["name"]] = MappedTextColumn(b[0], b[1].cast("Q"), kind == "json")
+        logger.info("Mapped snapshot %s (%d rows)", path.name, header["rows"])
+        return ColumnStore.from_columns(columns, header["rows"])
+    except (ValueError, KeyError, TypeError, struct.error) as e:
+        logger.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return None
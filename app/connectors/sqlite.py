@@ -0,0 +1,293 @@
+"""SQLite backend (``DATASET_BACKEND=sqlite``) — connector queries as indexed SQL.
+
+``python -m app.utils.sqlite_import`` loads each connector's data file (with
+its changelog applied) into one table of the database at ``SQLITE_PATH``: the
+record as JSON in ``doc``, its position in the file in ``pos``, and the
+columns its :class:`Table` derives for filtering and sorting. Filters, sort
+and LIMIT/OFFSET then run inside SQLite, so a request decodes only the rows on
+its page and memory does not grow with the data. Ties are broken by ``pos``,
+so orders and pages match the JSON path.
+
+The database is in WAL mode: a re-import commits in one transaction while
+requests keep reading the previous version. Each thread reads through its own
+read-only connection.
+"""
+
+import json, sqlite3, threading, time
+from collections.abc import Sequence as SequenceABC
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.connectors.indexes import KeyFunc
+from app.connectors.summary import Summary, _numeric, parse_stamp, raw_stamp
+
+DEFAULT_NAME = "connector.sqlite3"
+META = "sources"  # one row per imported table: generation, rows, source file, import time
+SEARCH_SEP = "\x1f"  # joins the search fields (FTS5 stops reading text at a NUL)
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+def sort_value(name: str) -> Callable[[Dict[str, Any]], Any]:
+    """The sort key the connectors use for a plain field: ``record.get(name, "")``."""
+    return lambda r: r.get(name, "")
+
+
+@dataclass(frozen=True)
+class Table:
+    """How one connector's records are laid out.
+
+    ``keys`` are the equality filters: column ``f`` holds ``key(record[f])``, as
+    in ``HashIndex``. ``order`` gives the sort key of each indexed sort field,
+    stored in column ``by_<field>``; other fields sort on their JSON value.
+    ``search`` fields are lowered into an FTS5 trigram index. ``labels`` (a
+    subset of ``keys``) and ``value`` are the voice-summary fields,
+    pre-aggregated per label combination.
+    """
+    name: str
+    keys: Dict[str, KeyFunc] = field(default_factory=dict)
+    order: Dict[str, Callable[[Dict[str, Any]], Any]] = field(default_factory=dict)
+    indexes: Tuple[str, ...] = ()
+    search: Tuple[str, ...] = ()
+    labels: Tuple[str, ...] = ()
+    value: Optional[str] = None
+
+    def row(self, pos: int, record: Dict[str, Any]) -> tuple:
+        pairs = [[f, record[f]] for f in self.labels if f in record]
+        search = SEARCH_SEP.join(str(record.get(f, "")).lower() for f in self.search) if self.search else None
+        return (pos, json.dumps(record), json.dumps(pairs),
+                _numeric(record.get(self.value)) if self.value else None, parse_stamp(raw_stamp(record)),
+                search, *(key(record.get(f)) for f, key in self.keys.items()),
+                *(key(record) for key in self.order.values()))
+
+    def sort_expression(self, sort_field: str) -> str:
+        if sort_field in self.order:
+            return f"by_{sort_field}"
+        if '"' in sort_field:  # not a usable JSON path; no record has it, so all keys are ""
+            return "''"
+        path = '$."%s"' % sort_field
+        return f"coalesce(json_extract(doc, {_literal(path)}), '')"
+
+    def search_clause(self, term: str) -> Tuple[str, List[Any]]:
+        """Rows whose lowered ``search`` fields contain ``term``, like ``TrigramIndex.search``;
+        terms of three or more characters are narrowed through the trigram index first."""
+        term = term.lower()
+        if SEARCH_SEP in term or "\x00" in term:
+            return "0", []
+        if len(term) < 3:
+            return "instr(search, ?) > 0", [term]
+        return (f"pos IN (SELECT rowid FROM {self.name}_search WHERE {self.name}_search MATCH ?)"
+                " AND instr(search, ?) > 0", ['"' + term.replace('"', '""') + '"', term])
+
+
+def _literal(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+
+def write_table(path: Path, table: Table, records: Iterable[Dict[str, Any]],
+                source: Optional[Path] = None) -> int:
+    """Replace ``table`` in the database at ``path`` with ``records``, in one transaction."""
+    t = table.name
+    columns = ["pos INTEGER PRIMARY KEY", "doc TEXT NOT NULL", "labels TEXT", "value REAL", "stamp REAL",
+               "search TEXT", *table.keys, *(f"by_{f}" for f in table.order)]
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {META} (name TEXT PRIMARY KEY, generation INTEGER,"
+                     " rows INTEGER, source TEXT, imported_at REAL)")
+        for suffix in ("_search", "_summary", ""):
+            conn.execute(f"DROP TABLE IF EXISTS {t}{suffix}")
+        conn.execute(f"CREATE TABLE {t} ({', '.join(columns)})")
+        conn.executemany(f"INSERT INTO {t} VALUES ({', '.join('?' * len(columns))})",
+                         (table.row(pos, r) for pos, r in enumerate(records)))
+        # Indexes are built after the rows: one sort each instead of a b-tree insert per row.
+        for i, spec in enumerate(table.indexes):
+            conn.execute(f"CREATE INDEX {t}_{i} ON {t} ({spec})")
+        if table.search:
+            conn.execute(f"CREATE VIRTUAL TABLE {t}_search USING fts5(search, content='{t}',"
+                         " content_rowid='pos', tokenize='trigram')")
+            conn.execute(f"INSERT INTO {t}_search ({t}_search) VALUES ('rebuild')")
+        if table.labels:
+            keys = ", ".join(table.labels)
+            conn.execute(f"CREATE TABLE {t}_summary AS SELECT {keys}, labels, count(*) AS n,"
+                         f" total(value) AS value_sum, count(value) AS value_count, max(stamp) AS newest"
+                         f" FROM {t} GROUP BY {keys}, labels")
+        conn.execute("PRAGMA analysis_limit = 1000")  # planner statistics from a sample
+        conn.execute(f"ANALYZE {t}")
+        (rows,) = conn.execute(f"SELECT count(*) FROM {t}").fetchone()
+        conn.execute(f"INSERT OR REPLACE INTO {META} VALUES (?, (SELECT coalesce(max(generation), 0) + 1"
+                     f" FROM {META} WHERE name = ?), ?, ?, ?)",
+                     (t, t, rows, Path(source).name if source else None, time.time()))
+        conn.execute("COMMIT")
+        # Best effort: with a reader still on the old snapshot (e.g. an export) this
+        # returns busy at once, and a later import or auto-checkpoint catches up.
+        conn.execute("PRAGMA busy_timeout = 0")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return rows
+
+
+class SQLiteStore:
+    """Read-only access to the database at ``SQLITE_PATH``, one connection per thread."""
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._local = threading.local()
+
+    @property
+    def path(self) -> Path:
+        return Path(self._path or settings.SQLITE_PATH or Path(settings.DATA_DIR) / DEFAULT_NAME)
+
+    def connect(self, shared: bool = False) -> sqlite3.Connection:
+        """A new read-only connection; a ``shared`` one may be used from any thread (one at a time)."""
+        path = self.path
+        if not path.exists():
+            raise FileNotFoundError(path)
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=not shared)
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        conns = self._local.__dict__.setdefault("conns", {})
+        path = self.path
+        if path not in conns:
+            conns[path] = self.connect()
+        return conns[path]
+
+    def execute(self, sql: str, params: Iterable[Any] = ()) -> List[tuple]:
+        return self.connection().execute(sql, tuple(params)).fetchall()
+
+    def info(self, table: Table) -> Optional[Dict[str, Any]]:
+        """Import record of ``table`` (generation, rows, source, imported_at); ``None`` if not imported."""
+        try:
+            rows = self.execute(f"SELECT generation, rows, source, imported_at FROM {META} WHERE name = ?",
+                                (table.name,))
+        except (OSError, sqlite3.Error):
+            return None
+        return dict(zip(("generation", "rows", "source", "imported_at"), rows[0])) if rows else None
+
+    def query(self, table: Table, equals: Dict[str, Any], where: List[str], params: List[Any],
+              sort_field: str, reverse: bool) -> "Query":
+        return Query(self, table, equals, where, params, sort_field, reverse)
+
+
+class Query:
+    """Rows of ``table`` with ``column == key`` for each of ``equals`` and matching the
+    ``where`` clauses, ordered by ``sort_field`` then ``pos``. Each method is one statement."""
+
+    def __init__(self, store: SQLiteStore, table: Table, equals: Dict[str, Any], where: List[str],
+                 params: List[Any], sort_field: str, reverse: bool):
+        self.store, self.table, self.reverse = store, table, reverse
+        clauses = [f"{column} = ?" for column in equals] + where
+        self.where = " AND ".join(clauses) or "1"
+        self.params = list(equals.values()) + list(params)
+        self.key = table.sort_expression(sort_field)
+        self.order = f"{self.key} {'DESC' if reverse else 'ASC'}, pos"
+        # Filtered on label keys only: summaries come from the pre-aggregated table.
+        self.grouped = not where and bool(table.labels) and set(equals) <= set(table.labels)
+        self._summary: Optional[Summary] = None
+
+    def count(self) -> int:
+        if self.table.labels:
+            # The summary visits the same rows, so one statement serves both.
+            return self.summary().count
+        (n,), = self.store.execute(f"SELECT count(*) FROM {self.table.name} WHERE {self.where}", self.params)
+        return n
+
+    def page(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        rows = self.store.execute(f"SELECT doc FROM {self.table.name} WHERE {self.where}"
+                                  f" ORDER BY {self.order} LIMIT ? OFFSET ?", self.params + [stop - start, start])
+        return [json.loads(doc) for (doc,) in rows]
+
+    def iter(self) -> Iterator[Dict[str, Any]]:
+        """Every match in order, streamed (over a connection of its own, so any thread may drain it)."""
+        return self._stream(self.where, self.params)
+
+    def seek(self, value: Any) -> Iterator[Dict[str, Any]]:
+        """Matches in order from the first whose sort key is ``value`` or beyond it."""
+        return self._stream(f"{self.where} AND {self.key} {'<=' if self.reverse else '>='} ?",
+                            self.params + [value])
+
+    def _stream(self, where: str, params: List[Any]) -> Iterator[Dict[str, Any]]:
+        conn = self.store.connect(shared=True)
+        try:
+            for (doc,) in conn.execute(f"SELECT doc FROM {self.table.name} WHERE {where}"
+                                       f" ORDER BY {self.order}", params):
+                yield json.loads(doc)
+        finally:
+            conn.close()
+
+    def values(self) -> Tuple[List[Any], List[float]]:
+        """(sort keys, numeric ``value``) of the matches that have one, in order."""
+        rows = self.store.execute(f"SELECT {self.key}, value FROM {self.table.name} WHERE {self.where}"
+                                  f" AND value IS NOT NULL ORDER BY {self.order}", self.params)
+        return [k for k, _ in rows], [v for _, v in rows]
+
+    def summary(self) -> Summary:
+        if self._summary is None:
+            self._summary = self._aggregate()
+        return self._summary
+
+    def _aggregate(self) -> Summary:
+        t = self.table.name
+        if self.grouped:
+            sql = (f"SELECT labels, sum(n), sum(value_sum), sum(value_count), max(newest) FROM {t}_summary"
+                   f" WHERE {self.where} GROUP BY labels")
+        else:
+            sql = (f"SELECT labels, count(*), total(value), count(value), max(stamp) FROM {t}"
+                   f" WHERE {self.where} GROUP BY labels")
+        summary = Summary()
+        for labels, *totals in self.store.execute(sql, self.params):
+            summary.add_totals(tuple(tuple(p) for p in json.loads(labels)), *totals)
+        return summary
+
+
+class Rows(SequenceABC):
+    """A :class:`Query`'s matches in final order: ``len`` is a COUNT, slices are LIMIT/OFFSET.
+
+    The last fetched window is kept, and reading a single row fetches up to a
+    full page (``MAX_RESULTS``) from it, so a sample row and then the page it
+    starts cost one query.
+    """
+
+    def __init__(self, query: Query):
+        self.query = query
+        self._count: Optional[int] = None
+        self._window: Tuple[int, List[Dict[str, Any]]] = (0, [])
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = self.query.count()
+        return self._count
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            start, stop, step = pos.indices(len(self))
+            if step != 1:
+                return list(self)[pos]
+            return self._fetch(start, stop) if stop > start else []
+        if pos < 0:
+            pos += len(self)
+        rows = self._fetch(pos, pos + 1, pos + settings.MAX_RESULTS) if pos >= 0 else []
+        if not rows:
+            raise IndexError(pos)
+        return rows[0]
+
+    def _fetch(self, start: int, stop: int, ahead: int = 0) -> List[Dict[str, Any]]:
+        first, rows = self._window
+        if not (first <= start and stop <= first + len(rows)):
+            first, rows = self._window = start, self.query.page(start, max(stop, ahead))
+        return rows[start - first:stop - first]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.query.iter()
+
+
+sqlite_store = SQLiteStore()
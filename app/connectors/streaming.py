@@ -0,0 +1,115 @@
+"""Streaming record readers — NDJSON/JSON Lines and incremental top-level JSON arrays —
+and an external sort for ordering streamed rows in bounded memory."""
+
+import heapq, json, tempfile
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+NDJSON_SUFFIXES = {".ndjson", ".jsonl"}
+CHUNK_SIZE = 1 << 16
+SORT_RUN_ROWS = 50_000
+_WS = " \t\r\n"
+
+
+def iter_ndjson(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_json_array(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield the elements of a top-level JSON array without reading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+
+        def more() -> bool:
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            return not eof
+
+        def peek() -> str:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in _WS:
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if not more():
+                    return ""
+
+        if peek() != "[":
+            raise json.JSONDecodeError("Expected top-level array", buf, pos)
+        pos += 1
+        if peek() == "]":
+            return
+        while True:
+            peek()
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if more():
+                    continue
+                raise
+            if end == len(buf) and not eof:
+                # A value ending exactly at the buffer edge may be truncated (e.g. a number).
+                more()
+                continue
+            yield value
+            pos = end
+            sep = peek()
+            if sep == "]":
+                return
+            if sep != ",":
+                raise json.JSONDecodeError("Expected ',' or ']'", buf, pos)
+            pos += 1
+
+
+def iter_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream records from ``path``, choosing the format by file extension."""
+    if Path(path).suffix.lower() in NDJSON_SUFFIXES:
+        return iter_ndjson(path)
+    return iter_json_array(path)
+
+
+def load_records(path: Path) -> List[Dict[str, Any]]:
+    """Fully load ``path``; JSON arrays go through ``json.load`` (fastest when it fits in memory)."""
+    if Path(path).suffix.lower() in NDJSON_SUFFIXES:
+        return list(iter_ndjson(path))
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def sort_spilled(rows: Iterable[Dict[str, Any]], key: Callable[[Dict[str, Any]], Any], reverse: bool = False,
+                 run_rows: int = SORT_RUN_ROWS) -> Tuple[Iterator[Dict[str, Any]], int]:
+    """``sorted(rows, key=key, reverse=reverse)`` as an iterator, and its length.
+
+    At most ``run_rows`` rows are held at a time: each full run is sorted and
+    spilled to a temporary NDJSON file, and the runs are merged lazily (stably,
+    so ties keep input order) as the iterator is read.
+    """
+    rows, runs, count = iter(rows), [], 0
+    while True:
+        run = sorted(islice(rows, run_rows), key=key, reverse=reverse)
+        count += len(run)
+        if len(run) < run_rows:
+            break
+        f = tempfile.TemporaryFile("w+", encoding="utf-8")
+        f.writelines(json.dumps(r, default=str) + "\n" for r in run)
+        f.seek(0)
+        runs.append(f)
+    if not runs:
+        return iter(run), count
+    return _merged(runs, run, key, reverse), count
+
+
+def _merged(files: List[IO[str]], last: List[Dict[str, Any]], key: Callable, reverse: bool) -> Iterator[Dict[str, Any]]:
+    try:
+        yield from heapq.merge(*(map(json.loads, f) for f in files), last, key=key, reverse=reverse)
+    finally:
+        for f in files:
+            f.close()
@@ -0,0 +1,372 @@
+"""Precomputed voice-summary aggregates — label counts, value sums, newest timestamp.
+
+``SummaryIndex`` parses each row's timestamp once at load time and keeps a
+``Summary`` for every combination of its label fields (e.g. all rows,
+status=open, priority=high, status=open+priority=high). A query filtered only
+on those fields gets its summary with one dict lookup; any other match set is
+summarised in one pass over its positions. Nothing on the request path parses
+dates. Per-row entries are kept as columns (``PackedRows``): label codes and
+doubles, not a tuple per row.
+"""
+
+import json, math
+from array import array
+from collections.abc import Sequence as SequenceABC
+from datetime import datetime, timezone
+from functools import partial
+from itertools import product
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.connectors.indexes import IndexFactory, lower_key
+from app.connectors.layered import LayeredList, sizeof
+from app.connectors.packed import NONE, pack_json, unpack_json
+
+# First of these present on a record is its timestamp.
+STAMP_FIELDS = ("created_at", "date", "timestamp")
+ANY = object()  # wildcard slot in a group key
+
+
+def raw_stamp(record: Dict[str, Any]) -> Any:
+    for key in STAMP_FIELDS:
+        if key in record:
+            return record[key]
+    return None
+
+
+def parse_stamp(value: Any) -> Optional[float]:
+    """ISO-8601 string -> UTC epoch seconds (naive values are taken as UTC)."""
+    if value is None:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except (ValueError, TypeError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _numeric(value: Any) -> Optional[float]:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class Summary:
+    """Row count, per-label value counts, numeric sum/count and newest timestamp."""
+
+    __slots__ = ("count", "labels", "value_sum", "value_count", "newest")
+
+    def __init__(self):
+        self.count = 0
+        self.labels: Dict[str, Dict[Any, int]] = {}
+        self.value_sum = 0.0
+        self.value_count = 0
+        self.newest: Optional[float] = None
+
+    @classmethod
+    def of(cls, records: Iterable[Dict[str, Any]], labels: Sequence[str] = ("status", "priority"),
+           value: Optional[str] = "value") -> "Summary":
+        """Summary computed directly from rows (parses timestamps; for unindexed data)."""
+        summary = cls()
+        for r in records:
+            summary.add(tuple((f, r.get(f)) for f in labels if f in r),
+                        _numeric(r.get(value)) if value else None, parse_stamp(raw_stamp(r)))
+        return summary
+
+    def add(self, labels: Tuple[Tuple[str, Any], ...], value: Optional[float],
+            stamp: Optional[float], sign: int = 1) -> None:
+        """Count a row in (``sign=-1``: out of) this summary. Removing never lowers
+        ``newest``; :class:`SummaryIndex` recomputes it when needed."""
+        self.count += sign
+        for field, v in labels:
+            counts = self.labels.setdefault(field, {})
+            counts[v] = counts.get(v, 0) + sign
+        if value is not None:
+            self.value_sum += sign * value
+            self.value_count += sign
+        if sign > 0 and stamp is not None and (self.newest is None or stamp > self.newest):
+            self.newest = stamp
+
+    def add_totals(self, labels: Tuple[Tuple[str, Any], ...], count: int, value_sum: float,
+                   value_count: int, newest: Optional[float]) -> None:
+        """Count ``count`` rows sharing ``labels`` at once, from their pre-aggregated totals."""
+        self.count += count
+        for field, v in labels:
+            counts = self.labels.setdefault(field, {})
+            counts[v] = counts.get(v, 0) + count
+        self.value_sum += value_sum
+        self.value_count += value_count
+        if newest is not None and (self.newest is None or newest > self.newest):
+            self.newest = newest
+
+    def label(self, field: str, value: Any) -> int:
+        return self.labels.get(field, {}).get(value, 0)
+
+    @property
+    def average(self) -> Optional[float]:
+        return self.value_sum / self.value_count if self.value_count else None
+
+    def copy(self) -> "Summary":
+        other = Summary()
+        other.count, other.value_sum = self.count, self.value_sum
+        other.value_count, other.newest = self.value_count, self.newest
+        other.labels = {f: dict(c) for f, c in self.labels.items()}
+        return other
+
+
+class SummaryIndex:
+    """``Summary`` per combination of ``labels`` values (``ANY`` = unfiltered).
+
+    Group keys use ``lower_key`` like ``HashIndex``, so they line up with the
+    connectors' equality filters; the counts inside keep the raw values.
+    """
+
+    def __init__(self, field: str, records: Sequence[Dict[str, Any]],
+                 labels: Sequence[str] = (), value: Optional[str] = None):
+        self.field = field
+        self.labels = tuple(labels)
+        self.value = value
+        self.groups: Dict[tuple, Summary] = {}
+        self._stale: set = set()
+        # The rows this version counts, re-read by ``updated`` to skip unchanged ones unparsed.
+        self._records: Optional[Sequence[Dict[str, Any]]] = records
+
+        def entries():
+            for r in records:
+                row = self._entry(r)
+                if row is not None:
+                    self._count(row)
+                yield row
+        # Per row: (label pairs, numeric value, parsed stamp); None for empty slots.
+        self.rows: Sequence[Optional[tuple]] = PackedRows.of(self.labels, entries())
+
+    @classmethod
+    def on(cls, labels: Sequence[str] = (), value: Optional[str] = None) -> IndexFactory:
+        return partial(cls, labels=labels, value=value)
+
+    def _keys(self, pairs) -> List[tuple]:
+        values = dict(pairs)
+        return list(product(*((lower_key(values.get(f)), ANY) for f in self.labels)))
+
+    def _row(self, record: Dict[str, Any]) -> tuple:
+        return (tuple((f, record.get(f)) for f in self.labels if f in record),
+                _numeric(record.get(self.value)) if self.value else None, raw_stamp(record))
+
+    def _entry(self, record: Optional[Dict[str, Any]]) -> Optional[tuple]:
+        if record is None:
+            return None
+        pairs, value, raw = self._row(record)
+        return pairs, value, parse_stamp(raw)
+
+    def _count(self, row: tuple) -> None:
+        pairs, value, stamp = row
+        for key in self._keys(pairs):
+            summary = self.groups.get(key)
+            if summary is None:
+                summary = self.groups[key] = Summary()
+            summary.add(pairs, value, stamp)
+
+    def _uncount(self, row: tuple) -> None:
+        pairs, value, stamp = row
+        for key in self._keys(pairs):
+            summary = self.groups[key]
+            summary.add(pairs, value, stamp, sign=-1)
+            if stamp is not None and stamp == summary.newest:
+                self._stale.add(key)
+
+    def lookup(self, filters: Dict[str, Any]) -> Optional[Summary]:
+        """Summary of the rows matching equality ``filters`` on label fields;
+        ``None`` if a filter is on some other field."""
+        if any(f not in self.labels for f in filters):
+            return None
+        if self._stale:
+            self._refresh_newest()
+        key = tuple(lower_key(filters[f]) if filters.get(f) else ANY for f in self.labels)
+        return self.groups.get(key) or Summary()
+
+    def over(self, positions: Iterable[int]) -> Summary:
+        """Summary of arbitrary rows (e.g. a search or date-range match set):
+        one pass over their precomputed entries, no parsing."""
+        if isinstance(self.rows, PackedRows):
+            return self.rows.over(positions)
+        summary = Summary()
+        rows = self.rows.take(positions) if isinstance(self.rows, LayeredList) else (self.rows[p] for p in positions)
+        for row in rows:
+            if row is not None:
+                summary.add(*row)
+        return summary
+
+    @property
+    def nbytes(self) -> int:
+        return sizeof(self.rows) + sizeof(self.groups)
+
+    def pack(self) -> Optional[List[bytes]]:
+        """Flat buffers for :meth:`attach`; ``None`` if a row is empty or a value is not JSON."""
+        if self._stale:
+            self._refresh_newest()
+        rows = self.rows if isinstance(self.rows, PackedRows) else PackedRows.of(self.labels, self.rows)
+        if rows.empty:
+            return None
+        try:
+            groups = [[[None if v is ANY else v for v in key], s.count,
+                       [[f, list(c.items())] for f, c in s.labels.items()], s.value_sum, s.value_count, s.newest]
+                      for key, s in self.groups.items()]
+            meta = pack_json({"tables": [[json.dumps(v) for v in t] for t in rows.tables], "groups": groups})
+        except TypeError:
+            return None
+        return [meta, rows.values.tobytes(), rows.stamps.tobytes()] + [c.tobytes() for c in rows.codes]
+
+    def attach(self, buffers: List[Any]) -> "SummaryIndex":
+        meta = unpack_json(buffers[0])
+        self.rows = PackedRows(self.labels, [[json.loads(v) for v in t] for t in meta["tables"]],
+                               buffers[1], buffers[2], buffers[3:])
+        self._records = None
+        self.groups = {}
+        for key, count, labels, value_sum, value_count, newest in meta["groups"]:
+            summary = self.groups[tuple(ANY if v is None else v for v in key)] = Summary()
+            summary.count, summary.value_sum, summary.value_count, summary.newest = count, value_sum, value_count, newest
+            summary.labels = {f: dict((v, n) for v, n in pairs) for f, pairs in labels}
+        return self
+
+    def _refresh_newest(self) -> None:
+        # One pass for every group whose newest row was removed.
+        stale, newest = set(self._stale), {}
+        for row in self.rows:
+            if row is None or row[2] is None:
+                continue
+            for key in self._keys(row[0]):
+                if key in stale and row[2] > newest.get(key, float("-inf")):
+                    newest[key] = row[2]
+        for key in stale:
+            if key in self.groups:
+                self.groups[key].newest = newest.get(key)
+        self._stale -= stale
+
+    def updated(self, records: Sequence[Dict[str, Any]],
+                changed: Optional[Iterable[int]] = None) -> "SummaryIndex":
+        """New version of this index re-counting (and re-parsing) only the rows that
+        changed (among ``changed``, or among all rows); the other rows are shared."""
+        index = object.__new__(SummaryIndex)
+        index.field, index.labels, index.value = self.field, self.labels, self.value
+        index.groups = {k: s.copy() for k, s in self.groups.items()}
+        index._stale = set(self._stale)
+        index._records = records
+        rows, old_records, length, layer = self.rows, self._records, len(records), {}
+        full = changed is None
+        if full:
+            for pos in range(length, len(rows)):
+                if rows[pos] is not None:
+                    index._uncount(rows[pos])
+            changed = range(length)
+        for pos in changed:
+            record, old = records[pos], rows[pos] if pos < len(rows) else None
+            if record is not None and old is not None and (
+                    index._row(record) == index._row(old_records[pos]) if old_records is not None
+                    else index._entry(record) == old):
+                continue
+            if old is not None:
+                index._uncount(old)
+            new = layer[pos] = index._entry(record)
+            if new is not None:
+                index._count(new)
+        index.rows = LayeredList.over(rows).patched(layer, length)
+        if full:  # a reload: start the new version flat
+            index.rows = PackedRows.of(index.labels, index.rows)
+        return index
+
+
+class PackedRows(SequenceABC):
+    """``SummaryIndex.rows`` as columns: a code per label field (into ``tables``),
+    values and parsed stamps as doubles (NaN for ``None``) and the empty rows.
+    Built by :meth:`of`, or over :meth:`SummaryIndex.pack` buffers."""
+
+    def __init__(self, labels: Sequence[str], tables: List[List[Any]], values, stamps,
+                 codes: List[Any], empty: Iterable[int] = ()):
+        self.labels, self.tables, self.empty = labels, tables, set(empty)
+        self.values, self.stamps = _view(values, "d"), _view(stamps, "d")
+        self.codes = [_view(c, "I") for c in codes]
+        self._pairs: Dict[tuple, tuple] = {}
+
+    @classmethod
+    def of(cls, labels: Sequence[str], rows: Iterable[Optional[tuple]]) -> "PackedRows":
+        """Columns for ``SummaryIndex`` entries (``None`` for an empty slot)."""
+        tables: List[List[Any]] = [[] for _ in labels]
+        seen: List[Dict[Any, int]] = [{} for _ in labels]
+        codes = [array("I") for _ in labels]
+        values, stamps, empty = array("d"), array("d"), []
+        for pos, row in enumerate(rows):
+            if row is None:
+                empty.append(pos)
+                row = ((), None, None)
+            pairs, value, stamp = row
+            present = dict(pairs)
+            for f, table, table_seen, column in zip(labels, tables, seen, codes):
+                column.append(_code(table, table_seen, present[f]) if f in present else NONE)
+            values.append(math.nan if value is None else value)
+            stamps.append(math.nan if stamp is None else stamp)
+        return cls(labels, tables, values, stamps, codes, empty)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(map(sizeof, [self.values, self.stamps, *self.codes, self.empty]))
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[p] for p in range(*pos.indices(len(self)))]
+        if self.empty and pos in self.empty:
+            return None
+        value, stamp = self.values[pos], self.stamps[pos]
+        return self._labels(pos), None if value != value else value, None if stamp != stamp else stamp
+
+    def _labels(self, pos: int) -> tuple:
+        key = tuple(c[pos] for c in self.codes)
+        return self._pairs.get(key) or self._labels_of(key)
+
+    def _labels_of(self, key: tuple) -> tuple:
+        pairs = self._pairs[key] = tuple((f, t[code]) for f, t, code in zip(self.labels, self.tables, key)
+                                         if code != NONE)
+        return pairs
+
+    def over(self, positions: Iterable[int]) -> Summary:
+        """``SummaryIndex.over`` without building rows: totals per label combination first."""
+        values, stamps, codes = self.values, self.stamps, self.codes
+        if self.empty:
+            positions = [p for p in positions if p not in self.empty]
+        # label codes -> [rows, value sum, value count, newest]
+        totals: Dict[tuple, list] = {}
+        for p in positions:
+            key = tuple(c[p] for c in codes)
+            t = totals.get(key)
+            if t is None:
+                t = totals[key] = [0, 0.0, 0, None]
+            t[0] += 1
+            value, stamp = values[p], stamps[p]
+            if value == value:
+                t[1] += value
+                t[2] += 1
+            if stamp == stamp and (t[3] is None or stamp > t[3]):
+                t[3] = stamp
+        summary = Summary()
+        for key, t in totals.items():
+            summary.add_totals(self._pairs.get(key) or self._labels_of(key), *t)
+        return summary
+
+
+def _view(buffer, typecode: str):
+    return buffer if isinstance(buffer, array) else memoryview(buffer).cast(typecode)
+
+
+def _code(table: List[Any], seen: Dict[Any, int], value: Any) -> int:
+    """Position of ``value`` in ``table``, appending it if new; 1, 1.0 and True stay distinct."""
+    try:
+        key = (type(value), value)
+        code = seen.get(key)
+    except TypeError:  # unhashable (a list or dict label)
+        key = (type(value), repr(value))
+        code = seen.get(key)
+    if code is None:
+        code = seen[key] = len(table)
+        table.append(value)
+    return code
@@ -1,8 +1,11 @@
 """Support ticket connector — filtering by status/priority/customer_id."""
 
 import logging
-from typing import Any, Dict, List
-from app.connectors.base import BaseConnector
+from typing import Any, Callable, Dict, Iterable, List
+from app.connectors.base import BaseConnector, Selection
+from app.connectors.indexes import HashIndex, intersect, lower_key, str_key
+from app.connectors.sqlite import Table, sort_value, sqlite_store
+from app.connectors.summary import SummaryIndex
 from app.models.common import DataType
 
 logger = logging.getLogger(__name__)
@@ -10,40 +13,92 @@ logger = logging.getLogger(__name__)
 PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
 
 
+def _priority_rank(record: Dict[str, Any]) -> int:
+    return PRIORITY_ORDER.get(record.get("priority", "low"), 99)
+
+
 class SupportConnector(BaseConnector):
     source_name = "support"
     description = "Retrieve support tickets with optional filters."
     data_type = DataType.TABULAR
+    filename = "support_tickets.json"
+    index_fields = {"status": HashIndex.on(lower_key), "priority": HashIndex.on(lower_key),
+                    "customer_id": HashIndex.on(str_key),
+                    "summary": SummaryIndex.on(labels=("status", "priority"))}
+    id_fields = ("ticket_id",)
+    table = Table("support_tickets", keys={"status": lower_key, "priority": lower_key, "customer_id": str_key},
+                  order={"priority": _priority_rank, "created_at": sort_value("created_at")},
+                  indexes=("status, by_priority DESC", "priority, by_priority DESC", "customer_id",
+                           "by_priority DESC", "by_created_at DESC"),
+                  labels=("status", "priority"))
 
     def fetch(self, **filters) -> List[Dict[str, Any]]:
-        records = self._load_json("support_tickets.json")
-
-        if status := filters.get("status"):
-            records = [r for r in records if r.get("status", "").lower() == status.lower()]
-
-        if priority := filters.get("priority"):
-            records = [r for r in records if r.get("priority", "").lower() == priority.lower()]
-
-        if cid := filters.get("customer_id"):
-            records = [r for r in records if str(r.get("customer_id")) == str(cid)]
+        return self.select(**filters).sorted()
 
+    def select(self, **filters) -> Selection:
         sort_field = filters.get("sort_by", "priority")
         sort_order = filters.get("sort_order", "desc")
+        sort_key = _priority_rank if sort_field == "priority" else None
+        if (queried := self._queried(filters, sort_field, sort_order, sort_key)) is not None:
+            return queried
+        if (streamed := self._streamed(filters, sort_field, sort_order, sort_key)) is not None:
+            return streamed
+
+        ds = self._load_dataset(self.filename, self.index_fields)
+        positions = intersect(ds.indexes, {"status": filters.get("status"),
+                                           "priority": filters.get("priority"),
+                                           "customer_id": filters.get("customer_id")})
+        selection = self._order(ds, positions, sort_field, sort_order, sort_key)
+        selection.summary = self._summary(ds, filters, positions)
+
+        logger.info("Support fetch: %d results (filters=%s)", len(selection), filters)
+        return selection
 
-        if sort_field == "priority":
-            records.sort(key=lambda r: PRIORITY_ORDER.get(r.get("priority", "low"), 99),
-                         reverse=(sort_order == "desc"))
-        else:
-            records.sort(key=lambda r: r.get(sort_field, ""), reverse=(sort_order == "desc"))
+    def ticket_stats(self, customer_ids: Iterable[Any]) -> Dict[str, Dict[str, int]]:
+        """``str(customer_id)`` -> total/open/high ticket counts, from the index posting lists."""
+        wanted = {str(cid) for cid in customer_ids}
+        stats = {cid: {"total": 0, "open": 0, "high": 0} for cid in wanted}
+        if self._uses_sqlite():
+            for cid, total, open_, high in sqlite_store.execute(
+                    f"SELECT customer_id, count(*), sum(status = 'open'), sum(priority = 'high')"
+                    f" FROM support_tickets WHERE customer_id IN ({', '.join('?' * len(wanted))})"
+                    f" GROUP BY customer_id", wanted):
+                stats[cid] = {"total": total, "open": open_, "high": high}
+            return stats
+        if self._is_streaming():
+            for r in self._stream_matches(lambda r: str(r.get("customer_id")) in wanted):
+                s = stats[str(r.get("customer_id"))]
+                s["total"] += 1
+                s["open"] += r.get("status", "").lower() == "open"
+                s["high"] += r.get("priority", "").lower() == "high"
+            return stats
+        ds = self._load_dataset(self.filename, self.index_fields)
+        status, priority = ds.indexes["status"].keys, ds.indexes["priority"].keys
+        for cid in wanted:
+            positions = ds.indexes["customer_id"].postings.get(cid, [])
+            stats[cid] = {"total": len(positions),
+                          "open": sum(1 for p in positions if status[p] == "open"),
+                          "high": sum(1 for p in positions if priority[p] == "high")}
+        return stats
 
-        logger.info("Support fetch: %d results (filters=%s)", len(records), filters)
-        return records
+    def _predicate(self, filters: Dict[str, Any]) -> Callable[[Dict[str, Any]], bool]:
+        checks = []
+        if status := filters.get("status"):
+            status = status.lower()
+            checks.append(lambda r: r.get("status", "").lower() == status)
+        if priority := filters.get("priority"):
+            priority = priority.lower()
+            checks.append(lambda r: r.get("priority", "").lower() == priority)
+        if cid := filters.get("customer_id"):
+            checks.append(lambda r: str(r.get("customer_id")) == str(cid))
+        return lambda r: all(check(r) for check in checks)
 
     def _get_parameters(self) -> Dict[str, Any]:
         return {
             "status": {"type": "string", "description": "Filter by status", "enum": ["open", "closed"]},
             "priority": {"type": "string", "description": "Filter by priority", "enum": ["high", "medium", "low"]},
             "customer_id": {"type": "integer", "description": "Filter by customer ID"},
+            "expand": {"type": "string", "description": "Attach the customer record to each ticket", "enum": ["customer"]},
             "sort_by": {"type": "string", "description": "Sort field", "default": "priority"},
             "sort_order": {"type": "string", "description": "Sort direction", "enum": ["asc", "desc"]},
         }
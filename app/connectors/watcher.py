@@ -0,0 +1,170 @@
+"""Background watcher that hot-swaps changed data files into the dataset cache.
+
+``DATA_DIR`` is watched with inotify where available (Linux), falling back to
+polling file fingerprints every ``DATA_WATCH_INTERVAL`` seconds. On a change
+the new file (or just the lines appended to its changelog) is parsed and
+indexed in the watcher thread and then swapped in
+under the cache lock, so requests keep serving the previous version until the
+new one is complete. A file that fails to parse, disappears, or is still being
+written keeps the last good version live.
+
+With a shared store attached (``SHARED_DATASETS``) each pass first lets the
+elected loader publish changed files; every worker then swaps in what was
+published, woken by the store's generation counter changing.
+"""
+
+import ctypes, ctypes.util, logging, os, select, sys, threading, time
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.connectors.cache import dataset_cache
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) events that can leave a data file with new contents.
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x002, 0x004, 0x008
+IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x080, 0x100, 0x200
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+# With inotify, a stat check still runs this often in case an event is missed
+# (e.g. some network and bind-mounted filesystems).
+RESYNC_SECONDS = 30.0
+# Events are drained until the directory has been quiet this long.
+SETTLE_SECONDS = 0.05
+
+
+def _inotify(*directories: str) -> Optional[int]:
+    """Non-blocking inotify fd watching ``directories``, or ``None`` if unsupported."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    for directory in directories:
+        if libc.inotify_add_watch(fd, os.fsencode(str(directory)), WATCH_MASK) < 0:
+            logger.warning("inotify_add_watch(%s) failed: %s", directory, os.strerror(ctypes.get_errno()))
+            os.close(fd)
+            return None
+    return fd
+
+
+class DatasetWatcher:
+    def __init__(self):
+        self.connectors: List[Any] = []
+        self.backend: Optional[str] = None
+        self.interval = settings.DATA_WATCH_INTERVAL
+        self.attach = True
+        self.swaps = 0
+        self.last_swap: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._fd: Optional[int] = None
+        self._wake: Optional[tuple] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, connectors: Iterable[Any], backend: Optional[str] = None,
+              interval: Optional[float] = None, attach: bool = True) -> bool:
+        """Watch the connectors' data files; False if already running.
+
+        ``backend`` is ``auto`` (inotify, else polling), ``inotify`` or ``poll``.
+        ``attach=False`` only publishes to the shared store (a standalone loader).
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self.connectors = [c for c in connectors if c.filename]
+            self.interval = interval if interval is not None else settings.DATA_WATCH_INTERVAL
+            self.attach = attach
+            backend = backend or settings.DATA_WATCH_BACKEND
+            directories = [settings.DATA_DIR]
+            if dataset_cache.shared is not None:
+                dataset_cache.shared.directory.mkdir(parents=True, exist_ok=True)
+                directories.append(dataset_cache.shared.directory)
+            self._fd = _inotify(*directories) if backend in ("auto", "inotify") else None
+            if backend == "inotify" and self._fd is None:
+                logger.warning("inotify unavailable; polling %s instead", settings.DATA_DIR)
+            self.backend = "inotify" if self._fd is not None else "poll"
+            for connector in self.connectors if attach else ():
+                dataset_cache.watch(connector._resolve_path(connector.filename))
+            self._stop.clear()
+            self._wake = os.pipe()
+            self._thread = threading.Thread(target=self._run, name="dataset-watcher", daemon=True)
+            self._thread.start()
+            logger.info("Watching %s for data changes (%s)", settings.DATA_DIR, self.backend)
+            return True
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        os.write(self._wake[1], b"x")
+        thread.join()
+        for fd in (self._fd, *self._wake):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._wake = None
+        for connector in self.connectors if self.attach else ():
+            dataset_cache.unwatch(connector._resolve_path(connector.filename))
+
+    def refresh(self) -> List[str]:
+        """One pass: reload and swap in every changed file. Returns the swapped file names."""
+        shared = dataset_cache.shared
+        if shared is not None and shared.lead():
+            shared.publish(self.connectors)
+        if not self.attach:
+            return []
+        swapped = []
+        for connector in self.connectors:
+            path = connector._resolve_path(connector.filename)
+            dataset_cache.watch(path)  # the file may have switched to an .ndjson sibling
+            try:
+                if path.stat().st_size > settings.STREAMING_THRESHOLD_BYTES:
+                    continue
+            except OSError:
+                continue
+            if dataset_cache.refresh(path, connector.index_fields, connector.id_fields) is not None:
+                swapped.append(path.name)
+        if swapped:
+            self.swaps += len(swapped)
+            self.last_swap = time.time()
+            logger.info("Hot-swapped %s", ", ".join(swapped))
+        return swapped
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Dataset watcher pass failed")
+            self._wait()
+
+    def _wait(self) -> None:
+        """Block until the data directory changes, a poll/resync is due, or :meth:`stop`."""
+        wake = self._wake[0]
+        if self._fd is None:
+            select.select([wake], [], [], self.interval)
+            return
+        ready, _, _ = select.select([self._fd, wake], [], [], RESYNC_SECONDS)
+        while self._fd in ready and not self._stop.is_set():
+            try:
+                while os.read(self._fd, 64 * 1024):
+                    pass
+            except BlockingIOError:
+                pass
+            ready, _, _ = select.select([self._fd, wake], [], [], SETTLE_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": self.running, "backend": self.backend if self.running else None,
+                "swaps": self.swaps, "last_swap": self.last_swap}
+
+
+dataset_watcher = DatasetWatcher()
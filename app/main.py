@@ -1,6 +1,6 @@
 """FastAPI entry point — CORS, lifespan, routers, global error handler."""
 
-import logging
+import asyncio, logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
@@ -8,8 +8,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.config import settings
-from app.routers import health, data
+from app.connectors.cache import dataset_cache
+from app.connectors.shared import shared_store
+from app.connectors.watcher import dataset_watcher
+from app.routers import health, data, metrics
 from app.utils.logging import configure_logging
+from app.utils.profiler import profiler
 
 configure_logging()
 logger = logging.getLogger(__name__)
@@ -20,7 +24,21 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 %s v%s starting (voice=%s, max=%d)",
                 settings.APP_NAME, settings.APP_VERSION,
                 settings.DEFAULT_VOICE_MODE, settings.MAX_RESULTS)
+    if settings.SHARED_DATASETS and settings.DATASET_CACHE_ENABLED:
+        # One elected worker parses and publishes; every worker maps what it published.
+        # Started before the preload, which waits for the first publication.
+        dataset_cache.shared = shared_store
+        dataset_watcher.start(health.CONNECTORS.values())
+    if settings.PRELOAD_DATASETS:
+        # Warm the dataset cache so /health reports counts and first queries skip the load.
+        await asyncio.gather(*(conn.aselect() for conn in health.CONNECTORS.values()))
+    if settings.DATA_WATCH_ENABLED and settings.DATASET_CACHE_ENABLED and settings.DATASET_BACKEND == "json":
+        # Reload changed files in the background instead of on the request path.
+        dataset_watcher.start(health.CONNECTORS.values())
     yield
+    dataset_watcher.stop()
+    shared_store.release()
+    profiler.stop()
     logger.info("🛑 %s shutting down", settings.APP_NAME)
 
 
@@ -37,6 +55,7 @@ app = FastAPI(
     openapi_tags=[
         {"name": "Health", "description": "Operational health checks."},
         {"name": "Data", "description": "Query data sources with filtering and voice optimisation."},
+        {"name": "Metrics", "description": "Prometheus metrics and the opt-in sampling profiler."},
     ],
 )
 
@@ -50,6 +69,7 @@ app.add_middleware(
 
 app.include_router(health.router)
 app.include_router(data.router)
+app.include_router(metrics.router)
 
 
 @app.exception_handler(Exception)
@@ -3,3 +3,4 @@ from app.models.common import DataResponse, Metadata, DataType, PaginationInfo,
 from app.models.crm import Customer
 from app.models.support import SupportTicket
 from app.models.analytics import AnalyticsMetric, AnalyticsSummary
+from app.models.batch import BatchQuery, BatchRequest, BatchResponse
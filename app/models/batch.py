@@ -0,0 +1,36 @@
+"""Batch query models — several source queries answered in one round-trip."""
+
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+from app.models.common import DataResponse, VoiceContext
+
+MAX_BATCH_QUERIES = 10
+
+
+class BatchQuery(BaseModel):
+    source: str = Field(..., description="Data source (crm, support, analytics)")
+    voice_mode: bool = Field(True, description="Enable voice-optimised responses")
+    page: int = Field(1, ge=1, description="Page number")
+    page_size: Optional[int] = Field(None, ge=1, le=100, description="Items per page")
+    sort_by: Optional[str] = Field(None, description="Sort field")
+    sort_order: str = Field("desc", description="Sort direction")
+    status: Optional[str] = Field(None, description="Status filter (CRM/Support)")
+    customer_id: Optional[int] = Field(None, description="Customer ID filter")
+    search: Optional[str] = Field(None, description="CRM text search")
+    priority: Optional[str] = Field(None, description="Support priority filter")
+    metric: Optional[str] = Field(None, description="Analytics metric filter")
+    date_from: Optional[str] = Field(None, description="Start date (YYYY-MM-DD)")
+    date_to: Optional[str] = Field(None, description="End date (YYYY-MM-DD)")
+    expand: Optional[str] = Field(None, description="Join related data: 'customer' (support) or 'tickets' (CRM)")
+    cursor: Optional[str] = Field(None, description="`next_cursor` from a previous page; overrides `page`")
+
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+
+
+class BatchResponse(BaseModel):
+    success: bool = Field(True)
+    results: List[DataResponse] = Field(..., description="One response per query, in request order")
+    voice_context: Optional[VoiceContext] = Field(None, description="Combined spoken context")
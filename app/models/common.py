@@ -2,7 +2,7 @@
 
 from enum import Enum
 from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class DataType(str, Enum):
@@ -19,12 +19,16 @@ class PaginationInfo(BaseModel):
     total_pages: int = Field(..., description="Total pages")
     has_next: bool = Field(..., description="Next page exists")
     has_previous: bool = Field(..., description="Previous page exists")
+    next_cursor: Optional[str] = Field(None, description="Opaque token: pass as `cursor` to get the next page")
 
 
 class VoiceContext(BaseModel):
     summary: str = Field(..., description="One-line spoken summary")
     freshness: str = Field(..., description="Data freshness indicator")
     suggestion: Optional[str] = Field(None, description="Follow-up suggestion")
+    # Newest data timestamp (epoch seconds) behind ``freshness``; lets cached
+    # responses re-render the freshness line without the rows.
+    _newest: Optional[float] = PrivateAttr(None)
 
 
 class DataSourceInfo(BaseModel):
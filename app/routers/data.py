@@ -1,24 +1,40 @@
-"""Data router — /data/{source}, /data/sources, /schema/functions."""
+"""Data router — /data/{source}, /data/batch, /data/sources, /schema/functions."""
 
-import logging
+import asyncio, logging
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Iterator, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
+from app.connectors.base import BaseConnector, Selection
 from app.connectors.crm_connector import CRMConnector
 from app.connectors.support_connector import SupportConnector
 from app.connectors.analytics_connector import AnalyticsConnector
+from app.connectors.summary import Summary
+from app.models.analytics import AnalyticsSummary
+from app.models.batch import BatchQuery, BatchRequest, BatchResponse
 from app.models.common import DataResponse, DataSourceInfo, Metadata
+from app.services.analytics_stats import series_stats
 from app.services.business_rules import BusinessRulesEngine
+from app.services.cursors import Cursor, decode_cursor, query_scope
 from app.services.data_identifier import identify_data_type
+from app.services.export import EXPORT_FORMATS, iter_csv, iter_ndjson
+from app.services.expansion import expand_page, related_connector, validate_expand
+from app.services.response_cache import response_cache
 from app.services.voice_optimizer import VoiceOptimizer
+from app.utils.metrics import observe_request
+from app.utils.serialization import RawJSONResponse, dumps, encode_envelope
+from app.utils.timing import collect, stage
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Data"])
 
 _rules = BusinessRulesEngine()
+# Selections larger than this are paginated in a worker thread so a big
+# sort/top-k pass does not stall the event loop.
+INLINE_PAGINATION_MAX_ROWS = 20_000
 _voice = VoiceOptimizer()
 
 _CONNECTOR_MAP = {
@@ -29,7 +45,7 @@ _CONNECTOR_MAP = {
 
 
 @router.get("/data/sources", summary="List available data sources")
-def list_sources():
+async def list_sources():
     sources = []
     for cls in _CONNECTOR_MAP.values():
         conn = cls()
@@ -38,9 +54,26 @@ def list_sources():
     return {"sources": sources}
 
 
+@router.get("/data/analytics/summary", response_model=AnalyticsSummary,
+            summary="Aggregate analytics statistics")
+async def get_analytics_summary(
+    metric: Optional[str] = Query(None, description="Analytics metric filter"),
+    date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+):
+    dates, values = await AnalyticsConnector().aseries(
+        metric=metric, date_from=date_from, date_to=date_to)
+    period = f"{dates[0]} to {dates[-1]}" if len(dates) else ""
+    return AnalyticsSummary(metric=metric or "all", period=period, **series_stats(values))
+
+
 @router.get("/data/{source}", response_model=DataResponse, summary="Query a data source",
-            responses={404: {"description": "Unknown data source"}})
-def get_data(
+            responses={404: {"description": "Unknown data source"},
+                       304: {"description": "Not modified (If-None-Match matched the ETag)"},
+                       422: {"description": "Invalid parameters or unsupported expand"}})
+async def get_data(
+    request: Request,
+    response: Response,
     source: str,
     voice_mode: bool = Query(True, description="Enable voice-optimised responses"),
     page: int = Query(1, ge=1, description="Page number"),
@@ -54,29 +87,219 @@ def get_data(
     metric: Optional[str] = Query(None, description="Analytics metric filter"),
     date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    expand: Optional[str] = Query(None, description="Join related data: 'customer' (support) or 'tickets' (CRM)"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page; overrides `page`"),
 ):
-    connector_cls = _CONNECTOR_MAP.get(source)
-    if not connector_cls:
-        raise HTTPException(404, f"Unknown source '{source}'. Available: {', '.join(_CONNECTOR_MAP)}")
+    connector = _connector_for(source)
+    _check_expand(source, expand)
+    fetch_kwargs = _build_fetch_kwargs(
+        source=source, status=status, customer_id=customer_id, search=search,
+        priority=priority, metric=metric, date_from=date_from, date_to=date_to,
+        sort_by=sort_by, sort_order=sort_order,
+    )
+    position = _decode(cursor, source, fetch_kwargs)
+    respond = _respond(request, response, connector, fetch_kwargs, page, page_size,
+                       voice_mode, expand, cursor, position)
+    if not settings.METRICS_ENABLED:
+        return await respond
+    with collect() as timings:
+        result = await respond
+    observe_request(source, timings)
+    (result if isinstance(result, Response) else response).headers["Server-Timing"] = timings.header()
+    return result
+
+
+async def _respond(request: Request, response: Response, connector: BaseConnector,
+                   fetch_kwargs: dict, page: int, page_size: Optional[int], voice_mode: bool,
+                   expand: Optional[str], cursor: Optional[str], position: Optional[Cursor]):
+    if not settings.RESPONSE_CACHE_ENABLED:
+        result = await _compute(connector, fetch_kwargs, page, page_size, voice_mode, expand, position)
+        return _render(result, None, response, {})
+
+    with stage("cache"):
+        key = response_cache.key(connector.source_name, fetch_kwargs, page=page, cursor=cursor,
+                                 voice_mode=voice_mode, expand=expand,
+                                 page_size=min(page_size or _rules.default_page_size, _rules.max_results))
+        version = _data_version(connector, expand)
+        etag = response_cache.etag(key, version)
+        headers = {"ETag": etag, "Cache-Control": f"private, max-age={settings.RESPONSE_CACHE_CLIENT_MAX_AGE}"}
+        if response_cache.matches(request.headers.get("if-none-match"), etag):
+            response_cache.record_not_modified()
+            return Response(status_code=304, headers=headers)
+        cached = response_cache.get(key, version)
+        if cached is not None:
+            result, data = cached
+            result = _restamp(result)
+    if cached is not None:
+        return _render(result, data, response, headers)
+    result = await _compute(connector, fetch_kwargs, page, page_size, voice_mode, expand, position)
+    with stage("serialize"):
+        data = dumps(result.data) if settings.FAST_SERIALIZATION else None
+    response_cache.put(key, version, (result, data))
+    return _render(result, data, response, headers)
+
+
+def _render(result: DataResponse, data: Optional[bytes], response: Response, headers: dict):
+    """Fast path: pre-encoded rows spliced into the envelope, skipping response_model
+    validation. Otherwise the model goes back to FastAPI as before."""
+    if not settings.FAST_SERIALIZATION:
+        response.headers.update(headers)
+        return result
+    with stage("serialize"):
+        if data is None:
+            data = dumps(result.data)
+        return RawJSONResponse(encode_envelope(result, data), headers=headers)
+
+
+async def _compute(connector: BaseConnector, fetch_kwargs: dict, page: int,
+                   page_size: Optional[int], voice_mode: bool, expand: Optional[str],
+                   cursor: Optional[Cursor] = None) -> DataResponse:
+    with stage("filter"):
+        selection = await connector.aselect(**fetch_kwargs)
+    if selection.blocking or expand or len(selection) > INLINE_PAGINATION_MAX_ROWS:
+        return await asyncio.to_thread(
+            _build_response, connector, selection, fetch_kwargs, page, page_size, voice_mode,
+            expand, cursor)
+    return _build_response(connector, selection, fetch_kwargs, page, page_size, voice_mode,
+                           cursor=cursor)
+
+
+def _data_version(connector: BaseConnector, expand: Optional[str]) -> tuple:
+    """Fingerprints of every dataset a response reads; a change means a new ETag."""
+    version = (connector.version(),)
+    if expand:
+        version += (related_connector(expand).version(),)
+    return version
+
+
+def _restamp(cached: DataResponse) -> DataResponse:
+    """Copy of a cached response with its wall-clock fields brought up to date."""
+    update = {"data_freshness": _now()}
+    if cached.metadata.voice_context:
+        update["voice_context"] = _voice.refresh(cached.metadata.voice_context)
+    return cached.model_copy(update={"metadata": cached.metadata.model_copy(update=update)})
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
 
-    connector = connector_cls()
+@router.get("/data/{source}/export", summary="Stream every matching row as NDJSON or CSV",
+            response_class=StreamingResponse,
+            responses={200: {"content": {m: {} for m in EXPORT_FORMATS.values()}},
+                       404: {"description": "Unknown data source"}})
+async def export_data(
+    source: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="`ndjson` or `csv`"),
+    sort_by: Optional[str] = Query(None, description="Sort field"),
+    sort_order: str = Query("desc", description="Sort direction"),
+    status: Optional[str] = Query(None, description="Status filter (CRM/Support)"),
+    customer_id: Optional[int] = Query(None, description="Customer ID filter"),
+    search: Optional[str] = Query(None, description="CRM text search"),
+    priority: Optional[str] = Query(None, description="Support priority filter"),
+    metric: Optional[str] = Query(None, description="Analytics metric filter"),
+    date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+):
+    connector = _connector_for(source)
     fetch_kwargs = _build_fetch_kwargs(
         source=source, status=status, customer_id=customer_id, search=search,
         priority=priority, metric=metric, date_from=date_from, date_to=date_to,
         sort_by=sort_by, sort_order=sort_order,
     )
+    selection = await connector.aselect(**fetch_kwargs)
+    # One selection, walked once: rows come lazily off the sorted index (or a
+    # streamed file's spilled sort) when there is one. Ordering and counting run
+    # on a worker thread, as does the sync generator, which only advances as the
+    # client reads, so a slow consumer holds back encoding.
+    rows, total = await asyncio.to_thread(_export_rows, selection)
+    encode = iter_csv if format == "csv" else iter_ndjson
+    return StreamingResponse(encode(rows), media_type=EXPORT_FORMATS[format], headers={
+        "Content-Disposition": f'attachment; filename="{source}.{format}"',
+        "X-Total-Count": str(total),
+    })
+
+
+def _export_rows(selection: Selection) -> Tuple[Iterator, int]:
+    if selection.export is not None:
+        return selection.export()
+    rows = selection.ordered() if selection.ordered is not None else iter(selection.sorted())
+    return rows, len(selection)
+
+
+@router.post("/data/batch", response_model=BatchResponse, summary="Run several queries at once",
+             responses={404: {"description": "Unknown data source"}})
+async def post_batch(body: BatchRequest):
+    # Validate every source before starting any work.
+    connectors = [_connector_for(q.source) for q in body.queries]
+    for q in body.queries:
+        _check_expand(q.source, q.expand)
+
+    fetch_kwargs = [_build_fetch_kwargs(
+        source=q.source, status=q.status, customer_id=q.customer_id, search=q.search,
+        priority=q.priority, metric=q.metric, date_from=q.date_from, date_to=q.date_to,
+        sort_by=q.sort_by, sort_order=q.sort_order,
+    ) for q in body.queries]
+    cursors = [_decode(q.cursor, q.source, kw) for q, kw in zip(body.queries, fetch_kwargs)]
+
+    def run(connector: BaseConnector, q: BatchQuery, kwargs: dict, cursor: Optional[Cursor]) -> DataResponse:
+        return _build_response(connector, connector.select(**kwargs), kwargs,
+                               q.page, q.page_size, q.voice_mode, q.expand, cursor)
+
+    # Sub-queries run concurrently on worker threads: turn latency tracks the slowest one.
+    results = await asyncio.gather(*(asyncio.to_thread(run, *args)
+                                     for args in zip(connectors, body.queries, fetch_kwargs, cursors)))
+    contexts = [r.metadata.voice_context for r in results if r.metadata.voice_context]
+    return BatchResponse(success=True, results=results,
+                         voice_context=_voice.combine(contexts) if contexts else None)
+
+
+def _connector_for(source: str) -> BaseConnector:
+    connector_cls = _CONNECTOR_MAP.get(source)
+    if not connector_cls:
+        raise HTTPException(404, f"Unknown source '{source}'. Available: {', '.join(_CONNECTOR_MAP)}")
+    return connector_cls()
+
+
+def _check_expand(source: str, expand: Optional[str]) -> None:
+    if expand:
+        try:
+            validate_expand(source, expand)
+        except ValueError as e:
+            raise HTTPException(422, str(e))
+
+
+def _decode(cursor: Optional[str], source: str, fetch_kwargs: dict) -> Optional[Cursor]:
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, query_scope(source, fetch_kwargs))
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
 
-    raw_data = connector.fetch(**fetch_kwargs)
-    total = len(raw_data)
-    data_type = identify_data_type(raw_data)
+def _build_response(connector: BaseConnector, selection: Selection, fetch_kwargs: dict,
+                    page: int, page_size: Optional[int], voice_mode: bool,
+                    expand: Optional[str] = None, cursor: Optional[Cursor] = None) -> DataResponse:
+    source = connector.source_name
+    total = len(selection)
+    with stage("identify"):
+        data_type = identify_data_type(selection.rows)
 
-    page_data, pagination, _ = _rules.apply(
-        raw_data, page=page, page_size=page_size, voice_mode=voice_mode)
+    with stage("paginate"):
+        page_data, pagination, _ = _rules.apply(
+            selection, page=page, page_size=page_size, voice_mode=voice_mode,
+            cursor=cursor, scope=query_scope(source, fetch_kwargs))
+    if expand:
+        with stage("expand"):
+            page_data = expand_page(source, page_data, expand)
 
     voice_context = None
     if voice_mode:
-        voice_context = _voice.build_voice_context(
-            data=page_data, source=source, total=total, returned=len(page_data))
+        with stage("voice"):
+            voice_context = _voice.build_voice_context(
+                data=page_data, source=source, total=total, returned=len(page_data),
+                summary=selection.summary() if selection.summary else Summary.of(selection.rows))
 
     filters_applied = {k: v for k, v in fetch_kwargs.items()
                        if v is not None and k not in ("sort_by", "sort_order")}
@@ -85,18 +308,19 @@ def get_data(
         total_results=total,
         returned_results=len(page_data),
         data_type=data_type,
-        data_freshness=datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC"),
+        data_freshness=_now(),
         source=DataSourceInfo(name=connector.source_name, description=connector.description,
                               record_count=total),
         pagination=pagination,
         voice_context=voice_context,
         filters_applied=filters_applied,
     )
-    return DataResponse(success=True, data=page_data, metadata=metadata)
+    # Metadata is validated above; rows are plain JSON-ready dicts, not re-walked.
+    return DataResponse.model_construct(success=True, data=page_data, metadata=metadata)
 
 
 @router.get("/schema/functions", summary="LLM function-calling schemas")
-def get_function_schemas():
+async def get_function_schemas():
     functions = [cls().get_schema() for cls in _CONNECTOR_MAP.values()]
     return {"functions": functions}
 
@@ -1,9 +1,13 @@
-"""Health check router."""
+"""Health check router — cheap liveness (/health) and opt-in deep readiness (/health/ready)."""
 
 import time, logging
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from app.config import settings
 from app.connectors import CRMConnector, SupportConnector, AnalyticsConnector
+from app.connectors.cache import dataset_cache
+from app.connectors.watcher import dataset_watcher
+from app.services.response_cache import response_cache
 
 router = APIRouter(tags=["Health"])
 logger = logging.getLogger(__name__)
@@ -18,18 +22,38 @@ CONNECTORS = {
 
 @router.get("/health")
 async def health_check():
+    # Metadata only (a stat per file): safe for frequent probes at any data size.
     uptime = time.time() - _start_time
-    sources = {}
+    sources = {name: conn.describe() for name, conn in CONNECTORS.items()}
+
+    return {
+        "status": "healthy",
+        "version": settings.APP_VERSION,
+        "uptime_seconds": round(uptime, 2),
+        "data_sources": sources,
+        "cache": dataset_cache.stats(),
+        "watcher": dataset_watcher.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
+
+@router.get("/health/ready", responses={503: {"description": "A data source failed to load"}})
+async def readiness_check():
+    """Deep check: loads (or revalidates) every dataset and runs a query against it."""
+    sources, ready = {}, True
     for name, conn in CONNECTORS.items():
         try:
-            count = conn.get_record_count()
+            if not conn.describe()["available"]:
+                raise FileNotFoundError(conn.filename)
+            count = len(await conn.aselect())
             sources[name] = {"available": True, "record_count": count}
         except Exception:
+            logger.exception("Readiness check failed for %s", name)
             sources[name] = {"available": False, "record_count": 0}
+            ready = False
 
-    return {
-        "status": "healthy",
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "status": "ready" if ready else "unavailable",
         "version": settings.APP_VERSION,
-        "uptime_seconds": round(uptime, 2),
         "data_sources": sources,
-    }
+    })
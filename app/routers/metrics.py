@@ -0,0 +1,49 @@
+"""Metrics router — Prometheus /metrics and the opt-in runtime profiler."""
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.connectors.cache import dataset_cache
+from app.services.response_cache import response_cache
+from app.utils import metrics
+from app.utils.profiler import profiler
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Prometheus metrics")
+async def get_metrics():
+    lines = [metrics.render().rstrip("\n")]
+    lines += metrics.gauges("udc_dataset_cache", "Parsed-dataset cache statistics.", dataset_cache.stats())
+    lines += metrics.gauges("udc_response_cache", "Response cache statistics.", response_cache.stats())
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+def _require_profiler() -> None:
+    if not settings.PROFILER_ENDPOINTS:
+        raise HTTPException(404, "Profiler endpoints are disabled (set PROFILER_ENDPOINTS=true)")
+
+
+@router.post("/debug/profiler/start", summary="Start the sampling profiler")
+async def start_profiler(interval_ms: float = Query(5.0, ge=0.5, le=1000, description="Sampling interval")):
+    _require_profiler()
+    started = profiler.start(interval_ms / 1000)
+    return {"started": started, **profiler.report(top=0)}
+
+
+@router.post("/debug/profiler/stop", summary="Stop the sampling profiler")
+async def stop_profiler(top: int = Query(20, ge=0, le=200)):
+    _require_profiler()
+    profiler.stop()
+    return profiler.report(top)
+
+
+@router.get("/debug/profiler", summary="Profiler status and samples")
+async def get_profiler(format: str = Query("json", pattern="^(json|collapsed)$",
+                                           description="`collapsed` = flamegraph input"),
+                       top: int = Query(20, ge=0, le=200)):
+    _require_profiler()
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    return profiler.report(top)
@@ -0,0 +1,44 @@
+"""Aggregate statistics for analytics series — NumPy-vectorised when installed."""
+
+from typing import Any, Dict, Sequence
+
+try:  # optional dependency: pip install numpy
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+# Relative change between the first and second half of a series that counts as a trend.
+TREND_THRESHOLD = 0.05
+
+
+def _trend(first: float, second: float) -> str:
+    if first == 0:
+        return "increasing" if second > 0 else "decreasing" if second < 0 else "stable"
+    change = (second - first) / abs(first)
+    if change > TREND_THRESHOLD:
+        return "increasing"
+    if change < -TREND_THRESHOLD:
+        return "decreasing"
+    return "stable"
+
+
+def series_stats(values: Sequence[float]) -> Dict[str, Any]:
+    """average/minimum/maximum/total/count/trend of chronologically ordered values."""
+    n = len(values)
+    if n == 0:
+        return {"average": 0.0, "minimum": 0.0, "maximum": 0.0, "total": 0.0,
+                "count": 0, "trend": "stable"}
+    half = n // 2
+    if np is not None:
+        arr = np.asarray(values, dtype=np.float64)
+        total = float(arr.sum())
+        minimum, maximum = float(arr.min()), float(arr.max())
+        first = float(arr[:half].mean()) if half else 0.0
+        second = float(arr[n - half:].mean()) if half else 0.0
+    else:
+        total = float(sum(values))
+        minimum, maximum = float(min(values)), float(max(values))
+        first = sum(values[:half]) / half if half else 0.0
+        second = sum(values[n - half:]) / half if half else 0.0
+    return {"average": total / n, "minimum": minimum, "maximum": maximum, "total": total,
+            "count": n, "trend": _trend(first, second) if half else "stable"}
@@ -1,33 +1,71 @@
 """Business rules engine — pagination, limiting, context messages."""
 
-import math, logging
-from typing import Any, Dict, List, Tuple
+import heapq, math, logging
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from app.config import settings
+from app.connectors.base import Selection
 from app.models.common import PaginationInfo
+from app.services.cursors import Cursor, encode_cursor
 
 logger = logging.getLogger(__name__)
 
 
 class BusinessRulesEngine:
+    # Heap-select the first ``stop`` rows while they are at most this share of
+    # the matches; beyond that a full timsort is cheaper.
+    top_k_ratio = 0.25
+
     def __init__(self, max_results: int = None, default_page_size: int = None):
         self.max_results = max_results or settings.MAX_RESULTS
         self.default_page_size = default_page_size or settings.DEFAULT_PAGE_SIZE
 
-    def apply(self, records: List[Dict[str, Any]], page: int = 1,
-              page_size: int = None, voice_mode: bool = True
+    def apply(self, records: Union[List[Dict[str, Any]], Selection], page: int = 1,
+              page_size: int = None, voice_mode: bool = True,
+              cursor: Optional[Cursor] = None, scope: str = ""
               ) -> Tuple[List[Dict[str, Any]], PaginationInfo, str]:
+        """Cut one page. With a ``cursor`` the page resumes after the cursor's row
+        (keyset) instead of at an offset; ``scope`` binds the returned next cursor
+        to the query.
+        """
         page_size = min(page_size or self.default_page_size, self.max_results)
         total = len(records)
         total_pages = max(1, math.ceil(total / page_size))
-        page = max(1, min(page, total_pages))
-        start = (page - 1) * page_size
-        page_records = records[start:start + page_size]
+        keyset = (isinstance(records, Selection) and records.sort_key is not None
+                  and records.id_key is not None)
+        if cursor is not None and keyset:
+            page = cursor.page + 1
+            rows, has_next = self._after(records, cursor, page_size)
+            total_pages = max(total_pages, page + has_next)
+            before = lambda value: cursor.tie + 1 if value == cursor.value else 0
+        else:
+            page = max(1, min(page, total_pages))
+            start = (page - 1) * page_size
+            rows = self._slice(records, start, start + page_size)
+            has_next = page < total_pages
+            before = lambda value: self._ties_before(records, start, value, page_size)
+        # Columnar stores hand out Row views; only the page becomes real dicts.
+        page_records = [r if isinstance(r, dict) else dict(r) for r in rows]
+
+        next_cursor = None
+        if keyset and has_next and page_records:
+            last = page_records[-1]
+            value = records.sort_key(last)
+            tie = 0
+            for r in reversed(page_records[:-1]):
+                if records.sort_key(r) != value:
+                    break
+                tie += 1
+            else:  # the ties run on from earlier pages
+                tie += before(value)
+            next_cursor = encode_cursor(Cursor(page, value, records.id_key(last), tie), scope)
 
         pagination = PaginationInfo(
             current_page=page, page_size=page_size,
             total_pages=total_pages,
-            has_next=page < total_pages, has_previous=page > 1,
+            has_next=has_next, has_previous=page > 1,
+            next_cursor=next_cursor,
         )
 
         if total == 0:
@@ -38,3 +76,81 @@ class BusinessRulesEngine:
             msg = f"Showing {len(page_records)} of {total} results (page {page}/{total_pages})."
 
         return page_records, pagination, msg
+
+    def _slice(self, records, start: int, stop: int) -> List[Dict[str, Any]]:
+        if not isinstance(records, Selection):
+            return records[start:stop]
+        if records.presorted:
+            return records.rows[start:stop]
+        if records.ordered is not None:
+            return list(islice(records.ordered(), start, stop))
+        if records.sort_key is None:
+            return records.rows[start:stop]
+        if stop <= len(records) * self.top_k_ratio:
+            # nsmallest/nlargest are documented equivalents of sorted(...)[:n],
+            # including tie order, so pages match the full-sort path.
+            pick = heapq.nlargest if records.reverse else heapq.nsmallest
+            return pick(stop, records.rows, key=records.sort_key)[start:]
+        return records.sorted()[start:stop]
+
+    def _ties_before(self, records: Selection, start: int, value: Any, window: int) -> int:
+        """How many rows just before offset ``start`` sort at ``value`` (read back in doubling windows)."""
+        count, stop = 0, start
+        while stop > 0:
+            lo = max(0, stop - window)
+            for r in reversed(self._slice(records, lo, stop)):
+                if records.sort_key(r) != value:
+                    return count
+                count += 1
+            stop, window = lo, window * 2
+        return count
+
+    def _after(self, records: Selection, cursor: Cursor, n: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """The ``n`` rows following the cursor's row, and whether more follow."""
+        key, ident = records.sort_key, records.id_key
+        if records.seek is not None:
+            rows = list(islice(_resume(records.seek(cursor.value), key, ident, cursor), n + 1))
+            return rows[:n], len(rows) > n
+
+        # One pass: ties with the cursor value (file order) and rows strictly beyond it.
+        beyond = (lambda k: k < cursor.value) if records.reverse else (lambda k: k > cursor.value)
+        ties, rest = [], []
+        for r in records.rows:
+            k = key(r)
+            if k == cursor.value:
+                ties.append(r)
+            elif beyond(k):
+                rest.append(r)
+        ties = _past(ties, ident, cursor)
+        rows = ties[:n + 1]
+        if len(rows) <= n:
+            pick = heapq.nlargest if records.reverse else heapq.nsmallest
+            rows += pick(n + 1 - len(rows), rest, key=key)
+        return rows[:n], len(rows) > n
+
+
+def _past(ties: List[Dict[str, Any]], ident, cursor: Cursor) -> List[Dict[str, Any]]:
+    """The ``ties`` (rows at the cursor value, in final order) after the cursor's row:
+    the one at its recorded place if that still has its id, else the first with its
+    id. If no row has it any more, all ties are kept rather than risk skipping one."""
+    if cursor.tie < len(ties) and ident(ties[cursor.tie]) == cursor.rid:
+        return ties[cursor.tie + 1:]
+    ids = [ident(r) for r in ties]
+    return ties[ids.index(cursor.rid) + 1:] if cursor.rid in ids else ties
+
+
+def _resume(rows: Iterator[Dict[str, Any]], key, ident, cursor: Cursor) -> Iterator[Dict[str, Any]]:
+    """``rows`` (final order, from the first row keyed at the cursor value) minus
+    the ties up to and including the cursor's row (see :func:`_past`)."""
+    ties = []
+    for r in rows:
+        if key(r) != cursor.value:
+            yield from _past(ties, ident, cursor)
+            yield r
+            yield from rows
+            return
+        if len(ties) == cursor.tie and ident(r) == cursor.rid:
+            yield from rows
+            return
+        ties.append(r)
+    yield from _past(ties, ident, cursor)
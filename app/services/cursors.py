@@ -0,0 +1,48 @@
+"""Opaque keyset-pagination cursors.
+
+A cursor records where the previous page ended — the last row's sort value,
+identity and place among the rows tied on that value — plus the page number,
+bound to the query it came from. Resuming
+from it never recomputes earlier pages and is not thrown off by rows added or
+removed before that point.
+"""
+
+import base64, hashlib, json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass(frozen=True)
+class Cursor:
+    page: int
+    value: Any
+    rid: tuple
+    tie: int = 0  # rows before this one with the same sort value (tells apart repeated ids)
+
+
+def query_scope(source: str, fetch_kwargs: Dict[str, Any]) -> str:
+    """Short digest of a query; a cursor is only valid for the query that issued it."""
+    raw = repr((source, sorted(fetch_kwargs.items())))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_cursor(cursor: Cursor, scope: str) -> Optional[str]:
+    try:
+        payload = json.dumps([scope, cursor.page, cursor.value, list(cursor.rid), cursor.tie],
+                             separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None  # sort value not representable; offset pagination still works
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, scope: str) -> Cursor:
+    """Raises ``ValueError`` for malformed tokens or tokens from another query."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        token_scope, page, value, rid, tie = json.loads(raw)
+        cursor = Cursor(int(page), value, tuple(rid), int(tie))
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+    if token_scope != scope:
+        raise ValueError("Cursor does not match this query (filters or sort changed)")
+    return cursor
@@ -0,0 +1,41 @@
+"""Server-side joins — attach related records to a result page (``expand=``).
+
+Only the returned page is expanded: its keys are collected once and probed
+against the other source's hash index, so the cost is one index lookup per
+distinct key on the page rather than a request (or a scan) per row.
+"""
+
+from typing import Any, Dict, List
+
+from app.connectors.crm_connector import CRMConnector
+from app.connectors.support_connector import SupportConnector
+
+EXPANSIONS = {
+    "support": {"customer": "Attach the ticket's customer record"},
+    "crm": {"tickets": "Attach total/open/high ticket counts per customer"},
+}
+
+
+def related_connector(expand: str):
+    """The connector whose data an expansion reads (part of the response's data version)."""
+    return CRMConnector() if expand == "customer" else SupportConnector()
+
+
+def validate_expand(source: str, expand: str) -> None:
+    allowed = EXPANSIONS.get(source, {})
+    if expand not in allowed:
+        options = ", ".join(allowed) or "none"
+        raise ValueError(f"Cannot expand '{expand}' on {source}. Supported: {options}")
+
+
+def expand_page(source: str, rows: List[Dict[str, Any]], expand: str) -> List[Dict[str, Any]]:
+    """New row dicts with the related data under ``expand``; cached rows are never mutated."""
+    validate_expand(source, expand)
+    keys = [str(r.get("customer_id")) for r in rows]
+    if expand == "customer":
+        related = {cid: dict(c) for cid, c in CRMConnector().lookup(keys).items()}
+        default = None
+    else:
+        related = SupportConnector().ticket_stats(keys)
+        default = {"total": 0, "open": 0, "high": 0}
+    return [{**r, expand: related.get(k, default)} for r, k in zip(rows, keys)]
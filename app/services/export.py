@@ -0,0 +1,52 @@
+"""Chunked NDJSON / CSV encoders for full-result exports.
+
+Both take rows lazily and yield encoded chunks of ``chunk_rows`` rows, so an
+export holds one chunk of output at a time regardless of the result size.
+"""
+
+import csv, io, json
+from typing import Any, Dict, Iterable, Iterator
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+CHUNK_ROWS = 1000
+
+
+def _plain(row) -> Dict[str, Any]:
+    # Columnar stores yield Row views; json/csv want real dicts.
+    return row if isinstance(row, dict) else dict(row)
+
+
+def iter_ndjson(rows: Iterable, chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    encode = json.JSONEncoder(separators=(",", ":"), default=str).encode
+    lines = []
+    for row in rows:
+        lines.append(encode(_plain(row)))
+        if len(lines) >= chunk_rows:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_csv(rows: Iterable, chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """Columns come from the first row; later rows' extra keys are dropped."""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    first = _plain(first)
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=list(first), restval="", extrasaction="ignore")
+    writer.writeheader()
+    writer.writerow(first)
+    n = 1
+    for row in rows:
+        writer.writerow(_plain(row))
+        n += 1
+        if n >= chunk_rows:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            n = 0
+    if buf.tell():
+        yield buf.getvalue()
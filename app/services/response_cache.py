@@ -0,0 +1,86 @@
+"""Bounded LRU/TTL cache of /data/{source} responses with ETag support.
+
+Keys are the source plus the normalised query (fetch kwargs, page, page size,
+voice mode, expand). Each entry remembers the data version (file fingerprints)
+it was built from, so a changed dataset is a miss rather than a stale hit. The
+ETag is derived from key + version only, which lets a matching
+``If-None-Match`` be answered with 304 before any work is done. Wall-clock
+fields (``data_freshness``, voice freshness) are excluded and refreshed on hits.
+"""
+
+import hashlib, threading, time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.config import settings
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = None, ttl: float = None):
+        self.max_entries = max_entries if max_entries is not None else settings.RESPONSE_CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else settings.RESPONSE_CACHE_TTL
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.not_modified = self.evictions = 0
+
+    @staticmethod
+    def key(source: str, fetch_kwargs: Dict[str, Any], **params) -> Tuple:
+        return (source, tuple(sorted(fetch_kwargs.items())), tuple(sorted(params.items())))
+
+    @staticmethod
+    def etag(key: Tuple, version: Any) -> str:
+        digest = hashlib.sha1(repr((key, version)).encode("utf-8")).hexdigest()[:20]
+        # Weak: the body's wall-clock fields differ between otherwise equal responses.
+        return f'W/"{digest}"'
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        tags = {t.strip() for t in if_none_match.split(",")}
+        return "*" in tags or etag in tags or etag[2:] in tags
+
+    def get(self, key: Tuple, version: Any) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == version and now - entry[2] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple, version: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, version, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache()
@@ -3,6 +3,7 @@
 import logging
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
+from app.connectors.summary import Summary
 from app.models.common import VoiceContext
 
 logger = logging.getLogger(__name__)
@@ -10,56 +11,62 @@ logger = logging.getLogger(__name__)
 
 class VoiceOptimizer:
     def build_voice_context(self, data: List[Dict[str, Any]],
-                            source: str, total: int, returned: int) -> VoiceContext:
-        return VoiceContext(
-            summary=self._summarize(data, source),
-            freshness=self._freshness(data),
+                            source: str, total: int, returned: int,
+                            summary: Optional[Summary] = None) -> VoiceContext:
+        """``summary`` — precomputed aggregates for the matches; without one the
+        page rows in ``data`` are summarised directly."""
+        if summary is None:
+            summary = Summary.of(data)
+        context = VoiceContext(
+            summary=self._summarize(summary, source),
+            freshness=self._freshness(summary.newest),
             suggestion=self._suggest(source, total, returned),
         )
+        context._newest = summary.newest
+        return context
 
-    def _summarize(self, records, source):
-        n = len(records)
+    def refresh(self, context: VoiceContext) -> VoiceContext:
+        """Same context with the wall-clock freshness line recomputed (for cached responses)."""
+        return context.model_copy(update={"freshness": self._freshness(context._newest)})
+
+    def combine(self, contexts: List[VoiceContext]) -> VoiceContext:
+        """One spoken context for several sub-queries (e.g. a batch turn)."""
+        stamps = [c._newest for c in contexts if c._newest is not None]
+        context = VoiceContext(
+            summary=" ".join(c.summary for c in contexts),
+            freshness=self._freshness(max(stamps) if stamps else None),
+            suggestion=next((c.suggestion for c in contexts if c.suggestion), None),
+        )
+        context._newest = max(stamps) if stamps else None
+        return context
+
+    def _summarize(self, summary: Summary, source):
+        n = summary.count
         if n == 0:
             return f"No {source} records found."
         method = {"crm": self._crm, "support": self._support,
                   "analytics": self._analytics}.get(source)
-        return method(records) if method else f"Found {n} {source} records."
+        return method(summary) if method else f"Found {n} {source} records."
 
-    def _crm(self, records):
-        active = sum(1 for r in records if r.get("status") == "active")
-        return f"Found {len(records)} customers, {active} active and {len(records)-active} inactive."
+    def _crm(self, summary):
+        active = summary.label("status", "active")
+        return f"Found {summary.count} customers, {active} active and {summary.count - active} inactive."
 
-    def _support(self, records):
-        open_t = sum(1 for r in records if r.get("status") == "open")
-        high = sum(1 for r in records if r.get("priority") == "high")
-        return f"Found {len(records)} tickets, {open_t} open, {high} high-priority."
+    def _support(self, summary):
+        open_t, high = summary.label("status", "open"), summary.label("priority", "high")
+        return f"Found {summary.count} tickets, {open_t} open, {high} high-priority."
 
-    def _analytics(self, records):
-        values = [r.get("value", 0) for r in records if "value" in r]
-        if not values:
-            return f"Found {len(records)} analytics records."
-        return f"Found {len(records)} data points, average value {sum(values)/len(values):.1f}."
+    def _analytics(self, summary):
+        if summary.average is None:
+            return f"Found {summary.count} analytics records."
+        return f"Found {summary.count} data points, average value {summary.average:.1f}."
 
-    def _freshness(self, records):
+    def _freshness(self, newest: Optional[float]):
         now = datetime.now(timezone.utc)
         stamp = now.strftime("%Y-%m-%d %H:%M UTC")
-        if not records:
-            return f"Data as of {stamp}"
-        dates = []
-        for r in records:
-            for key in ("created_at", "date", "timestamp"):
-                if key in r:
-                    try:
-                        dates.append(datetime.fromisoformat(str(r[key]).replace("Z", "+00:00")))
-                    except (ValueError, TypeError):
-                        pass
-                    break
-        if not dates:
+        if newest is None:
             return f"Data as of {stamp}"
-        newest = max(dates)
-        if newest.tzinfo is None:
-            newest = newest.replace(tzinfo=timezone.utc)
-        delta = (now - newest).days
+        delta = (now - datetime.fromtimestamp(newest, timezone.utc)).days
         if delta == 0: return f"Data as of {stamp} (updated today)"
         if delta == 1: return f"Data as of {stamp} (updated yesterday)"
         return f"Data as of {stamp} (updated {delta} days ago)"
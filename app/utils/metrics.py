@@ -0,0 +1,80 @@
+"""Prometheus-style latency histograms and text exposition (no client library needed)."""
+
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Mapping, Tuple
+
+from app.utils.timing import Timings
+
+# Seconds; Prometheus' default buckets extended down to 100µs for in-memory stages.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in list(pairs) + list(extra.items()))
+    return "{" + inner + "}" if inner else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = BUCKETS):
+        self.name, self.help, self.buckets = name, help_text, buckets
+        self._series: Dict[Tuple[Tuple[str, str], ...], list] = {}  # labels -> [counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(k, list(s[0]), s[1], s[2]) for k, s in sorted(self._series.items())]
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(key, le=repr(bound))} {cumulative}")
+            lines.append(f'{self.name}_bucket{_labels(key, le="+Inf")} {count}')
+            lines.append(f"{self.name}_sum{_labels(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_SECONDS = Histogram("udc_request_duration_seconds", "Time to serve GET /data/{source}.")
+STAGE_SECONDS = Histogram("udc_stage_duration_seconds",
+                          "Exclusive time per request pipeline stage.")
+
+
+def observe_request(source: str, timings: Timings) -> None:
+    REQUEST_SECONDS.observe(timings.total(), source=source)
+    for name, secs in timings.stages.items():
+        STAGE_SECONDS.observe(secs, source=source, stage=name)
+
+
+def gauges(name: str, help_text: str, values: Mapping[str, Any], label: str = "stat") -> List[str]:
+    """One gauge family from a flat stats dict (non-numeric values are skipped)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for key, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f'{name}{{{label}="{_escape(key)}"}} {value}')
+    return lines
+
+
+def render() -> str:
+    return "\n".join(REQUEST_SECONDS.render() + STAGE_SECONDS.render()) + "\n"
@@ -3,7 +3,7 @@
 import json, random
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Sequence
 from app.config import settings
 
 _FIRST = ["Alice","Bob","Charlie","Diana","Ethan","Fiona","George",
@@ -44,27 +44,38 @@ def generate_support_tickets(count: int = 50, max_cid: int = 50) -> List[Dict[st
             for i in range(1, count + 1)]
 
 
-def generate_analytics(days: int = 30) -> List[Dict[str, Any]]:
+def generate_analytics(days: int = 30, metrics: Sequence[str] = ("daily_active_users",)) -> List[Dict[str, Any]]:
     today = datetime.utcnow().date()
-    return [{"metric": "daily_active_users",
+    return [{"metric": metric,
              "date": (today - timedelta(days=d)).isoformat(),
              "value": random.randint(100, 1000)}
-            for d in range(days)]
+            for metric in metrics for d in range(days)]
 
 
-def write_mock_data(output_dir: str | None = None, customer_count: int = 50):
+def write_records(path: Path, data: List[Dict[str, Any]]) -> None:
+    """Write ``data`` as a JSON array, or one object per line for ``.ndjson``/``.jsonl``."""
+    with open(path, "w", encoding="utf-8") as f:
+        if path.suffix in (".ndjson", ".jsonl"):
+            f.writelines(json.dumps(r) + "\n" for r in data)
+        else:
+            json.dump(data, f, indent=2)
+
+
+def write_mock_data(output_dir: str | None = None, customer_count: int = 50, fmt: str = "json"):
     out = Path(output_dir or settings.DATA_DIR)
     out.mkdir(parents=True, exist_ok=True)
-    for name, data in [("customers.json", generate_customers(customer_count)),
-                       ("support_tickets.json", generate_support_tickets(customer_count, customer_count)),
-                       ("analytics.json", generate_analytics(30))]:
-        with open(out / name, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        print(f"Wrote {len(data)} records to {out / name}")
+    for name, data in [("customers", generate_customers(customer_count)),
+                       ("support_tickets", generate_support_tickets(customer_count, customer_count)),
+                       ("analytics", generate_analytics(30))]:
+        path = out / f"{name}.{fmt}"
+        write_records(path, data)
+        print(f"Wrote {len(data)} records to {path}")
 
 
 if __name__ == "__main__":
     import argparse
     p = argparse.ArgumentParser(description="Generate mock data")
     p.add_argument("--count", type=int, default=50)
-    write_mock_data(customer_count=p.parse_args().count)
+    p.add_argument("--format", choices=["json", "ndjson"], default="json")
+    args = p.parse_args()
+    write_mock_data(customer_count=args.count, fmt=args.format)
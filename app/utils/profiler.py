@@ -0,0 +1,83 @@
+"""Opt-in sampling profiler that can be started and stopped at runtime.
+
+A daemon thread wakes every ``interval`` seconds and records the Python stack
+of every other thread via ``sys._current_frames()``. Nothing runs while it is
+stopped. Results are collapsed stacks (``a;b;c count``), the input format of
+flamegraph tools.
+"""
+
+import sys, threading, time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+MAX_DEPTH = 64
+# Leaf frames of threads that are just waiting; skipped so samples show real work.
+IDLE_FRAMES = {"threading:wait", "selectors:select", "queue:get", "concurrent.futures.thread:_worker"}
+
+
+def _frame_name(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.samples: Counter = Counter()
+        self.interval = 0.005
+        self.started_at: Optional[float] = None
+        self.sweeps = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005) -> bool:
+        """Start sampling (clearing earlier samples); False if already running."""
+        with self._lock:
+            if self.running:
+                return False
+            self.samples, self.sweeps = Counter(), 0
+            self.interval, self.started_at = interval, time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                if _frame_name(frame) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+            self.sweeps += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+    def report(self, top: int = 20) -> Dict[str, Any]:
+        leaves = Counter()
+        for stack, n in list(self.samples.items()):
+            leaves[stack.rsplit(";", 1)[-1]] += n
+        return {"running": self.running, "interval_ms": self.interval * 1000,
+                "started_at": self.started_at, "sweeps": self.sweeps,
+                "samples": sum(self.samples.values()),
+                "top_functions": [{"function": f, "samples": n} for f, n in leaves.most_common(top)]}
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,40 @@
+"""Fast JSON encoding for data responses — orjson when installed, stdlib json otherwise."""
+
+import json
+from typing import Any
+
+from starlette.responses import Response
+
+try:  # optional dependency: pip install orjson
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:  # orjson.JSONEncodeError: e.g. integers wider than 64 bits
+            pass
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def encode_envelope(response, data: bytes) -> bytes:
+    """``DataResponse`` JSON with ``data`` spliced in already encoded.
+
+    Only the small envelope (metadata) goes through Pydantic; row payloads are
+    encoded once with :func:`dumps` and can be reused across requests.
+    """
+    return b"".join((b'{"success":', b"true" if response.success else b"false",
+                     b',"data":', data,
+                     b',"metadata":', response.metadata.model_dump_json().encode("utf-8"), b"}"))
+
+
+class RawJSONResponse(Response):
+    """JSON response whose body is pre-encoded bytes (anything else goes through :func:`dumps`)."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
@@ -0,0 +1,44 @@
+"""Standalone loader for ``SHARED_DATASETS``: publish the data files for the workers.
+
+Run next to ``uvicorn --workers N`` so no worker spends time parsing; the
+workers then only map what this process publishes. Blocks until it holds
+the loader lock (another loader may already be running).
+"""
+
+import signal, threading
+
+from app.config import settings
+from app.connectors import AnalyticsConnector, CRMConnector, SupportConnector
+from app.connectors.cache import dataset_cache
+from app.connectors.shared import shared_store
+from app.connectors.watcher import DatasetWatcher
+from app.utils.logging import configure_logging
+
+
+def run(data_dir: str | None = None, shared_dir: str | None = None) -> None:
+    if data_dir:
+        settings.DATA_DIR = data_dir
+    if shared_dir:
+        settings.SHARED_DATASET_DIR = shared_dir
+    dataset_cache.shared = shared_store
+    shared_store.lead(block=True)
+    watcher = DatasetWatcher()
+    watcher.start([CRMConnector(), SupportConnector(), AnalyticsConnector()], attach=False)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    watcher.stop()
+    shared_store.release()
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Publish the data files to the shared dataset store")
+    p.add_argument("--data-dir", default=None)
+    p.add_argument("--shared-dir", default=None, help="Defaults to SHARED_DATASET_DIR")
+    args = p.parse_args()
+    configure_logging()
+    run(args.data_dir, args.shared_dir)
@@ -0,0 +1,31 @@
+"""Build binary column snapshots (``<name>.snap``) of the connector data files."""
+
+from pathlib import Path
+from typing import List
+
+from app.config import settings
+from app.connectors import AnalyticsConnector, CRMConnector, SupportConnector
+from app.connectors.columnar import ColumnStore
+from app.connectors.snapshot import snapshot_path, write_snapshot
+from app.connectors.streaming import iter_records
+
+
+def build_snapshots(data_dir: str | None = None) -> List[Path]:
+    if data_dir:
+        settings.DATA_DIR = data_dir
+    written = []
+    for connector in (CRMConnector(), SupportConnector(), AnalyticsConnector()):
+        source = connector._resolve_path(connector.filename)
+        if not source.exists():
+            continue
+        store = ColumnStore(iter_records(source))
+        written.append(write_snapshot(store, snapshot_path(source), source))
+        print(f"Wrote {len(store)} rows to {snapshot_path(source)}")
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Build binary column snapshots of the data files")
+    p.add_argument("--data-dir", default=None)
+    build_snapshots(p.parse_args().data_dir)
@@ -0,0 +1,35 @@
+"""Import the connector data files into the SQLite database (``DATASET_BACKEND=sqlite``)."""
+
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.config import settings
+from app.connectors import AnalyticsConnector, CRMConnector, SupportConnector
+from app.connectors.sqlite import sqlite_store, write_table
+
+
+def import_data(data_dir: Optional[str] = None, database: Optional[str] = None) -> Dict[str, int]:
+    """Replace each source's table with its data file (changelog applied); returns the row counts."""
+    if data_dir:
+        settings.DATA_DIR = data_dir
+    if database:
+        settings.SQLITE_PATH = database
+    target: Path = sqlite_store.path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    for connector in (CRMConnector(), SupportConnector(), AnalyticsConnector()):
+        source = connector._resolve_path(connector.filename)
+        if not source.exists():
+            continue
+        counts[connector.table.name] = rows = write_table(target, connector.table, connector._records(), source)
+        print(f"Imported {rows} rows from {source.name} into {target}")
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Import the data files into SQLite")
+    p.add_argument("--data-dir", default=None)
+    p.add_argument("--database", default=None, help="Defaults to SQLITE_PATH")
+    args = p.parse_args()
+    import_data(args.data_dir, args.database)
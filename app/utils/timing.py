@@ -0,0 +1,61 @@
+"""Per-request stage timing.
+
+``collect()`` opens a timing scope for the current request (a context
+variable, so it follows the request into ``asyncio.to_thread`` workers);
+``stage(name)`` blocks anywhere below record their *exclusive* duration, i.e.
+a nested ``load`` inside ``filter`` is not counted twice. Outside a scope
+``stage`` is a no-op apart from one context-variable read.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional
+
+_current: ContextVar[Optional["Timings"]] = ContextVar("request_timings", default=None)
+
+
+class Timings:
+    __slots__ = ("stages", "started", "_stack")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}  # stage -> exclusive seconds, in first-seen order
+        self.started = perf_counter()
+        self._stack: List[List[float]] = []  # [start, time spent in child stages]
+
+    def total(self) -> float:
+        return perf_counter() - self.started
+
+    def header(self) -> str:
+        """``Server-Timing`` header value (milliseconds)."""
+        parts = [f"{name};dur={secs * 1000:.3f}" for name, secs in self.stages.items()]
+        parts.append(f"total;dur={self.total() * 1000:.3f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    frame = [perf_counter(), 0.0]
+    timings._stack.append(frame)
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - frame[0]
+        timings._stack.pop()
+        timings.stages[name] = timings.stages.get(name, 0.0) + elapsed - frame[1]
+        if timings._stack:
+            timings._stack[-1][1] += elapsed
+
+
+@contextmanager
+def collect() -> Iterator[Timings]:
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
@@ -0,0 +1,48 @@
+"""CRM search benchmark — trigram index vs. linear substring scan."""
+
+import random, time
+from typing import Any, Callable, Dict, List
+
+from app.connectors.indexes import TrigramIndex
+from app.utils.mock_data import generate_customers
+
+TERMS = ["alice", "smith", "julia.brown", "42@example", "oscar", "zzz", "an"]
+
+
+def linear_scan(records: List[Dict[str, Any]], term: str) -> List[int]:
+    term = term.lower()
+    return [p for p, r in enumerate(records)
+            if term in r.get("name", "").lower() or term in r.get("email", "").lower()]
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(sizes: List[int], repeat: int = 5) -> None:
+    random.seed(0)
+    print(f"{'rows':>9} {'term':>12} {'scan ms':>9} {'index ms':>9} {'speedup':>8} {'hits':>8}")
+    for size in sizes:
+        records = generate_customers(size)
+        start = time.perf_counter()
+        index = TrigramIndex("search", records, fields=("name", "email"))
+        print(f"{size:>9} {'(build)':>12} {'':>9} {(time.perf_counter() - start) * 1000:>9.1f}")
+        for term in TERMS:
+            hits = index.search(records, term)
+            assert hits == linear_scan(records, term), term
+            scan_ms = _time(lambda: linear_scan(records, term), repeat)
+            index_ms = _time(lambda: index.search(records, term), repeat)
+            print(f"{size:>9} {term:>12} {scan_ms:>9.2f} {index_ms:>9.2f} "
+                  f"{scan_ms / max(index_ms, 1e-6):>7.1f}x {len(hits):>8}")
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmark CRM search index vs. linear scan")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args()
+    run(args.sizes, args.repeat)
@@ -0,0 +1,62 @@
+"""/data/{source} response latency — FastAPI response_model path vs. pre-encoded orjson path.
+
+Drives the ASGI app in-process with a minimal request loop (no HTTP client
+overhead) against generated data and reports p50/p99 per mode.
+``MAX_RESULTS`` is raised to 100 so ``page_size=100`` actually returns 100 rows.
+"""
+
+import asyncio, os, tempfile, time
+from typing import Dict, List
+
+os.environ.setdefault("MAX_RESULTS", "100")
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # per-request INFO lines would dominate the timings
+
+from app.config import settings  # noqa: E402
+from app.utils.mock_data import write_mock_data  # noqa: E402
+from benchmarks.common import asgi_get, percentile  # noqa: E402
+
+# (label, FAST_SERIALIZATION, RESPONSE_CACHE_ENABLED)
+MODES = [("model", False, False), ("fast", True, False),
+         ("model+cache", False, True), ("fast+cache", True, True)]
+URLS = ["/data/support?page_size=100&voice_mode=false&page={page}",
+        "/data/crm?page_size=100&page={page}"]
+
+
+async def _run_mode(app, requests: int, pages: int) -> List[float]:
+    samples = []
+    for i in range(requests):
+        url = URLS[i % len(URLS)].format(page=i % pages + 1)
+        start = time.perf_counter()
+        assert await asgi_get(app, url) == 200
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run(rows: int, requests: int, pages: int) -> Dict[str, Dict[str, float]]:
+    from app.main import app
+    from app.services.response_cache import response_cache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_mock_data(tmp, customer_count=rows)
+        settings.DATA_DIR = tmp
+        results = {}
+        print(f"{'mode':>12} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+        for label, fast, cache in MODES:
+            settings.FAST_SERIALIZATION, settings.RESPONSE_CACHE_ENABLED = fast, cache
+            response_cache.clear()
+            asyncio.run(_run_mode(app, pages * len(URLS), pages))  # warm-up: dataset load + cache fill
+            samples = asyncio.run(_run_mode(app, requests, pages))
+            results[label] = r = {"p50": percentile(samples, 50), "p99": percentile(samples, 99),
+                                  "rps": len(samples) / (sum(samples) / 1000)}
+            print(f"{label:>12} {r['p50']:>8.2f} {r['p99']:>8.2f} {r['rps']:>8.0f}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmark /data/{source} serialization paths")
+    p.add_argument("--rows", type=int, default=20_000)
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--pages", type=int, default=20, help="Distinct pages cycled through (cache working set)")
+    args = p.parse_args()
+    run(args.rows, args.requests, args.pages)
@@ -0,0 +1,81 @@
+"""JSON vs. SQLite backend — load time, peak RSS and /data/{source} latency.
+
+Each (scale, backend) runs in a fresh process: it writes the suite's dataset,
+loads it (``json``: parse and index into the dataset cache; ``sqlite``: run the
+importer) and replays the suite's request ``MIX`` in-process, with the response
+cache off, over pages 1-5 and one deep page.
+"""
+
+import asyncio, os, resource, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List
+from urllib.parse import urlencode
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # per-request INFO lines would dominate the timings
+
+from app.config import settings  # noqa: E402
+from benchmarks.common import asgi_get, percentile  # noqa: E402
+from benchmarks.suite import MIX, write_dataset  # noqa: E402
+
+BACKENDS = ("json", "sqlite")
+PAGES = [1, 2, 3, 4, 5, 500]
+
+
+def run_backend(rows: int, backend: str, rounds: int) -> Dict[str, Any]:
+    from app.connectors import AnalyticsConnector, CRMConnector, SupportConnector
+    from app.main import app
+    from app.utils.sqlite_import import import_data
+
+    settings.RESPONSE_CACHE_ENABLED = False
+    with tempfile.TemporaryDirectory() as tmp:
+        write_dataset(tmp, rows)
+        settings.DATA_DIR, settings.DATASET_BACKEND = tmp, backend
+        start = time.perf_counter()
+        if backend == "sqlite":
+            import_data()
+        for conn in (CRMConnector(), SupportConnector(), AnalyticsConnector()):
+            len(conn.select())
+        load_s = time.perf_counter() - start
+
+        samples: Dict[str, List[float]] = {}
+
+        async def replay():
+            for _ in range(rounds):
+                for source, params in MIX:
+                    for page in PAGES:
+                        url = f"/data/{source}?{urlencode({**params, 'page': page})}"
+                        start = time.perf_counter()
+                        assert await asgi_get(app, url) == 200, url
+                        label = f"{source} {urlencode(params) or '-'}"
+                        samples.setdefault(label, []).append((time.perf_counter() - start) * 1000)
+        asyncio.run(replay())
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return {"rows": rows, "backend": backend, "load_s": load_s, "peak_rss_mb": rss,
+            "queries": {k: (percentile(v, 50), percentile(v, 99)) for k, v in samples.items()}}
+
+
+def run(scales: List[int], rounds: int) -> List[Dict[str, Any]]:
+    results = []
+    for rows in scales:
+        for backend in BACKENDS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                results.append(pool.submit(run_backend, rows, backend, rounds).result())
+        json_run, sql_run = results[-2:]
+        print(f"\n{rows} rows   load: json {json_run['load_s']:.2f}s / sqlite {sql_run['load_s']:.2f}s"
+              f"   peak RSS: json {json_run['peak_rss_mb']:.0f} MB / sqlite {sql_run['peak_rss_mb']:.0f} MB")
+        print(f"{'query':<72} {'json p50':>9} {'p99':>8} {'sqlite p50':>11} {'p99':>8}")
+        for label, (p50, p99) in json_run["queries"].items():
+            s50, s99 = sql_run["queries"][label]
+            print(f"{label:<72} {p50:>9.2f} {p99:>8.2f} {s50:>11.2f} {s99:>8.2f}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmark the SQLite backend against the JSON path")
+    p.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000])
+    p.add_argument("--rounds", type=int, default=5, help="Passes over the request mix")
+    args = p.parse_args()
+    run(args.scales, args.rounds)
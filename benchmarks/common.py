@@ -0,0 +1,36 @@
+"""Shared benchmark helpers — in-process ASGI requests and latency percentiles."""
+
+import statistics
+from typing import Dict, List
+
+
+async def asgi_get(app, url: str) -> int:
+    """Run one GET through the ASGI app without an HTTP client; returns the status."""
+    path, _, query = url.partition("?")
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": query.encode(), "headers": [(b"host", b"bench")],
+             "client": ("127.0.0.1", 0), "server": ("bench", 80)}
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def percentile(samples: List[float], q: int) -> float:
+    return statistics.quantiles(samples, n=100)[q - 1] if len(samples) > 1 else samples[0]
+
+
+def latency_stats(samples_ms: List[float]) -> Dict[str, float]:
+    """Throughput and p50/p95/p99 of per-operation latencies (ms)."""
+    return {"ops_per_s": len(samples_ms) / (sum(samples_ms) / 1000) if sum(samples_ms) else 0.0,
+            "p50": percentile(samples_ms, 50), "p95": percentile(samples_ms, 95),
+            "p99": percentile(samples_ms, 99)}
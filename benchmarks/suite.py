@@ -0,0 +1,171 @@
+"""Benchmark suite — a request mix replayed against each layer of the pipeline.
+
+For every scale a fresh child process generates customers, tickets and
+analytics rows with ``app.utils.mock_data``, loads them, and replays ``MIX``
+through four stages:
+
+* ``fetch``  — ``connector.fetch(**filters)``
+* ``apply``  — ``BusinessRulesEngine.apply`` on the query's selection
+* ``voice``  — ``VoiceOptimizer.build_voice_context`` for that page
+* ``asgi``   — the full ``GET /data/{source}`` request, in-process
+
+Each stage reports throughput and p50/p95/p99 latency; each scale reports its
+load time and peak RSS. ``--save NAME`` stores the results under
+``benchmarks/baselines/NAME.json`` and ``--compare NAME`` exits non-zero if a
+stage's p99 or throughput regressed by more than ``--tolerance``.
+"""
+
+import asyncio, json, math, os, random, resource, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlencode
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # per-request INFO lines would dominate the timings
+
+from app.config import settings  # noqa: E402
+from app.utils.mock_data import (generate_analytics, generate_customers,  # noqa: E402
+                                 generate_support_tickets, write_records)
+from benchmarks.common import asgi_get, latency_stats  # noqa: E402
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+STAGES = ("fetch", "apply", "voice", "asgi")
+ANALYTICS_MAX_DAYS = 3650
+
+# (source, query parameters) — a rough mix of voice-assistant turns.
+MIX: List[Tuple[str, Dict[str, Any]]] = [
+    ("crm", {}),
+    ("crm", {"status": "active"}),
+    ("crm", {"search": "smith"}),
+    ("crm", {"customer_id": 7}),
+    ("crm", {"sort_by": "name", "sort_order": "asc"}),
+    ("support", {}),
+    ("support", {"status": "open", "priority": "high"}),
+    ("support", {"customer_id": 7}),
+    ("support", {"sort_by": "created_at"}),
+    ("analytics", {"metric": "daily_active_users"}),
+    ("analytics", {"metric": "daily_active_users", "date_from": "2026-01-01", "date_to": "2026-01-31"}),
+    ("analytics", {"sort_by": "value"}),
+]
+
+
+def write_dataset(directory: str, rows: int, fmt: str = "json") -> None:
+    random.seed(0)
+    days = min(rows, ANALYTICS_MAX_DAYS)
+    metrics = ["daily_active_users"] + [f"metric_{i}" for i in range(1, math.ceil(rows / days))]
+    for name, data in [("customers", generate_customers(rows)),
+                       ("support_tickets", generate_support_tickets(rows, rows)),
+                       ("analytics", generate_analytics(days, metrics)[:rows])]:
+        write_records(Path(directory) / f"{name}.{fmt}", data)
+
+
+def _timed(fn, samples: List[float]):
+    start = time.perf_counter()
+    result = fn()
+    samples.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def run_scale(rows: int, requests: int, fmt: str = "json") -> Dict[str, Any]:
+    """One scale, meant to run in its own process so peak RSS is per scale."""
+    from app.connectors import AnalyticsConnector, CRMConnector, SupportConnector
+    from app.main import app
+    from app.services.business_rules import BusinessRulesEngine
+    from app.services.voice_optimizer import VoiceOptimizer
+
+    connectors = {"crm": CRMConnector(), "support": SupportConnector(), "analytics": AnalyticsConnector()}
+    rules, voice = BusinessRulesEngine(), VoiceOptimizer()
+    settings.RESPONSE_CACHE_ENABLED = False  # measure the pipeline, not cache hits
+    with tempfile.TemporaryDirectory() as tmp:
+        write_dataset(tmp, rows, fmt)
+        settings.DATA_DIR = tmp
+        start = time.perf_counter()
+        for conn in connectors.values():
+            conn.select()
+        load_s = time.perf_counter() - start
+
+        samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        for i in range(requests):
+            source, params = MIX[i % len(MIX)]
+            conn, page = connectors[source], i % 5 + 1
+            _timed(lambda: conn.fetch(**params), samples["fetch"])
+            selection = conn.select(**params)
+            page_rows, _, _ = _timed(lambda: rules.apply(selection, page=page), samples["apply"])
+            _timed(lambda: voice.build_voice_context(
+                page_rows, source, len(selection), len(page_rows),
+                summary=selection.summary() if selection.summary else None), samples["voice"])
+
+        async def replay():
+            for i in range(requests):
+                source, params = MIX[i % len(MIX)]
+                url = f"/data/{source}?{urlencode({**params, 'page': i % 5 + 1})}"
+                start = time.perf_counter()
+                assert await asgi_get(app, url) == 200, url
+                samples["asgi"].append((time.perf_counter() - start) * 1000)
+        asyncio.run(replay())
+
+    # ru_maxrss is KiB on Linux (bytes on macOS).
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return {"rows": rows, "load_s": round(load_s, 3), "peak_rss_mb": round(rss, 1),
+            "stages": {stage: {k: round(v, 4) for k, v in latency_stats(s).items()}
+                       for stage, s in samples.items()}}
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Human-readable regressions of ``results`` against ``baseline`` (same scales only)."""
+    previous = {r["rows"]: r for r in baseline}
+    problems = []
+    for r in results:
+        base = previous.get(r["rows"])
+        if base is None:
+            continue
+        for stage, now in r["stages"].items():
+            then = base["stages"].get(stage)
+            if then is None:
+                continue
+            if now["p99"] > then["p99"] * (1 + tolerance):
+                problems.append(f"{r['rows']:>9} {stage:>6} p99 {then['p99']:.3f} -> {now['p99']:.3f} ms")
+            if now["ops_per_s"] < then["ops_per_s"] * (1 - tolerance):
+                problems.append(f"{r['rows']:>9} {stage:>6} ops/s {then['ops_per_s']:.0f} -> {now['ops_per_s']:.0f}")
+    return problems
+
+
+def run(scales: List[int], requests: int, fmt: str = "json") -> List[Dict[str, Any]]:
+    results = []
+    print(f"{'rows':>9} {'stage':>6} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for rows in scales:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(run_scale, rows, requests, fmt).result()
+        results.append(result)
+        for stage, s in result["stages"].items():
+            print(f"{rows:>9} {stage:>6} {s['ops_per_s']:>9.0f} {s['p50']:>8.3f} {s['p95']:>8.3f} {s['p99']:>8.3f}")
+        print(f"{rows:>9} load {result['load_s']:.2f}s, peak RSS {result['peak_rss_mb']:.0f} MiB")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmark suite: connectors, rules, voice and the ASGI app")
+    p.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                   help="Rows per dataset, e.g. 1000 ... 10000000")
+    p.add_argument("--requests", type=int, default=600, help="Operations per stage per scale")
+    p.add_argument("--format", choices=["json", "ndjson"], default="json")
+    p.add_argument("--save", metavar="NAME", help="Store results as benchmarks/baselines/NAME.json")
+    p.add_argument("--compare", metavar="NAME", help="Fail on regressions against a stored baseline")
+    p.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = p.parse_args()
+
+    results = run(args.scales, args.requests, args.format)
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        (BASELINE_DIR / f"{args.save}.json").write_text(json.dumps(results, indent=2))
+        print(f"Saved baseline {args.save}")
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        problems = compare(results, baseline, args.tolerance)
+        for line in problems:
+            print("REGRESSION", line)
+        if problems:
+            sys.exit(1)
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
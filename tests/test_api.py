@@ -1,7 +1,22 @@
 """API integration tests."""
 
+import csv
+import io
+import json
+import os
+import time
+
 from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.connectors.cache import DatasetCache
+from app.connectors.support_connector import SupportConnector
 from app.main import app
+from app.services.export import iter_csv, iter_ndjson
+from app.services.response_cache import response_cache
+from app.utils import serialization
+from app.utils.sqlite_import import import_data
+from app.utils.timing import collect, stage
 
 client = TestClient(app)
 
@@ -95,3 +110,273 @@ class TestSchema:
     def test_names(self):
         names = {f["name"] for f in client.get("/schema/functions").json()["functions"]}
         assert names == {"query_crm", "query_support", "query_analytics"}
+
+
+class TestAnalyticsSummary:
+    def test_summary(self):
+        body = client.get("/data/analytics/summary?metric=daily_active_users").json()
+        assert body["metric"] == "daily_active_users" and body["count"] > 0
+        assert body["minimum"] <= body["average"] <= body["maximum"]
+        assert body["trend"] in ("increasing", "decreasing", "stable")
+
+    def test_summary_matches_rows(self):
+        rows = client.get("/data/analytics?date_from=2026-02-01&date_to=2026-02-05").json()
+        summary = client.get("/data/analytics/summary?date_from=2026-02-01&date_to=2026-02-05").json()
+        assert summary["count"] == rows["metadata"]["total_results"]
+
+
+class TestHealthMetadata:
+    def test_reports_cache_metadata(self):
+        src = client.get("/health").json()["data_sources"]["crm"]
+        for key in ("file", "available", "record_count", "fingerprint", "cache"):
+            assert key in src
+
+    def test_does_not_load_data(self, monkeypatch):
+        fresh = DatasetCache()
+        monkeypatch.setattr("app.connectors.base.dataset_cache", fresh)
+        monkeypatch.setattr("app.routers.health.dataset_cache", fresh)
+        body = client.get("/health").json()
+        assert body["data_sources"]["support"]["cache"] == "cold"
+        assert fresh.stats()["misses"] == 0
+
+    def test_ready(self):
+        resp = client.get("/health/ready")
+        assert resp.status_code == 200 and resp.json()["status"] == "ready"
+        assert resp.json()["data_sources"]["analytics"]["record_count"] > 0
+
+    def test_ready_reports_missing_file(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        resp = client.get("/health/ready")
+        assert resp.status_code == 503 and resp.json()["data_sources"]["crm"]["available"] is False
+
+
+class TestBatch:
+    def test_results_match_single_queries(self):
+        queries = [{"source": "crm", "status": "active", "page_size": 3},
+                   {"source": "support", "status": "open", "priority": "high"},
+                   {"source": "analytics", "date_from": "2026-02-01", "voice_mode": False}]
+        body = client.post("/data/batch", json={"queries": queries}).json()
+        assert body["success"] is True and len(body["results"]) == 3
+        single = client.get("/data/crm?status=active&page_size=3").json()
+        assert body["results"][0]["data"] == single["data"]
+        assert body["results"][2]["metadata"]["voice_context"] is None
+
+    def test_combined_voice_context(self):
+        queries = [{"source": "crm"}, {"source": "support"}]
+        ctx = client.post("/data/batch", json={"queries": queries}).json()["voice_context"]
+        assert "customers" in ctx["summary"] and "tickets" in ctx["summary"]
+
+    def test_unknown_source_404(self):
+        resp = client.post("/data/batch", json={"queries": [{"source": "crm"}, {"source": "nope"}]})
+        assert resp.status_code == 404
+
+    def test_empty_batch_422(self):
+        assert client.post("/data/batch", json={"queries": []}).status_code == 422
+
+
+class TestExpand:
+    def test_support_expand_customer(self):
+        rows = client.get("/data/support?expand=customer&page_size=5").json()["data"]
+        for r in rows:
+            customer = client.get(f"/data/crm?customer_id={r['customer_id']}").json()["data"][0]
+            assert r["customer"] == customer
+
+    def test_crm_expand_tickets(self):
+        rows = client.get("/data/crm?expand=tickets").json()["data"]
+        for r in rows:
+            tickets = client.get(f"/data/support?customer_id={r['customer_id']}&voice_mode=false"
+                                 f"&page_size=100").json()
+            assert r["tickets"]["total"] == tickets["metadata"]["total_results"]
+            assert r["tickets"]["open"] == sum(t["status"] == "open" for t in tickets["data"])
+
+    def test_expand_does_not_mutate_cache(self):
+        client.get("/data/support?expand=customer")
+        assert all("customer" not in r for r in client.get("/data/support").json()["data"])
+
+    def test_unsupported_expand_422(self):
+        assert client.get("/data/analytics?expand=customer").status_code == 422
+
+
+class TestResponseCache:
+    def test_etag_and_304(self):
+        resp = client.get("/data/crm?status=active")
+        etag = resp.headers["etag"]
+        assert "max-age" in resp.headers["cache-control"]
+        again = client.get("/data/crm?status=active", headers={"If-None-Match": etag})
+        assert again.status_code == 304 and again.headers["etag"] == etag and not again.content
+
+    def test_hit_matches_fresh_response(self):
+        first = client.get("/data/support?priority=high&page_size=4").json()
+        hits = response_cache.stats()["hits"]
+        second = client.get("/data/support?priority=high&page_size=4").json()
+        assert response_cache.stats()["hits"] == hits + 1
+        assert second["data"] == first["data"]
+        assert second["metadata"]["pagination"] == first["metadata"]["pagination"]
+
+    def test_distinct_queries_distinct_etags(self):
+        a = client.get("/data/crm?page=1").headers["etag"]
+        b = client.get("/data/crm?page=2").headers["etag"]
+        c = client.get("/data/crm?page=1&voice_mode=false").headers["etag"]
+        assert len({a, b, c}) == 3
+
+    def test_file_change_invalidates(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        path = tmp_path / "customers.json"
+        path.write_text(json.dumps([{"customer_id": 1, "name": "A", "email": "a@x.io",
+                                     "created_at": "2026-01-01T00:00:00", "status": "active"}]))
+        first = client.get("/data/crm")
+        path.write_text(json.dumps([{"customer_id": 2, "name": "Bee", "email": "b@x.io",
+                                     "created_at": "2026-01-02T00:00:00", "status": "active"}]))
+        os.utime(path, ns=(1, 1))
+        second = client.get("/data/crm", headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 200 and second.headers["etag"] != first.headers["etag"]
+        assert second.json()["data"][0]["customer_id"] == 2
+
+    def test_health_reports_hit_rate(self):
+        assert "hit_rate" in client.get("/health").json()["response_cache"]
+
+
+class TestCursorPagination:
+    def _walk(self, url):
+        rows, cursor = [], None
+        while True:
+            body = client.get(url + (f"&cursor={cursor}" if cursor else "")).json()
+            rows += body["data"]
+            cursor = body["metadata"]["pagination"]["next_cursor"]
+            if not cursor:
+                return rows
+
+    def _offset(self, url):
+        first = client.get(url).json()
+        pages = first["metadata"]["pagination"]["total_pages"]
+        return [r for p in range(1, pages + 1) for r in client.get(f"{url}&page={p}").json()["data"]]
+
+    def test_matches_offset_pages(self):
+        for url in ("/data/crm?page_size=7", "/data/support?page_size=9",
+                    "/data/support?status=open&sort_by=created_at&sort_order=asc",
+                    "/data/analytics?metric=daily_active_users&page_size=4",
+                    "/data/analytics?sort_order=asc&page_size=6"):
+            assert self._walk(url) == self._offset(url)
+
+    def test_cursor_from_other_query_422(self):
+        cursor = client.get("/data/crm?status=active").json()["metadata"]["pagination"]["next_cursor"]
+        assert client.get(f"/data/crm?status=inactive&cursor={cursor}").status_code == 422
+        assert client.get("/data/crm?cursor=garbage").status_code == 422
+
+
+class TestExport:
+    def test_ndjson_matches_fetch(self):
+        resp = client.get("/data/support/export?status=open&sort_by=created_at")
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in resp.text.splitlines()]
+        expected = SupportConnector().fetch(status="open", sort_by="created_at", sort_order="desc")
+        assert rows == expected and resp.headers["x-total-count"] == str(len(expected))
+
+    def test_csv(self):
+        resp = client.get("/data/crm/export?format=csv&status=active")
+        rows = list(csv.DictReader(io.StringIO(resp.text)))
+        assert resp.headers["content-type"].startswith("text/csv")
+        assert len(rows) == int(resp.headers["x-total-count"])
+        assert {"customer_id", "name", "email"} <= set(rows[0])
+
+    def test_streamed_file_export_matches(self, monkeypatch):
+        url = "/data/support/export?status=open&sort_by=created_at"
+        cached = client.get(url)
+        monkeypatch.setattr(settings, "STREAMING_THRESHOLD_BYTES", 0)
+        streamed = client.get(url)
+        assert streamed.text == cached.text and streamed.headers["x-total-count"] == cached.headers["x-total-count"]
+
+    def test_chunked_encoders(self):
+        rows = [{"a": i, "b": str(i)} for i in range(25)]
+        assert len(list(iter_ndjson(rows, chunk_rows=10))) == 3
+        assert "".join(iter_csv(rows, chunk_rows=10)).count("\n") == 26
+        assert list(iter_csv([])) == []
+
+    def test_bad_format_422(self):
+        assert client.get("/data/crm/export?format=xml").status_code == 422
+
+
+class TestFastSerialization:
+    def test_matches_model_path(self, monkeypatch):
+        url = "/data/support?page_size=7&status=open"
+        fast = client.get(url)
+        monkeypatch.setattr(settings, "FAST_SERIALIZATION", False)
+        slow = client.get(url)
+        assert fast.headers["content-type"] == "application/json"
+        assert fast.headers["etag"] == slow.headers["etag"]
+        a, b = fast.json(), slow.json()
+        a["metadata"].pop("data_freshness"), b["metadata"].pop("data_freshness")
+        assert a == b
+
+    def test_stdlib_fallback(self, monkeypatch):
+        rows = [{"id": 1, "name": "Zoë", "score": 1.5, "tags": None}]
+        fast = serialization.dumps(rows)
+        monkeypatch.setattr(serialization, "orjson", None)
+        assert json.loads(serialization.dumps(rows)) == json.loads(fast) == rows
+
+    def test_big_integers_fall_back_to_stdlib(self):
+        rows = [{"id": 2 ** 64, "balance": -(2 ** 70)}]
+        assert json.loads(serialization.dumps(rows)) == rows
+
+
+class TestSQLiteBackend:
+    def test_matches_json_backend(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+        monkeypatch.setattr(settings, "SQLITE_PATH", str(tmp_path / "data.sqlite3"))
+        urls = ["/data/crm?status=active&page=2&page_size=5", "/data/support?priority=high&sort_by=created_at",
+                "/data/analytics?metric=revenue&sort_by=value&page_size=3", "/data/crm/export?search=an"]
+        bodies = {}
+        for backend in ("json", "sqlite"):
+            monkeypatch.setattr(settings, "DATASET_BACKEND", backend)
+            if backend == "sqlite":
+                import_data()
+            bodies[backend] = [client.get(url).json() if "export" not in url else client.get(url).text
+                               for url in urls]
+            for body in bodies[backend][:-1]:
+                body["metadata"].pop("data_freshness")
+        assert bodies["sqlite"] == bodies["json"]
+
+
+class TestVoiceSummary:
+    def test_summary_describes_all_matches(self):
+        body = client.get("/data/support?customer_id=4&page_size=1").json()
+        total = body["metadata"]["total_results"]
+        assert f"Found {total} tickets" in body["metadata"]["voice_context"]["summary"]
+
+    def test_streamed_summary(self, monkeypatch):
+        monkeypatch.setattr(settings, "STREAMING_THRESHOLD_BYTES", 0)
+        body = client.get("/data/crm?search=a&page_size=2").json()
+        total = body["metadata"]["total_results"]
+        assert f"Found {total} customers" in body["metadata"]["voice_context"]["summary"]
+
+
+class TestMetrics:
+    def test_server_timing_header(self):
+        response_cache.clear()
+        header = client.get("/data/support?status=open").headers["server-timing"]
+        stages = {part.split(";")[0] for part in header.split(", ")}
+        assert {"filter", "paginate", "voice", "total"} <= stages
+
+    def test_stage_times_are_exclusive(self):
+        with collect() as timings:
+            with stage("outer"):
+                time.sleep(0.002)
+                with stage("inner"):
+                    time.sleep(0.01)
+        assert timings.stages["inner"] >= 0.01 > timings.stages["outer"]
+
+    def test_prometheus_histograms(self):
+        client.get("/data/analytics?metric=daily_active_users")
+        text = client.get("/metrics").text
+        assert 'udc_stage_duration_seconds_count{source="analytics",stage="filter"}' in text
+        assert 'udc_request_duration_seconds_bucket{source="analytics",le="+Inf"}' in text
+        assert 'udc_response_cache{stat="hits"}' in text
+
+    def test_profiler_opt_in(self, monkeypatch):
+        assert client.post("/debug/profiler/start").status_code == 404
+        monkeypatch.setattr(settings, "PROFILER_ENDPOINTS", True)
+        assert client.post("/debug/profiler/start?interval_ms=1").json()["running"] is True
+        for _ in range(20):
+            client.get("/data/crm?search=an")
+        report = client.post("/debug/profiler/stop").json()
+        assert report["running"] is False and report["sweeps"] > 0
@@ -1,9 +1,21 @@
 """Tests for business rules engine and voice optimizer."""
 
+import random
+from datetime import datetime
+
+import pytest
+
+from app.connectors.base import Selection
+from app.connectors.columnar import ColumnStore
+from app.connectors.summary import Summary
+from app.connectors.support_connector import PRIORITY_ORDER
+from app.models.common import DataType
+from app.services import analytics_stats
+from app.services.analytics_stats import series_stats
 from app.services.business_rules import BusinessRulesEngine
-from app.services.voice_optimizer import VoiceOptimizer
+from app.services.cursors import decode_cursor
 from app.services.data_identifier import identify_data_type
-from app.models.common import DataType
+from app.services.voice_optimizer import VoiceOptimizer
 
 
 class TestDataIdentifier:
@@ -79,3 +91,138 @@ class TestVoiceOptimizer:
     def test_suggestion_paginated(self):
         ctx = self.opt.build_voice_context([], "crm", 50, 10)
         assert ctx.suggestion is not None and "next page" in ctx.suggestion.lower()
+
+    def test_precomputed_summary_and_refresh(self):
+        summary = Summary.of([{"status": "active", "created_at": datetime.utcnow().isoformat()}] * 40)
+        ctx = self.opt.build_voice_context([{"status": "inactive"}], "crm", 40, 1, summary=summary)
+        assert "Found 40 customers, 40 active" in ctx.summary and "updated today" in ctx.freshness
+        assert "updated today" in self.opt.refresh(ctx).freshness
+
+
+class TestTopKPagination:
+    def setup_method(self):
+        rng = random.Random(11)
+        self.engine = BusinessRulesEngine(max_results=10, default_page_size=10)
+        self.rows = [{"id": i, "score": rng.randint(0, 20),
+                      "priority": rng.choice(["high", "medium", "low", "urgent"])} for i in range(400)]
+
+    def _pages(self, selection, expected):
+        for page in (1, 2, 7, 40):
+            got, _, _ = self.engine.apply(selection, page=page, page_size=10)
+            want, _, _ = self.engine.apply(expected, page=page, page_size=10)
+            assert got == want
+
+    def test_heap_matches_full_sort(self):
+        for reverse in (True, False):
+            sel = Selection(self.rows, lambda r: r["score"], reverse)
+            self._pages(sel, sorted(self.rows, key=lambda r: r["score"], reverse=reverse))
+
+    def test_priority_order_key(self):
+        key = lambda r: PRIORITY_ORDER.get(r.get("priority", "low"), 99)
+        self._pages(Selection(self.rows, key, True), sorted(self.rows, key=key, reverse=True))
+
+    def test_ordered_selection(self):
+        expected = sorted(self.rows, key=lambda r: r["score"])
+        sel = Selection(self.rows, lambda r: r["score"], False, ordered=lambda: iter(expected))
+        self._pages(sel, expected)
+
+    def test_columnar_rows_materialised_as_dicts(self):
+        page, _, _ = self.engine.apply(ColumnStore(self.rows), page=2, page_size=5)
+        assert all(type(r) is dict for r in page) and page == self.rows[5:10]
+
+
+class TestCursorPagination:
+    def setup_method(self):
+        rng = random.Random(5)
+        self.engine = BusinessRulesEngine(max_results=10, default_page_size=10)
+        # Heavy ties on score so cursors have to resume mid-tie.
+        self.rows = [{"id": i, "score": rng.randint(0, 6)} for i in range(137)]
+
+    def _walk(self, selection):
+        rows, cursor, pages = [], None, 0
+        while True:
+            page, info, _ = self.engine.apply(selection, page_size=10, cursor=cursor, scope="q")
+            rows += page
+            pages += 1
+            assert info.current_page == pages
+            if not info.has_next:
+                assert info.next_cursor is None
+                return rows
+            cursor = decode_cursor(info.next_cursor, "q")
+
+    def _selection(self, reverse, indexed):
+        key, ident = (lambda r: r["score"]), (lambda r: (r["id"],))
+        expected = sorted(self.rows, key=key, reverse=reverse)
+        if not indexed:
+            return Selection(self.rows, key, reverse, id_key=ident), expected
+
+        def seek(value):
+            return (r for r in expected if (key(r) <= value if reverse else key(r) >= value))
+        return Selection(self.rows, key, reverse, lambda: iter(expected), ident, seek), expected
+
+    def test_cursor_walk_matches_full_sort(self):
+        for reverse in (True, False):
+            for indexed in (True, False):
+                sel, expected = self._selection(reverse, indexed)
+                assert self._walk(sel) == expected
+
+    def test_repeated_ids_within_ties_terminate(self):
+        # Ids repeat inside a tie run: the cursor tells them apart by their place in it.
+        self.rows = [{"id": i % 4, "score": i % 3} for i in range(137)]
+        for reverse in (True, False):
+            for indexed in (True, False):
+                sel, expected = self._selection(reverse, indexed)
+                assert self._walk(sel) == expected
+
+    def test_cursor_after_offset_page_mid_tie(self):
+        self.rows = [{"id": i % 4, "score": i % 3} for i in range(137)]
+        for indexed in (True, False):
+            sel, expected = self._selection(False, indexed)
+            _, info, _ = self.engine.apply(sel, page=3, page_size=10, scope="q")
+            cursor = decode_cursor(info.next_cursor, "q")
+            assert cursor.tie == 29
+            page, _, _ = self.engine.apply(sel, page_size=10, cursor=cursor, scope="q")
+            assert page == expected[30:40]
+
+    def test_resume_is_stable_when_earlier_rows_change(self):
+        sel, expected = self._selection(True, False)
+        _, info, _ = self.engine.apply(sel, page_size=10, scope="q")
+        cursor = decode_cursor(info.next_cursor, "q")
+        self.rows.insert(0, {"id": 999, "score": 99})  # sorts first: would shift offset pages
+        sel, _ = self._selection(True, False)
+        page, _, _ = self.engine.apply(sel, page_size=10, cursor=cursor, scope="q")
+        assert page == expected[10:20]
+
+    def test_cursor_bound_to_scope(self):
+        sel, _ = self._selection(False, False)
+        _, info, _ = self.engine.apply(sel, page_size=10, scope="q")
+        with pytest.raises(ValueError):
+            decode_cursor(info.next_cursor, "other")
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor", "q")
+
+
+class TestSeriesStats:
+    def test_stats(self):
+        stats = series_stats([100, 200, 300, 400])
+        assert stats["average"] == 250 and stats["total"] == 1000 and stats["count"] == 4
+        assert stats["minimum"] == 100 and stats["maximum"] == 400 and stats["trend"] == "increasing"
+
+    def test_empty(self):
+        assert series_stats([])["count"] == 0
+
+    def test_pure_python_matches_numpy(self, monkeypatch):
+        values = [5.0, 9.0, 3.0, 3.0, 2.0]
+        vectorised = analytics_stats.series_stats(values)
+        monkeypatch.setattr(analytics_stats, "np", None)
+        assert analytics_stats.series_stats(values) == vectorised and vectorised["trend"] == "decreasing"
+
+
+class TestVoiceCombine:
+    def test_combine(self):
+        opt = VoiceOptimizer()
+        a = opt.build_voice_context([{"status": "active"}], "crm", 1, 1)
+        b = opt.build_voice_context([], "support", 0, 0)
+        ctx = opt.combine([a, b])
+        assert a.summary in ctx.summary and b.summary in ctx.summary
+        assert ctx.suggestion == a.suggestion
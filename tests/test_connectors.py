@@ -1,8 +1,51 @@
 """Tests for data-source connectors."""
 
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.config import settings
+from app.connectors import cache as cache_mod
+from app.connectors.analytics_connector import AnalyticsConnector
+from app.connectors.base import BaseConnector
+from app.connectors.cache import DatasetCache, dataset_cache, estimate_size
+from app.connectors.changelog import apply_changes, key_map, overlay
+from app.connectors.columnar import ColumnStore, DictColumn, IntColumn
 from app.connectors.crm_connector import CRMConnector
+from app.connectors.indexes import (
+    HashIndex,
+    SortedIndex,
+    TrigramIndex,
+    intersect,
+    lower_key,
+    str_key,
+)
+from app.connectors.layered import REMOVED, LayeredList, LayeredMap, MergedPositions
+from app.connectors.packed import PackedPostings
+from app.connectors.series import SeriesIndex
+from app.connectors.shared import SharedStore
+from app.connectors.snapshot import load_snapshot, snapshot_path, write_snapshot
+from app.connectors.streaming import iter_json_array, sort_spilled
+from app.connectors.summary import Summary, SummaryIndex
 from app.connectors.support_connector import SupportConnector
-from app.connectors.analytics_connector import AnalyticsConnector
+from app.connectors.watcher import DatasetWatcher
+from app.services.business_rules import BusinessRulesEngine
+from app.services.cursors import decode_cursor
+from app.utils.mock_data import (
+    generate_analytics,
+    generate_customers,
+    generate_support_tickets,
+    write_records,
+)
+from app.utils.snapshots import build_snapshots
+from app.utils.sqlite_import import import_data
 
 
 class TestCRMConnector:
@@ -89,3 +132,866 @@ class TestAnalyticsConnector:
     def test_schema(self):
         schema = self.connector.get_schema()
         assert schema["name"] == "query_analytics"
+
+
+class TestDatasetCache:
+    def setup_method(self):
+        self.cache = DatasetCache(max_bytes=10 * 1024 * 1024)
+
+    def _write(self, path, records):
+        path.write_text(json.dumps(records), encoding="utf-8")
+
+    def test_hit_after_first_load(self, tmp_path):
+        f = tmp_path / "a.json"
+        self._write(f, [{"id": 1}])
+        first = self.cache.get(f)
+        assert self.cache.get(f) is first
+        assert self.cache.stats()["misses"] == 1 and self.cache.stats()["hits"] == 1
+
+    def test_reload_on_change(self, tmp_path):
+        f = tmp_path / "a.json"
+        self._write(f, [{"id": 1}])
+        self.cache.get(f)
+        self._write(f, [{"id": 1}, {"id": 2}])
+        os.utime(f, ns=(0, 10**18))
+        assert len(self.cache.get(f).records) == 2
+        assert self.cache.stats()["reloads"] == 1
+
+    def test_invalidate(self, tmp_path):
+        f = tmp_path / "a.json"
+        self._write(f, [{"id": 1}])
+        self.cache.get(f)
+        self.cache.invalidate(f)
+        self.cache.get(f)
+        assert self.cache.stats()["misses"] == 2
+
+    def test_budget_evicts_lru(self, tmp_path):
+        records = [{"id": i} for i in range(100)]
+        a, b = tmp_path / "a.json", tmp_path / "b.json"
+        self._write(a, records)
+        self._write(b, records)
+        cache = DatasetCache(max_bytes=estimate_size(records) + 1)
+        cache.get(a)
+        cache.get(b)
+        stats = cache.stats()
+        assert stats["entries"] == 1 and stats["evictions"] == 1
+
+    def test_budget_counts_indexes(self, tmp_path):
+        records = [{"id": i, "status": ["open", "closed"][i % 2]} for i in range(100)]
+        a, b = tmp_path / "a.json", tmp_path / "b.json"
+        self._write(a, records)
+        self._write(b, records)
+        cache = DatasetCache(max_bytes=2 * estimate_size(records) + 1)
+        cache.get(a)
+        plain = cache.get(b)
+        assert cache.stats()["entries"] == 2
+        indexed = cache.get(b, {"id": HashIndex.on(str_key), "status": HashIndex.on(lower_key)})
+        assert indexed is plain and indexed.nbytes == indexed.record_bytes + sum(i.nbytes for i in indexed.indexes.values())
+        assert indexed.index_bytes > 0 and cache.stats()["entries"] == 1 and cache.entry(a) is None
+
+    def test_failed_reload_keeps_last_good(self, tmp_path):
+        f = tmp_path / "a.json"
+        self._write(f, [{"id": 1}])
+        first = self.cache.get(f)
+        f.write_text('[{"id": 1}, {"id"', encoding="utf-8")
+        os.utime(f, ns=(0, 10**18))
+        assert self.cache.get(f) is first
+        assert self.cache.get(f) is first
+        assert self.cache.refresh(f) is None
+        assert self.cache.stats()["failures"] == 1
+
+    def test_watched_path_swaps_only_on_refresh(self, tmp_path):
+        f = tmp_path / "a.json"
+        self._write(f, [{"id": 1}])
+        first = self.cache.get(f)
+        self.cache.watch(f)
+        self._write(f, [{"id": 1}, {"id": 2}])
+        os.utime(f, ns=(0, 10**18))
+        assert self.cache.get(f) is first
+        swapped = self.cache.refresh(f)
+        assert len(swapped.records) == 2 and self.cache.get(f) is swapped
+        assert self.cache.refresh(f) is None
+
+    def test_fetch_does_not_mutate_cached_records(self):
+        connector = CRMConnector()
+        connector.fetch(sort_by="customer_id", sort_order="asc")
+        first = connector.fetch(sort_by="customer_id", sort_order="desc")[0]["customer_id"]
+        assert first == max(r["customer_id"] for r in connector.fetch())
+
+
+class TestDatasetWatcher:
+    def _wait_for(self, connector, n, timeout=5.0):
+        deadline = time.time() + timeout
+        while len(connector.fetch()) != n and time.time() < deadline:
+            time.sleep(0.02)
+        return len(connector.fetch())
+
+    def _replace(self, path, records):
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(records), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @pytest.mark.parametrize("backend", ["poll", "inotify"])
+    def test_hot_swap(self, tmp_path, monkeypatch, backend):
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        rows = [{"customer_id": i, "name": f"c{i}", "status": "active"} for i in range(3)]
+        self._replace(tmp_path / "customers.json", rows)
+        connector, watcher = CRMConnector(), DatasetWatcher()
+        assert len(connector.fetch()) == 3
+        watcher.start([connector], backend=backend, interval=0.05)
+        try:
+            before = connector.version()
+            (tmp_path / "customers.json").write_text("[{", encoding="utf-8")
+            self._replace(tmp_path / "customers.json", rows + rows[:1])
+            assert self._wait_for(connector, 4) == 4
+            assert connector.version() != before and watcher.swaps >= 1
+        finally:
+            watcher.stop()
+
+    def test_parse_failure_keeps_serving(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        self._replace(tmp_path / "customers.json", [{"customer_id": 1, "name": "a", "status": "active"}])
+        connector, watcher = CRMConnector(), DatasetWatcher()
+        assert len(connector.fetch()) == 1
+        watcher.start([connector], backend="poll", interval=0.02)
+        try:
+            version = connector.version()
+            (tmp_path / "customers.json").write_text('[{"customer_id": 2', encoding="utf-8")
+            time.sleep(0.2)
+            assert [r["customer_id"] for r in connector.fetch()] == [1]
+            assert connector.version() == version
+        finally:
+            watcher.stop()
+
+
+class TestChangelog:
+    def _setup(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        random.seed(3)
+        write_records(tmp_path / "customers.json", generate_customers(60))
+        write_records(tmp_path / "support_tickets.json", generate_support_tickets(200, 20))
+        write_records(tmp_path / "analytics.json", generate_analytics(40, ("dau", "revenue")))
+        self.crm, self.support, self.analytics = CRMConnector(), SupportConnector(), AnalyticsConnector()
+        self.day = generate_analytics(1, ("dau",))[0]["date"]
+
+    def _append(self, path, changes, newline=True):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n".join(json.dumps(c) for c in changes) + ("\n" if newline else ""))
+
+    def _round(self, tmp_path, n):
+        self._append(tmp_path / "support_tickets.changes.ndjson", [
+            {"ticket_id": n, "customer_id": 3, "subject": "x", "status": "open", "priority": "high",
+             "created_at": f"2030-01-0{n}T00:00:00"},
+            {"ticket_id": 1000 + n, "customer_id": 4, "subject": "y", "status": "closed", "priority": "low",
+             "created_at": "2020-01-01T00:00:00"},
+            {"ticket_id": 10 + n, "_deleted": True}])
+        self._append(tmp_path / "customers.changes.ndjson", [
+            {"customer_id": n, "name": f"Zed Quinn{n}", "email": "zed@example.com", "status": "inactive",
+             "created_at": "2031-01-01T00:00:00"},
+            {"customer_id": 20 + n, "_deleted": True}])
+        self._append(tmp_path / "analytics.changes.ndjson", [
+            {"metric": "dau", "date": self.day, "value": 10_000 + n},
+            {"metric": "dau", "date": f"2031-01-0{n}", "value": n},
+            {"metric": "revenue", "date": self.day, "_deleted": True}])
+
+    def _results(self):
+        out = [c.fetch(**q) for c, q in [
+            (self.support, {}), (self.support, {"status": "open", "priority": "high"}),
+            (self.support, {"customer_id": 3}), (self.support, {"sort_by": "created_at"}),
+            (self.crm, {}), (self.crm, {"search": "quinn"}), (self.crm, {"status": "inactive"}),
+            (self.analytics, {}), (self.analytics, {"metric": "dau", "date_from": "2026-01-01"}),
+            (self.analytics, {"sort_by": "value"})]]
+        out.append([list(x) for x in self.analytics.series(metric="dau")])
+        out.append([list(x) for x in self.analytics.series()])
+        for c, q in [(self.support, {}), (self.support, {"status": "open"}), (self.crm, {"search": "quinn"}),
+                     (self.analytics, {"metric": "dau"})]:
+            s = c.select(**q).summary()
+            out.append((s.count, s.labels, s.value_sum, s.newest))
+        return out
+
+    def test_delta_matches_full_replay(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        self._results()
+        before = dataset_cache.stats()
+        for n in (1, 2, 3):
+            self._round(tmp_path, n)
+            delta = self._results()
+            monkeypatch.setattr(settings, "DATASET_CACHE_ENABLED", False)
+            assert delta == self._results()
+            monkeypatch.setattr(settings, "DATASET_CACHE_ENABLED", True)
+        after = dataset_cache.stats()
+        assert after["deltas"] - before["deltas"] == 9 and after["reloads"] == before["reloads"]
+        tickets = {t["ticket_id"]: t for t in self.support.fetch()}
+        assert 11 not in tickets and tickets[1]["subject"] == "x" and 1003 in tickets
+
+    def test_partial_line_waits_for_newline(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        log = tmp_path / "support_tickets.changes.ndjson"
+        self._append(log, [{"ticket_id": 500, "status": "open"}], newline=False)
+        assert 500 not in {t["ticket_id"] for t in self.support.fetch()}
+        self._append(log, [])
+        assert 500 in {t["ticket_id"] for t in self.support.fetch()}
+
+    def test_streaming_applies_changelog(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        for n in (1, 2):
+            self._round(tmp_path, n)
+        cached = self._results()[:10]
+        monkeypatch.setattr(settings, "STREAMING_THRESHOLD_BYTES", 0)
+        assert self._results()[:10] == cached
+
+    def test_overlay_matches_apply_changes_with_duplicate_keys(self):
+        rng = random.Random(8)
+        base = [{"id": rng.randint(0, 9), "n": i} for i in range(40)]
+        for _ in range(50):
+            changes = [{"id": rng.randint(0, 14), "_deleted": True} if rng.random() < 0.3
+                       else {"id": rng.randint(0, 14), "v": rng.random()} for _ in range(rng.randint(1, 12))]
+            applied, _, _, _ = apply_changes(base, changes, ("id",), key_map(base, ("id",)))
+            assert list(overlay(iter(base), changes, ("id",))) == [r for r in applied if r is not None]
+
+    def test_streaming_with_duplicate_keys(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        rows = generate_support_tickets(20, 5)
+        write_records(tmp_path / "support_tickets.json", rows + [dict(rows[3], subject="dup")])
+        self._append(tmp_path / "support_tickets.changes.ndjson", [dict(rows[3], subject="new")])
+        cached = self.support.fetch()
+        monkeypatch.setattr(settings, "STREAMING_THRESHOLD_BYTES", 10)
+        assert self.support.fetch() == cached
+        assert [t["subject"] for t in cached if t["ticket_id"] == rows[3]["ticket_id"]] == ["new", "dup"]
+
+    def test_base_replaced_and_compaction(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        self.support.fetch()
+        self._round(tmp_path, 1)
+        self._append(tmp_path / "support_tickets.changes.ndjson",
+                     [{"ticket_id": i, "_deleted": True} for i in range(20, 120)])
+        ids = sorted(t["ticket_id"] for t in self.support.fetch())
+        ds = dataset_cache.entry(tmp_path / "support_tickets.json")
+        assert ds.tombstones == 0 and len(ds.records) == len(ids)
+        write_records(tmp_path / "support_tickets.json", [dict(r) for r in self.support.fetch()])
+        os.utime(tmp_path / "support_tickets.json", ns=(0, 10**18))
+        assert sorted(t["ticket_id"] for t in self.support.fetch()) == ids
+
+    def test_delta_keeps_storage(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "DATASET_STORAGE", "columnar")
+        self._setup(tmp_path, monkeypatch)
+        path = tmp_path / "support_tickets.json"
+        self.support.fetch()
+        base = dataset_cache.entry(path).records
+        self._round(tmp_path, 1)
+        self.support.fetch()
+        first = dataset_cache.entry(path)
+        rows = [dict(r) for r in first.rows()]
+        self._round(tmp_path, 2)
+        self.support.fetch()
+        ds = dataset_cache.entry(path)
+        assert isinstance(ds.records, LayeredList) and ds.records.base is base is first.records.base
+        assert [dict(r) for r in first.rows()] == rows
+        assert ds.record_bytes < estimate_size([dict(r) for r in ds.rows()]) / 2
+        self._append(tmp_path / "support_tickets.changes.ndjson",
+                     [{"ticket_id": 3000 + i, "status": "open"} for i in range(60)])
+        self.support.fetch()
+        ds = dataset_cache.entry(path)
+        assert isinstance(ds.records, ColumnStore) and ds.record_bytes == ds.records.nbytes
+        assert len(ds) == len(rows) + 60
+
+
+class TestLayered:
+    def test_versions_match_copies(self):
+        rng = random.Random(4)
+        lists, maps = [(LayeredList(list(range(50))), list(range(50)))], [(LayeredMap({}), {})]
+        for step in range(60):
+            layered, plain = lists[-1]
+            layer = {rng.randrange(len(plain)): -step for _ in range(rng.randrange(5))}
+            layer.update({len(plain) + i: step for i in range(rng.randrange(3))})
+            lists.append((layered.patched(layer, len(plain) + sum(p >= len(plain) for p in layer)),
+                          [layer.get(p, v) for p, v in enumerate(plain)] + [step] * (len(layer) - sum(p < len(plain) for p in layer))))
+            layered, plain = maps[-1]
+            changes = {k: REMOVED if k in plain and rng.random() < 0.3 else step for k in rng.sample(range(30), 4)}
+            changes = {k: v for k, v in changes.items() if v is not REMOVED or k in plain}
+            maps.append((layered.patched(changes), {k: v for k, v in {**plain, **changes}.items() if v is not REMOVED}))
+        for layered, plain in lists:
+            assert list(layered) == plain and [layered[p] for p in range(len(plain))] == plain
+            assert len(layered.layers) <= 7
+        for layered, plain in maps:
+            assert dict(layered) == plain and all(layered.get(k) == plain.get(k) for k in range(30))
+
+    def test_merged_positions(self):
+        rng = random.Random(5)
+        current = set(rng.sample(range(1000), 200))
+        bucket, versions = sorted(current), []
+        for step in range(40):
+            removed = rng.sample(sorted(current), 5)
+            added = rng.sample(sorted(set(range(1000)) - current), 7)
+            current = (current - set(removed)) | set(added)
+            bucket = MergedPositions.patch(bucket, added, removed)
+            versions.append((bucket, sorted(current)))
+            assert len(bucket) == len(current)
+            if step % 9 == 0:
+                assert bucket == sorted(current)  # materialised midway
+        for bucket, expected in versions:
+            assert list(bucket) == expected and bucket[0] == expected[0]
+
+
+class TestSharedDatasets:
+    QUERIES = [(CRMConnector, {}), (CRMConnector, {"search": "brown"}), (CRMConnector, {"search": "e.co"}),
+               (CRMConnector, {"status": "active", "search": "an"}), (CRMConnector, {"customer_id": 7}),
+               (SupportConnector, {}), (SupportConnector, {"status": "open", "priority": "high"}),
+               (SupportConnector, {"customer_id": 1, "sort_by": "created_at"})]
+
+    def _setup(self, tmp_path, monkeypatch):
+        data = tmp_path / "data"
+        data.mkdir()
+        monkeypatch.setattr(settings, "DATA_DIR", str(data))
+        random.seed(5)
+        write_records(data / "customers.json", generate_customers(60))
+        write_records(data / "support_tickets.json", generate_support_tickets(150, 60))
+        store = SharedStore(str(tmp_path / "shm"))
+        monkeypatch.setattr(dataset_cache, "shared", store)
+        return data, store
+
+    def _results(self):
+        return [[dict(r) for r in cls().fetch(**q)] for cls, q in self.QUERIES]
+
+    def _reference(self, monkeypatch):
+        monkeypatch.setattr(settings, "DATASET_CACHE_ENABLED", False)
+        results = self._results()
+        monkeypatch.setattr(settings, "DATASET_CACHE_ENABLED", True)
+        return results
+
+    def test_publish_attach_and_swap(self, tmp_path, monkeypatch):
+        data, store = self._setup(tmp_path, monkeypatch)
+        connectors = [CRMConnector(), SupportConnector()]
+        assert store.lead() and not SharedStore(str(store.directory)).lead()
+        assert sorted(store.publish(connectors)) == ["customers.json", "support_tickets.json"]
+        assert self._results() == self._reference(monkeypatch)
+        ds = dataset_cache.entry(data / "customers.json")
+        assert ds.fingerprint == (1,) and isinstance(ds.records, ColumnStore)
+        assert all(isinstance(ds.indexes[f].postings, PackedPostings) for f in ("status", "customer_id", "search"))
+        assert store.publish(connectors) == []
+
+        for n in (1, 2):
+            with open(data / "support_tickets.changes.ndjson", "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ticket_id": 900 + n, "customer_id": 1, "subject": "new",
+                                    "status": "open", "priority": "high",
+                                    "created_at": "2030-01-01T00:00:00"}) + "\n")
+                f.write(json.dumps({"ticket_id": 10 * n, "_deleted": True}) + "\n")
+            assert store.publish(connectors) == ["support_tickets.json"]
+        assert store.generation() == 3 and connectors[1].version()[1:] == (3,)
+        ids = {t["ticket_id"] for t in connectors[1].fetch()}
+        assert {901, 902} <= ids and not {10, 20} & ids
+        assert self._results() == self._reference(monkeypatch)
+        # Generation 1's tickets snapshot is gone; the previous generation's is kept.
+        assert sorted(p.name for p in store.directory.iterdir() if p.suffix in (".snap", ".idx")) == \
+            ["customers.1.idx", "customers.1.snap", "support_tickets.2.idx", "support_tickets.2.snap",
+             "support_tickets.3.idx", "support_tickets.3.snap"]
+
+        store.release()
+        successor = SharedStore(str(store.directory))
+        assert successor.lead() and successor.publish(connectors) == []
+        successor.release()
+
+    def test_other_process_maps_published_snapshot(self, tmp_path, monkeypatch):
+        data, store = self._setup(tmp_path, monkeypatch)
+        assert store.lead() and store.publish([CRMConnector()]) == ["customers.json"]
+        script = ("import sys; from pathlib import Path; from app.connectors.shared import SharedStore; "
+                  "s = SharedStore(sys.argv[1]); p = Path(sys.argv[2]); "
+                  "print(s.lead(), s.version(p), len(s.load(p).records))")
+        out = subprocess.run([sys.executable, "-c", script, str(store.directory), str(data / "customers.json")],
+                             capture_output=True, text=True, check=True).stdout.split()
+        assert out == ["False", "(1,)", "60"]
+        store.release()
+
+
+class TestSQLiteBackend:
+    _setup, _append, _round, _results = (TestChangelog._setup, TestChangelog._append,
+                                         TestChangelog._round, TestChangelog._results)
+
+    def _all(self):
+        out = self._results()
+        out.append(self.crm.lookup([1, 2, "3", 999]))
+        out.append(self.support.ticket_stats([1, 3, 4, 999]))
+        for c, q in [(self.crm, {"status": "active", "sort_by": "name", "sort_order": "asc"}),
+                     (self.support, {"status": "open"}), (self.analytics, {"sort_by": "value"})]:
+            pages, cursor = [], None
+            while True:
+                rows, info, _ = BusinessRulesEngine().apply(c.select(**q), page_size=7, cursor=cursor)
+                pages.append(rows)
+                if not info.next_cursor:
+                    break
+                cursor = decode_cursor(info.next_cursor, "")
+            out.append(pages)
+        return out
+
+    def _backends(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "SQLITE_PATH", str(tmp_path / "db" / "data.sqlite3"))
+        monkeypatch.setattr(settings, "DATASET_BACKEND", "json")
+        reference = self._all()
+        import_data()
+        monkeypatch.setattr(settings, "DATASET_BACKEND", "sqlite")
+        return reference, self._all()
+
+    def test_matches_json_backend(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        for n in (1, 2):
+            self._round(tmp_path, n)
+        reference, result = self._backends(tmp_path, monkeypatch)
+        assert result == reference
+        selection = self.support.select(status="open")
+        assert selection.presorted and selection.blocking
+        info = self.support.describe()
+        assert info["cache"] == "sqlite" and info["record_count"] == len(self.support.fetch())
+
+    def test_reimport_keeps_open_iterators(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        self._backends(tmp_path, monkeypatch)
+        before = self.crm.fetch()
+        version = self.crm.version()
+        it = iter(self.crm.select().ordered())
+        head = [next(it) for _ in range(5)]
+        write_records(tmp_path / "customers.json", before[:10])
+        import_data()
+        assert head + list(it) == before
+        assert self.crm.version()[2] == version[2] + 1 and self.crm.fetch() == before[:10]
+
+    def test_not_imported(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        monkeypatch.setattr(settings, "DATASET_BACKEND", "sqlite")
+        monkeypatch.setattr(settings, "SQLITE_PATH", str(tmp_path / "missing.sqlite3"))
+        assert self.crm.fetch() == [] and self.analytics.series() == ([], [])
+        assert not self.support.describe()["available"]
+
+
+class TestHashIndex:
+    def setup_method(self):
+        self.records = [{"id": i, "status": ["Open", "closed"][i % 2],
+                         "priority": ["high", "low", "medium"][i % 3]} for i in range(30)]
+        self.indexes = {"status": HashIndex("status", self.records, lower_key),
+                        "priority": HashIndex("priority", self.records, lower_key),
+                        "id": HashIndex("id", self.records, str_key)}
+
+    def test_lookup_is_case_insensitive(self):
+        assert self.indexes["status"].lookup("OPEN") == list(range(0, 30, 2))
+
+    def test_intersect_matches_scan(self):
+        got = intersect(self.indexes, {"status": "closed", "priority": "high"})
+        assert got == [i for i, r in enumerate(self.records)
+                       if r["status"] == "closed" and r["priority"] == "high"]
+
+    def test_intersect_no_filters(self):
+        assert intersect(self.indexes, {"status": None}) is None
+
+    def test_intersect_unknown_value(self):
+        assert intersect(self.indexes, {"id": 999, "status": "open"}) == []
+
+    def test_packed_matches(self):
+        packed = {f: HashIndex(f, [], str_key if f == "id" else lower_key).attach(i.pack())
+                  for f, i in self.indexes.items()}
+        for filters in ({"status": "closed", "priority": "high"}, {"id": 7}, {"id": 999}, {"priority": "LOW"}):
+            assert intersect(packed, filters) == intersect(self.indexes, filters)
+        assert list(packed["status"].keys) == list(self.indexes["status"].keys)
+        changed = [dict(r, status="open") for r in self.records]
+        assert packed["status"].updated(changed, [1, 3]).lookup("open") == [0, 1, 2, 3] + list(range(4, 30, 2))
+
+
+class TestSortedIndex:
+    def setup_method(self):
+        rng = random.Random(7)
+        self.records = [{"metric": rng.choice(["dau", "Signups", "revenue"]),
+                         "date": f"2026-01-{rng.randint(1, 28):02d}",
+                         "value": rng.randint(0, 9)} for _ in range(300)]
+        self.index = SortedIndex("date", self.records, partition="metric")
+
+    def _scan(self, lo, hi, descending, metric=None):
+        rows = [(p, r) for p, r in enumerate(self.records)
+                if (metric is None or r["metric"].lower() == metric.lower())
+                and lo <= r["date"] <= hi]
+        rows.sort(key=lambda t: t[1]["date"], reverse=descending)
+        return [p for p, _ in rows]
+
+    def test_range_asc_matches_stable_sort(self):
+        assert self.index.scan("2026-01-05", "2026-01-20") == self._scan("2026-01-05", "2026-01-20", False)
+
+    def test_range_desc_keeps_ties_in_file_order(self):
+        assert self.index.scan("2026-01-05", "2026-01-20", descending=True) == \
+            self._scan("2026-01-05", "2026-01-20", True)
+
+    def test_partition(self):
+        assert self.index.scan("2026-01-01", "2026-01-28", True, group="signups") == \
+            self._scan("2026-01-01", "2026-01-28", True, metric="signups")
+
+    def test_unknown_partition(self):
+        assert self.index.scan(group="nope") == []
+
+    def test_packed_matches(self):
+        packed = SortedIndex("date", [], partition="metric").attach(self.index.pack())
+        for args in (("2026-01-05", "2026-01-20"), ("2026-01-01", "2026-01-28", True, "signups"), (None, None, True)):
+            assert list(packed.scan(*args)) == self.index.scan(*args)
+        assert SortedIndex("date", [{"date": True}, {"date": False}]).pack() is None
+
+    def test_tail_append_extends_shared_group(self):
+        for size in (300, 3000):
+            records = [{"metric": "dau", "date": f"2026-01-{i * 28 // size + 1:02d}"} for i in range(size)]
+            index = SortedIndex("date", records, partition="metric")
+            before = index.scan()
+            grown = records + [{"metric": "dau", "date": "2026-02-01"}, {"metric": "new", "date": "2026-02-02"}]
+            updated = index.updated(grown, [size, size + 1])
+            assert updated.groups[SortedIndex.ALL][1] is index.groups[SortedIndex.ALL][1]
+            assert updated.scan() == SortedIndex("date", grown, partition="metric").scan() == before + [size, size + 1]
+            assert index.scan() == before
+            assert updated.scan(group="new") == [size + 1] and index.scan(group="new") == []
+
+    def test_mid_group_update_matches_rebuild(self):
+        changed = [dict(r) for r in self.records] + [{"metric": "dau", "date": "2026-01-01"}]
+        changed[5] = dict(changed[5], date="2026-01-27", metric="revenue")
+        updated = self.index.updated(changed, [5, 300])
+        rebuilt = SortedIndex("date", changed, partition="metric")
+        for args in ((), ("2026-01-01", "2026-01-28", True, "dau"), (None, None, False, "revenue")):
+            assert updated.scan(*args) == rebuilt.scan(*args)
+        assert self.index.scan() == self._scan("", "9", False)
+        assert updated.updated(changed + [{"metric": "dau", "date": "2026-02-01"}], [301]).scan() == \
+            rebuilt.scan() + [301]
+
+
+class TestAnalyticsIndexedFetch:
+    def test_matches_scan_and_sort(self, tmp_path, monkeypatch):
+        rng = random.Random(3)
+        records = [{"metric": rng.choice(["dau", "signups"]),
+                    "date": f"2026-02-{rng.randint(1, 20):02d}",
+                    "value": rng.randint(0, 50)} for _ in range(200)]
+        (tmp_path / "analytics.json").write_text(json.dumps(records), encoding="utf-8")
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+
+        def reference(metric=None, date_from=None, date_to=None, sort_by="date", sort_order="desc"):
+            rows = list(records)
+            if metric:
+                rows = [r for r in rows if r["metric"].lower() == metric.lower()]
+            if date_from:
+                rows = [r for r in rows if r["date"] >= date_from]
+            if date_to:
+                rows = [r for r in rows if r["date"] <= date_to]
+            rows.sort(key=lambda r: r.get(sort_by, ""), reverse=(sort_order == "desc"))
+            return rows
+
+        connector = AnalyticsConnector()
+        for kwargs in ({}, {"metric": "DAU"}, {"date_from": "2026-02-05", "date_to": "2026-02-09"},
+                       {"metric": "signups", "date_from": "2026-02-10", "sort_order": "asc"},
+                       {"sort_by": "value", "sort_order": "desc"}):
+            assert connector.fetch(**kwargs) == reference(**kwargs)
+
+
+class TestSelection:
+    def test_crm_select_matches_fetch(self):
+        connector = CRMConnector()
+        for kwargs in ({}, {"status": "active"}, {"sort_by": "customer_id", "sort_order": "asc"}):
+            assert connector.select(**kwargs).sorted() == connector.fetch(**kwargs)
+
+    def test_crm_index_ordering_matches_sort(self):
+        connector = CRMConnector()
+        selection = connector.select(status="inactive", sort_order="asc")
+        assert list(selection.ordered()) == sorted(selection.rows, key=lambda r: r["created_at"])
+
+    def test_support_priority_selection(self):
+        selection = SupportConnector().select(status="open")
+        assert selection.sort_key is not None and selection.ordered is None
+
+
+class TestTrigramIndex:
+    def setup_method(self):
+        random.seed(5)
+        self.records = generate_customers(300)
+        self.index = TrigramIndex("search", self.records, fields=("name", "email"))
+
+    def _scan(self, term, pool=None):
+        term = term.lower()
+        pool = range(len(self.records)) if pool is None else pool
+        return [p for p in pool if term in self.records[p]["name"].lower()
+                or term in self.records[p]["email"].lower()]
+
+    def test_matches_substring_scan(self):
+        for term in ("alice", "SMITH", "e.j", "42@", "zzz", "a", "ia"):
+            assert self.index.search(self.records, term) == self._scan(term)
+
+    def test_restricted_to_positions(self):
+        pool = list(range(0, 300, 3))
+        assert self.index.search(self.records, "son", pool) == self._scan("son", pool)
+
+    def test_incremental_update_matches_rebuild(self):
+        new = [dict(r) for r in self.records[:250]]
+        new[3]["name"] = "Zelda Quartz"
+        new.append({"name": "Yusuf Xu", "email": "yx@example.com"})
+        updated = self.index.updated(new)
+        rebuilt = TrigramIndex("search", new, fields=("name", "email"))
+        assert updated.postings == rebuilt.postings
+        assert self.index.search(self.records, "zelda") == []
+
+    def test_changed_rows_update_matches_rebuild(self):
+        new = [dict(r) for r in self.records] + [{"name": "Yusuf Xu", "email": "yx@example.com"}]
+        new[3]["name"] = "Zelda Quartz"
+        new[10] = None
+        updated = self.index.updated(new, [3, 10, 300])
+        rebuilt = TrigramIndex("search", new, fields=("name", "email"))
+        assert {g: list(b) for g, b in updated.postings.items()} == {g: list(b) for g, b in rebuilt.postings.items()}
+        for term in ("zelda", "yx@", "alice", "a"):
+            assert updated.search(new, term) == rebuilt.search(new, term)
+        assert self.index.search(self.records, "zelda") == []
+
+    def test_packed_matches_substring_scan(self):
+        packed = TrigramIndex("search", [], fields=("name", "email")).attach(self.index.pack())
+        for term in ("alice", "SMITH", "e.j", "42@", "zzz", "a", "ia"):
+            assert packed.search(self.records, term) == self._scan(term)
+        pool = list(range(0, 300, 3))
+        assert packed.search(self.records, "son", pool) == self._scan("son", pool)
+
+
+class TestStreaming:
+    def test_json_array_small_chunks(self, tmp_path):
+        records = [{"id": i, "n": 12345.678, "s": "x, ] \" {"} for i in range(40)]
+        f = tmp_path / "a.json"
+        f.write_text(json.dumps(records, indent=2), encoding="utf-8")
+        for chunk in (1, 7, 64):
+            assert list(iter_json_array(f, chunk_size=chunk)) == records
+
+    def test_json_array_empty_and_invalid(self, tmp_path):
+        f = tmp_path / "a.json"
+        f.write_text(" [ ] ", encoding="utf-8")
+        assert list(iter_json_array(f)) == []
+        f.write_text('[{"a": 1} {"b": 2}]', encoding="utf-8")
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array(f))
+
+    def test_ndjson_sibling_is_used(self, tmp_path, monkeypatch):
+        write_records(tmp_path / "support_tickets.ndjson", generate_support_tickets(30))
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        assert len(SupportConnector().fetch()) == 30
+
+    def test_sort_spilled_matches_sorted(self):
+        rng = random.Random(4)
+        rows = [{"id": i, "k": rng.randint(0, 9)} for i in range(250)]
+        for reverse in (False, True):
+            expected = sorted(rows, key=lambda r: r["k"], reverse=reverse)
+            for run_rows in (7, 250, 1000):
+                merged, count = sort_spilled(iter(rows), lambda r: r["k"], reverse, run_rows)
+                assert count == 250 and list(merged) == expected
+
+    def test_streamed_export_does_not_hold_matches(self, tmp_path, monkeypatch):
+        write_records(tmp_path / "customers.jsonl", generate_customers(120))
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        connector = CRMConnector()
+        cached = connector.fetch(status="active")
+        monkeypatch.setattr(settings, "STREAMING_THRESHOLD_BYTES", 0)
+        selection = connector.select(status="active")
+        rows, total = selection.export()
+        assert list(rows) == cached and total == len(cached) and selection.rows._rows is None
+
+    def test_streamed_fetch_matches_cached(self, tmp_path, monkeypatch):
+        write_records(tmp_path / "customers.jsonl", generate_customers(120))
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        connector = CRMConnector()
+        queries = ({}, {"status": "active", "search": "a"}, {"customer_id": 7},
+                   {"sort_by": "customer_id", "sort_order": "asc"})
+        cached = [connector.fetch(**q) for q in queries]
+        monkeypatch.setattr(settings, "STREAMING_THRESHOLD_BYTES", 0)
+        assert [connector.fetch(**q) for q in queries] == cached
+
+
+class TestColumnStore:
+    def setup_method(self):
+        random.seed(2)
+        self.records = generate_support_tickets(500)
+
+    def test_round_trip(self):
+        store = ColumnStore(self.records)
+        assert len(store) == 500 and list(store) == self.records
+        assert dict(store[-1]) == self.records[-1] and store[3:5] == self.records[3:5]
+
+    def test_encodings(self):
+        store = ColumnStore(self.records)
+        assert isinstance(store.columns["ticket_id"], IntColumn)
+        assert isinstance(store.columns["priority"], DictColumn)
+
+    def test_missing_fields_and_mixed_types(self):
+        records = [{"a": 1}, {"a": 1.0, "b": "x"}, {"a": True}] * 10
+        store = ColumnStore(records)
+        assert [dict(r) for r in store] == records
+        assert [type(r["a"]) for r in store[:3]] == [int, float, bool]
+        assert "b" not in store[0] and store[0].get("b", "-") == "-"
+
+    def test_connectors_match_row_storage(self, tmp_path, monkeypatch):
+        write_records(tmp_path / "support_tickets.json", self.records)
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "DATASET_CACHE_ENABLED", False)
+        queries = ({}, {"status": "open", "priority": "high"}, {"sort_by": "created_at"})
+        rows = [SupportConnector().fetch(**q) for q in queries]
+        monkeypatch.setattr(settings, "DATASET_STORAGE", "columnar")
+        assert [SupportConnector().fetch(**q) for q in queries] == rows
+
+
+class TestSeriesIndex:
+    def test_window_matches_scan(self):
+        rng = random.Random(4)
+        records = [{"metric": rng.choice(["a", "b"]), "date": f"2026-03-{rng.randint(1, 30):02d}",
+                    "value": rng.randint(0, 99)} for _ in range(200)]
+        index = SeriesIndex("value", records, order="date", partition="metric")
+        dates, values = index.window("2026-03-05", "2026-03-12", group="A")
+        expected = sorted((r for r in records if r["metric"] == "a"
+                           and "2026-03-05" <= r["date"] <= "2026-03-12"), key=lambda r: r["date"])
+        assert list(dates) == [r["date"] for r in expected]
+        assert list(values) == [r["value"] for r in expected]
+        packed = SeriesIndex("value", [], order="date", partition="metric").attach(index.pack())
+        for window in (("2026-03-05", "2026-03-12", "a"), (None, "2026-03-09")):
+            assert [list(x) for x in packed.window(*window)] == [list(x) for x in index.window(*window)]
+
+    def test_tail_append_reuses_buffers(self):
+        for size in (200, 2000):
+            records = [{"metric": "a", "date": f"2026-03-{i * 30 // size + 1:02d}", "value": i} for i in range(size)]
+            index = SeriesIndex("value", records, order="date", partition="metric")
+            before = [list(x) for x in index.window()]
+            versions = [index]
+            for n in range(3):
+                records = records + [{"metric": "a", "date": f"2026-04-0{n + 1}", "value": -n}]
+                versions.append(versions[-1].updated(records, [len(records) - 1]))
+            rebuilt = SeriesIndex("value", records, order="date", partition="metric")
+            assert [list(x) for x in versions[-1].window()] == [list(x) for x in rebuilt.window()]
+            assert [list(x) for x in versions[-1].window(group="a")] == [list(x) for x in rebuilt.window(group="a")]
+            assert [list(x) for x in index.window()] == before
+            # the first append may grow the buffers; later ones write into the spare room
+            assert versions[2].groups[SeriesIndex.ALL][0] is versions[3].groups[SeriesIndex.ALL][0]
+            assert versions[2].groups[SeriesIndex.ALL][2] is versions[3].groups[SeriesIndex.ALL][2]
+
+    def test_mid_group_update_matches_rebuild(self):
+        records = [{"metric": "ab"[i % 2], "date": f"2026-03-{i % 28 + 1:02d}", "value": i} for i in range(100)]
+        index = SeriesIndex("value", records, order="date", partition="metric")
+        first = index.updated(records + [{"metric": "a", "date": "2026-04-01", "value": 1}], [100])
+        changed = records + [{"metric": "a", "date": "2026-04-02", "value": 2}]
+        changed[3] = dict(changed[3], date="2026-03-01", metric="a")
+        second = index.updated(changed, [3, 100])
+        rebuilt = SeriesIndex("value", changed, order="date", partition="metric")
+        for group in (SeriesIndex.ALL, "a", "b"):
+            assert [list(x) for x in second.window(group=group)] == [list(x) for x in rebuilt.window(group=group)]
+        assert list(first.window()[1])[-1] == 1 and len(first.window()[1]) == 101
+
+    def test_connector_series(self):
+        dates, values = AnalyticsConnector().series(date_from="2026-02-01", date_to="2026-02-10")
+        assert len(values) == 10 and list(dates) == sorted(dates)
+
+
+class TestSnapshot:
+    def test_round_trip(self, tmp_path):
+        records = [{"id": i, "v": i / 3, "tag": ["x", "y"][i % 2], "name": f"n{i} é",
+                    "extra": {"k": [i]} if i % 3 else None} for i in range(50)]
+        records[7].pop("tag")
+        source = tmp_path / "rows.json"
+        write_records(source, records)
+        write_snapshot(ColumnStore(records), snapshot_path(source), source)
+        store = load_snapshot(source)
+        assert store is not None and list(store) == records
+
+    def test_stale_snapshot_ignored(self, tmp_path):
+        source = tmp_path / "rows.json"
+        write_records(source, [{"id": 1}])
+        write_snapshot(ColumnStore([{"id": 1}]), snapshot_path(source), source)
+        os.utime(source, ns=(0, 10**18))
+        assert load_snapshot(source) is None
+
+    def test_connector_uses_snapshot(self, tmp_path, monkeypatch):
+        random.seed(9)
+        write_records(tmp_path / "customers.json", generate_customers(80))
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "DATASET_CACHE_ENABLED", False)
+        queries = ({}, {"status": "active", "search": "an"}, {"sort_by": "customer_id"})
+        expected = [CRMConnector().fetch(**q) for q in queries]
+        build_snapshots(str(tmp_path))
+        assert isinstance(CRMConnector()._load_dataset("customers.json").records, ColumnStore)
+        assert [CRMConnector().fetch(**q) for q in queries] == expected
+
+
+class TestSummaryIndex:
+    def setup_method(self):
+        random.seed(9)
+        self.records = generate_support_tickets(400)
+        self.index = SummaryIndex("summary", self.records, labels=("status", "priority"))
+
+    def _same(self, a, b):
+        assert (a.count, a.labels, a.newest) == (b.count, b.labels, b.newest)
+
+    def test_group_lookup_matches_scan(self):
+        for filters in ({}, {"status": "open"}, {"priority": "HIGH"},
+                        {"status": "closed", "priority": "low"}):
+            rows = [r for r in self.records
+                    if all(r[f] == v.lower() for f, v in filters.items())]
+            self._same(self.index.lookup(filters), Summary.of(rows))
+        assert self.index.lookup({"customer_id": 3}) is None
+        assert self.index.lookup({"status": "nope"}).count == 0
+
+    def test_incremental_update_matches_rebuild(self):
+        newest = max(range(len(self.records)), key=lambda p: self.records[p]["created_at"])
+        new = [dict(r) for r in self.records[:350]]
+        if newest < 350:
+            new[newest]["created_at"] = "2001-01-01T00:00:00"  # drop the newest stamp
+        new[7]["status"] = "open" if new[7]["status"] == "closed" else "closed"
+        updated = self.index.updated(new)
+        rebuilt = SummaryIndex("summary", new, labels=("status", "priority"))
+        for filters in ({}, {"status": "open"}, {"priority": "medium"}):
+            self._same(updated.lookup(filters), rebuilt.lookup(filters))
+        assert self.index.lookup({}).count == 400
+
+    def test_packed_matches(self):
+        packed = SummaryIndex("summary", [], labels=("status", "priority")).attach(self.index.pack())
+        assert list(packed.rows) == list(self.index.rows)
+        for filters in ({}, {"status": "open"}, {"status": "closed", "priority": "low"}):
+            self._same(packed.lookup(filters), self.index.lookup(filters))
+        self._same(packed.over(range(0, 400, 3)), self.index.over(range(0, 400, 3)))
+        new = [dict(r) for r in self.records]
+        new[5]["status"] = "pending"
+        self._same(packed.updated(new, [5]).lookup({}), SummaryIndex("summary", new, labels=("status", "priority")).lookup({}))
+
+    def test_selection_summary_covers_all_matches(self):
+        for selection in (SupportConnector().select(status="open"),
+                          SupportConnector().select(customer_id=4),
+                          CRMConnector().select(search="a"),
+                          AnalyticsConnector().select(date_from="2026-02-01", date_to="2026-02-10")):
+            summary = selection.summary()
+            full = Summary.of(selection.rows, labels=tuple(summary.labels))
+            assert summary.count == len(selection)
+            assert (summary.labels, summary.newest, summary.value_sum) == \
+                   (full.labels, full.newest, full.value_sum)
+
+class TestAsyncConnectors:
+    def test_afetch_matches_fetch(self):
+        connector = SupportConnector()
+        assert asyncio.run(connector.afetch(status="open")) == connector.fetch(status="open")
+
+    def test_sync_only_connector_adapter(self):
+        class StaticConnector(BaseConnector):
+            source_name = "static"
+
+            def fetch(self, **filters):
+                return [{"id": 2}, {"id": 1}]
+
+            def _get_parameters(self):
+                return {}
+
+        connector = StaticConnector()
+        assert not connector._is_warm()
+        assert asyncio.run(connector.aselect()).rows == [{"id": 2}, {"id": 1}]
+
+    def test_cold_then_warm(self, tmp_path, monkeypatch):
+        write_records(tmp_path / "customers.json", generate_customers(20))
+        monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+        monkeypatch.setattr("app.connectors.base.dataset_cache", DatasetCache())
+        connector = CRMConnector()
+        assert not connector._is_warm()
+        assert len(asyncio.run(connector.aselect())) == 20
+        assert connector._is_warm()
+
+    def test_concurrent_misses_parse_once(self, tmp_path, monkeypatch):
+        f = tmp_path / "customers.json"
+        write_records(f, generate_customers(200))
+        calls = []
+        real = cache_mod.read_dataset
+        monkeypatch.setattr(cache_mod, "read_dataset", lambda p: calls.append(p) or real(p))
+        cache = cache_mod.DatasetCache()
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: cache.get(f), range(16)))
+        assert len(calls) == 1 and all(r is results[0] for r in results)